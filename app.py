@@ -1,20 +1,61 @@
+import os
+
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 from lab1.app.app import app as lab1_app
 from lab2.app.app import app as lab2_app
 from lab3.app.app import app as lab3_app
 from lab4.app import app as lab4_app
 from lab5.app import app as lab5_app
-from lab6.app import app as lab6_app
+from lab6.app import app as lab6_app, dispose_engines
 
 from root_app.app import app as root_app
+from root_app import assets, compression, metrics, sessions
 
-app = DispatcherMiddleware(root_app, {
+mounts = {
     '/lab1': lab1_app,
     '/lab2': lab2_app,
     '/lab3': lab3_app,
     '/lab4': lab4_app,
     '/lab5': lab5_app,
     '/lab6': lab6_app
-})
+}
+
+# Сессии приложений с авторизацией хранятся на сервере, в cookie только идентификатор
+SESSION_PREFIXES = ('/lab3', '/lab4', '/lab5', '/lab6')
+session_store = sessions.store_from_environ()
+
+
+def configure(prefix, flask_app):
+    # Общая настройка приложения под префиксом prefix ('' -- корневое)
+    metrics.instrument(flask_app)
+    # Адреса статики с хешем содержимого из static/dist/manifest.json
+    assets.install(flask_app)
+    if prefix in SESSION_PREFIXES:
+        sessions.install(flask_app, prefix.strip('/'), session_store,
+                         ttl=int(os.environ.get('SESSION_TTL', 0)) or None)
+
+
+for prefix, flask_app in [('', root_app), *mounts.items()]:
+    configure(prefix, flask_app)
+
+app = DispatcherMiddleware(root_app, mounts)
+
+# Статика каждого приложения: сжатые заранее .br/.gz отдаются без сжатия на лету
+static_dirs = {
+    prefix + flask_app.static_url_path + '/': flask_app.static_folder
+    for prefix, flask_app in [('', root_app), *mounts.items()]
+    if flask_app.static_folder and os.path.isdir(flask_app.static_folder)
+}
+
+application = metrics.MetricsMiddleware(
+    compression.CompressionMiddleware(app, static_dirs=static_dirs),
+    mounts=mounts.keys(),
+)
+
 
-application = app
\ No newline at end of file
+def reset_after_fork():
+    for lab_app in (lab4_app, lab5_app):
+        lab_app.extensions['db_connector'].reset()
+    lab5_app.extensions['visit_sketches'].reset_after_fork()
+    lab5_app.extensions['user_deletions'].reset_after_fork()
+    dispose_engines(lab6_app)
@@ -0,0 +1,191 @@
+"""Concurrency of lab6 read endpoints: sync WSGI workers vs ASGI event loops.
+
+Both modes get the same number of workers. A WSGI worker is a thread that
+handles one request at a time, an ASGI worker is one event loop with its own
+async engine. Simulated database latency (a sleep in SQLite's statement
+callback, i.e. in the driver thread) shows how many requests each worker can
+keep in flight while waiting for the database.
+
+    python -m bench.asgi_concurrency --workers 4 --concurrency 8 32 --db-latency 0.005
+"""
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+
+from bench.loadtest import build_lab6, percentile
+
+
+def read_paths(dataset, count, seed):
+    rnd = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        course_id = rnd.choice(dataset['course_ids'])
+        paths.append(rnd.choice([
+            f"/courses/?page={rnd.randint(1, dataset['course_pages'])}",
+            f'/courses/{course_id}',
+            f'/courses/{course_id}/reviews?sort_by=' + rnd.choice(['newest', 'positive', 'negative']),
+            f"/images/{rnd.choice(dataset['image_ids'])}",
+        ]))
+    return paths
+
+
+def add_latency(engine, latency, is_async):
+    def sleep(statement):
+        time.sleep(latency)
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        if is_async:
+            dbapi_connection.run_async(lambda connection: connection.set_trace_callback(sleep))
+        else:
+            dbapi_connection.set_trace_callback(sleep)
+
+
+async def asgi_get(application, path):
+    path, _, query = path.partition('?')
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode(),
+             'root_path': '', 'scheme': 'http', 'http_version': '1.1', 'headers': []}
+    status = {}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+
+    await application(scope, receive, send)
+    return status['code']
+
+
+class WSGIWorkers:
+    def __init__(self, flask_app, workers):
+        from werkzeug.test import Client
+        self.client = lambda: Client(flask_app)
+        self.executor = ThreadPoolExecutor(workers)
+
+    def get(self, client_index, path):
+        return self.executor.submit(self._get, path).result()
+
+    def _get(self, path):
+        response = self.client().get(path)
+        response.close()
+        return response.status_code
+
+    def close(self):
+        self.executor.shutdown()
+
+
+class ASGIWorkers:
+    def __init__(self, flask_app, workers, latency):
+        from lab6.app.asgi import create_asgi_app
+        self.loops = []
+        self.apps = []
+        for _ in range(workers):
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True).start()
+            application = create_asgi_app(flask_app)
+            if latency:
+                add_latency(application.engine.sync_engine, latency, is_async=True)
+            self.loops.append(loop)
+            self.apps.append(application)
+
+    def get(self, client_index, path):
+        worker = client_index % len(self.loops)
+        future = asyncio.run_coroutine_threadsafe(asgi_get(self.apps[worker], path), self.loops[worker])
+        return future.result()
+
+    def close(self):
+        for loop, application in zip(self.loops, self.apps):
+            asyncio.run_coroutine_threadsafe(application.engine.dispose(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+
+
+def measure(workers, paths, concurrency, duration):
+    samples = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        i = index
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                failed = workers.get(index, paths[i % len(paths)]) >= 500
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples.append(elapsed)
+                errors[0] += int(failed)
+            i += concurrency
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+
+    samples.sort()
+    return {
+        'requests': len(samples),
+        'errors': errors[0],
+        'rps': len(samples) / wall,
+        'p50': percentile(samples, 0.50) * 1000,
+        'p95': percentile(samples, 0.95) * 1000,
+        'p99': percentile(samples, 0.99) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--db-latency', type=float, default=0.005, help='seconds added to each SQL statement')
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--reviews', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    random.seed(0)
+    # Предупреждения об N+1 на каждый запрос заглушили бы таблицу
+    logging.getLogger('lab6.app.metrics').setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as workdir:
+        flask_app, dataset = build_lab6(workdir, args.courses, args.reviews)
+        if args.db_latency:
+            with flask_app.app_context():
+                from lab6.app.models import db
+                add_latency(db.engine, args.db_latency, is_async=False)
+                db.engine.dispose()
+        paths = read_paths(dataset, 1000, seed=0)
+
+        print(f"{'mode':<6}{'workers':>8}{'clients':>8}{'requests':>10}{'errors':>8}"
+              f"{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for concurrency in args.concurrency:
+            for mode in ('wsgi', 'asgi'):
+                if mode == 'wsgi':
+                    workers = WSGIWorkers(flask_app, args.workers)
+                else:
+                    workers = ASGIWorkers(flask_app, args.workers, args.db_latency)
+                try:
+                    row = measure(workers, paths, concurrency, args.duration)
+                finally:
+                    workers.close()
+                print(f"{mode:<6}{args.workers:>8}{concurrency:>8}{row['requests']:>10}{row['errors']:>8}"
+                      f"{row['rps']:>10.1f}{row['p50']:>10.1f}{row['p95']:>10.1f}{row['p99']:>10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
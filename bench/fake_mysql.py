@@ -0,0 +1,193 @@
+"""In-memory stand-in for mysql.connector used by the load test.
+
+It understands only the statements issued by the lab4/lab5 repositories
+and answers them from Python lists, so the measured time is the cost of
+the Flask stack rather than of a real MySQL server.
+"""
+import random
+import re
+import time
+from datetime import date, datetime, timedelta
+from threading import Lock
+
+PATHS = ['/', '/users/', '/visit_logs/', '/auth/login', '/visit_logs/pages_report',
+         '/visit_logs/users_report']
+
+
+# Условия WHERE, которые строят репозитории visit_logs: столбец, оператор
+_CONDITION_RE = re.compile(r'(?:vl\.)?(user_id|created_at) (=|>=|<) %s')
+_OPERATORS = {'=': lambda a, b: a == b, '>=': lambda a, b: a >= b, '<': lambda a, b: a < b}
+
+
+class FakeDatabase:
+    def __init__(self, users=50, visit_logs=5000, latency=0.0, seed=None):
+        self.latency = latency
+        self.lock = Lock()
+        rnd = random.Random(seed)
+        self.roles = [
+            {'id': 1, 'name': 'admin', 'description': 'Administrator with full rights'},
+            {'id': 2, 'name': 'user', 'description': 'Regular user with limited rights'},
+        ]
+        self.users = [{
+            'id': 1, 'username': 'admin', 'password': 'qwerty', 'first_name': 'Иван',
+            'last_name': 'Иванов', 'middle_name': None, 'role_id': 1,
+            'created_at': datetime(2025, 1, 1),
+        }]
+        for i in range(2, users + 1):
+            self.users.append({
+                'id': i, 'username': f'user{i}', 'password': 'Password123', 'first_name': f'Имя{i}',
+                'last_name': f'Фамилия{i}', 'middle_name': None, 'role_id': 2,
+                'created_at': datetime(2025, 1, 1) + timedelta(days=i),
+            })
+
+        # Словарь paths: id по порядку добавления
+        self.paths = []
+        # Журнал заканчивается сегодня, чтобы попадать в период отчетов по умолчанию
+        start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(seconds=visit_logs * 30)
+        self.visit_logs = []
+        for i in range(1, visit_logs + 1):
+            user = rnd.choice(self.users + [None])
+            self.visit_logs.append({
+                'id': i,
+                'path_id': self.path_id(rnd.choice(PATHS)),
+                'route_id': None,
+                'user_id': user['id'] if user else None,
+                'created_at': start + timedelta(seconds=i * 30),
+            })
+
+    def connect(self, **kwargs):
+        return FakeConnection(self)
+
+    def user_row(self, user):
+        role = next(r for r in self.roles if r['id'] == user['role_id'])
+        row = {k: v for k, v in user.items() if k != 'password'}
+        row['role_name'] = role['name']
+        return row
+
+    def path_id(self, path):
+        if path not in self.paths:
+            self.paths.append(path)
+        return self.paths.index(path) + 1
+
+    def filter_logs(self, query, params, clause=' WHERE '):
+        logs = self.visit_logs
+        where = query.split(clause, 1)[1] if clause in query else ''
+        for (column, operator), value in zip(_CONDITION_RE.findall(where), params):
+            if type(value) is date:
+                # MySQL сравнивает DATETIME с датой как с полуночью этого дня
+                value = datetime.combine(value, datetime.min.time())
+            logs = [log for log in logs if _OPERATORS[operator](log[column], value)]
+        return logs
+
+    def log_row(self, log):
+        user = next((u for u in self.users if u['id'] == log['user_id']), None)
+        return {
+            'id': log['id'], 'path': self.paths[log['path_id'] - 1], 'created_at': log['created_at'],
+            'first_name': user['first_name'] if user else None,
+            'last_name': user['last_name'] if user else None,
+            'middle_name': user['middle_name'] if user else None,
+        }
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self, dictionary=False, **kwargs):
+        return FakeCursor(self.database, dictionary)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, database, dictionary):
+        self.database = database
+        self.dictionary = dictionary
+        self.rows = []
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def close(self):
+        pass
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def execute(self, query, params=()):
+        if self.database.latency:
+            time.sleep(self.database.latency)
+        params = tuple(params or ())
+        self.rowcount = -1
+        query = re.sub(r'\s+', ' ', query).strip()
+        db = self.database
+
+        with db.lock:
+            if query.startswith('INSERT INTO paths'):
+                self.lastrowid = db.path_id(params[0])
+                self.rows, self.rowcount = [], 1
+            elif query.startswith('SELECT id, path FROM paths'):
+                self.rows = [{'id': path_id, 'path': db.paths[path_id - 1]} for path_id in params]
+            elif query.startswith('INSERT INTO visit_logs'):
+                db.visit_logs.append({'id': len(db.visit_logs) + 1, 'path_id': params[0], 'route_id': params[1],
+                                      'user_id': params[2], 'created_at': datetime.now()})
+                self.rows, self.rowcount = [], 1
+            elif 'FROM users' in query and 'WHERE users.id' in query:
+                self.rows = [db.user_row(u) for u in db.users if str(u['id']) == str(params[0])]
+            elif 'FROM users' in query and 'WHERE username' in query:
+                self.rows = [db.user_row(u) for u in db.users
+                             if u['username'] == params[0] and u['password'] == params[1]]
+            elif query.startswith('SELECT users.*'):
+                self.rows = [db.user_row(u) for u in db.users]
+            elif query.startswith('SELECT * FROM roles'):
+                self.rows = list(db.roles)
+            elif query.startswith('SELECT COUNT(*) FROM visit_logs'):
+                self.rows = [(len(db.filter_logs(query, params)),)]
+            elif 'FROM visit_logs vl' in query:
+                logs = sorted(db.filter_logs(query, params), key=lambda log: log['created_at'], reverse=True)
+                if 'LIMIT' in query:
+                    limit, offset = params[-2:]
+                    logs = logs[offset:offset + limit]
+                self.rows = [db.log_row(log) for log in logs]
+            elif 'GROUP BY path_id' in query or 'GROUP BY route_id' in query:
+                column = 'path_id' if 'GROUP BY path_id' in query else 'route_id'
+                # Ключ строки -- псевдоним из SELECT (отчет пишет route_id AS path_id), иначе сам столбец
+                alias = re.search(rf'\b{column} AS (\w+)', query)
+                key = alias.group(1) if alias else column
+                counts = {}
+                for log in db.filter_logs(query, params):
+                    counts[log[column]] = counts.get(log[column], 0) + 1
+                self.rows = [{key: value, 'visit_count': count}
+                             for value, count in sorted(counts.items(), key=lambda x: -x[1])]
+            elif 'FROM users u LEFT JOIN visit_logs vl' in query and 'GROUP BY u.id' in query:
+                # Период задан в условии LEFT JOIN ... ON
+                counts = {}
+                for log in db.filter_logs(query, params, clause=' ON '):
+                    counts[log['user_id']] = counts.get(log['user_id'], 0) + 1
+                rows = [{'first_name': u['first_name'], 'last_name': u['last_name'],
+                         'middle_name': u['middle_name'], 'visit_count': counts.get(u['id'], 0)}
+                        for u in db.users]
+                self.rows = sorted(rows, key=lambda row: -row['visit_count'])
+            else:
+                self.rows, self.rowcount = [], 0
+
+        if self.rowcount == -1:
+            self.rowcount = len(self.rows)
+        if not self.dictionary:
+            self.rows = [tuple(row.values()) if isinstance(row, dict) else row for row in self.rows]
@@ -0,0 +1,303 @@
+"""Load test for the combined application (app:application).
+
+By default the WSGI app is driven in-process: lab6 runs on a temporary
+SQLite database, lab4/lab5 talk to the in-memory fake from fake_mysql.
+With --url the same scenarios are sent over HTTP to a running server.
+
+    python -m bench.loadtest --users 20 --duration 30
+    python -m bench.loadtest --save-baseline bench/baseline.json
+    python -m bench.loadtest --baseline bench/baseline.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+from unittest.mock import patch
+
+from bench.fake_mysql import FakeDatabase
+
+
+class WSGITransport:
+    def __init__(self, application):
+        from werkzeug.test import Client
+        self.client = Client(application)
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        body = response.get_data()
+        response.close()
+        return response.status_code, len(body), response.headers.get('Location')
+
+
+class HTTPTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req) as response:
+                # Переадресации urllib выполняет сам: итоговый адрес вместо Location
+                location = response.geturl()
+                return response.status, len(response.read()), None if location == req.full_url else location
+        except urllib.error.HTTPError as e:
+            return e.code, 0, None
+
+
+LOGIN_PATH = '/auth/login'
+
+
+# Сценарии не рассчитаны ни на 4xx, ни на потерю входа: такие ответы -- ошибки, а не быстрые успехи
+def is_failure(status, location):
+    return status >= 400 or (location is not None and LOGIN_PATH in urllib.parse.urlsplit(location).path)
+
+
+class Scenarios:
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def catalog_browsing(self, transport):
+        page = random.randint(1, self.dataset['course_pages'])
+        yield 'GET', f'/lab6/courses/?page={page}', None
+        course_id = random.choice(self.dataset['course_ids'])
+        yield 'GET', f'/lab6/courses/{course_id}', None
+        yield 'GET', f'/lab6/courses/{course_id}/reviews?sort_by=' + random.choice(
+            ['newest', 'positive', 'negative']), None
+
+    def review_submission(self, transport):
+        login = random.choice(self.dataset['lab6_logins'])
+        yield 'POST', '/lab6/auth/login', {'login': login, 'password': 'password'}
+        course_id = random.choice(self.dataset['course_ids'])
+        yield 'POST', f'/lab6/courses/{course_id}/reviews/submit', {
+            'rating': random.randint(0, 5), 'text': 'Отзыв из нагрузочного теста.'}
+
+    def visit_log_paging(self, transport):
+        yield 'POST', '/lab5/auth/login', {'username': 'admin', 'password': 'qwerty'}
+        for page in random.sample(range(1, self.dataset['visit_log_pages'] + 1), 3):
+            yield 'GET', f'/lab5/visit_logs/?page={page}', None
+
+    def report_export(self, transport):
+        yield 'POST', '/lab5/auth/login', {'username': 'admin', 'password': 'qwerty'}
+        yield 'GET', '/lab5/visit_logs/pages_report/export_csv', None
+        yield 'GET', '/lab5/visit_logs/users_report/export_csv', None
+
+    def image_fetch(self, transport):
+        yield 'GET', f"/lab6/images/{random.choice(self.dataset['image_ids'])}", None
+
+    WEIGHTS = {
+        'catalog_browsing': 10,
+        'image_fetch': 6,
+        'visit_log_paging': 3,
+        'review_submission': 2,
+        'report_export': 1,
+    }
+
+
+def build_lab6(workdir, courses, reviews):
+    from lab6.app import create_app
+    from lab6.app.models import db, User, Category, Course, Review, Image
+    from werkzeug.security import generate_password_hash
+
+    upload_folder = os.path.join(workdir, 'media')
+    os.makedirs(upload_folder, exist_ok=True)
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(workdir, 'lab6.sqlite'),
+        'UPLOAD_FOLDER': upload_folder,
+    })
+
+    with app.app_context():
+        db.create_all()
+        password_hash = generate_password_hash('password')
+        users = [User(first_name=f'Имя{i}', last_name=f'Фамилия{i}', login=f'bench{i}',
+                      password_hash=password_hash) for i in range(20)]
+        categories = [Category(name=name) for name in ('Программирование', 'Математика', 'Языкознание')]
+        images = [Image(id=f'bench-{i}', file_name=f'bench-{i}.jpg', mime_type='image/jpeg',
+                        md5_hash=f'bench-{i}') for i in range(5)]
+        db.session.add_all(users + categories + images)
+        db.session.flush()
+        for image in images:
+            with open(os.path.join(upload_folder, image.storage_filename), 'wb') as f:
+                f.write(os.urandom(20 * 1024))
+
+        course_rows = [Course(name=f'Курс {i}', short_desc='Краткое описание', full_desc='Полное описание',
+                              category=random.choice(categories), author=random.choice(users),
+                              bg_image=random.choice(images)) for i in range(courses)]
+        db.session.add_all(course_rows)
+        db.session.flush()
+        # Один пользователь оставляет не больше одного отзыва на курс
+        pairs = random.sample([(c, u) for c in course_rows for u in users], min(reviews, courses * len(users)))
+        for course, user in pairs:
+            rating = random.randint(0, 5)
+            db.session.add(Review(course=course, user=user, rating=rating,
+                                  text='Сгенерированный отзыв для нагрузочного теста.'))
+            course.rating_sum += rating
+            course.rating_num += 1
+        db.session.commit()
+
+        dataset = {
+            'course_ids': [c.id for c in course_rows],
+            'course_pages': max(1, courses // 20),
+            'image_ids': [i.id for i in images],
+            'lab6_logins': [u.login for u in users],
+        }
+    return app, dataset
+
+
+def boot(args, workdir):
+    fake_db = FakeDatabase(users=args.lab5_users, visit_logs=args.visit_logs, latency=args.db_latency,
+                           seed=args.seed)
+    patcher = patch('mysql.connector.connect', side_effect=fake_db.connect)
+    patcher.start()
+
+    import app as combined
+    lab6_app, dataset = build_lab6(workdir, args.courses, args.reviews)
+    # Та же настройка, что у смонтированного lab6: метрики, статика, серверные сессии
+    combined.configure('/lab6', lab6_app)
+    combined.mounts['/lab6'] = combined.app.mounts['/lab6'] = lab6_app
+
+    dataset['visit_log_pages'] = max(3, args.visit_logs // 10)
+    return combined.application, dataset, patcher
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(args, application, dataset):
+    scenarios = Scenarios(dataset)
+    names = list(Scenarios.WEIGHTS)
+    weights = [Scenarios.WEIGHTS[name] for name in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def virtual_user():
+        transport = HTTPTransport(args.url) if args.url else WSGITransport(application)
+        while time.monotonic() < deadline:
+            name = random.choices(names, weights)[0]
+            for method, path, data in getattr(scenarios, name)(transport):
+                started = time.perf_counter()
+                try:
+                    status, _, location = transport.request(method, path, data)
+                    failed = is_failure(status, location)
+                except Exception:
+                    failed = True
+                elapsed = time.perf_counter() - started
+                with lock:
+                    samples[name].append(elapsed)
+                    errors[name] += int(failed)
+            if args.think_time:
+                time.sleep(random.uniform(0, args.think_time))
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=virtual_user) for _ in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+
+    report = {}
+    for name in names + ['total']:
+        values = sorted(sum(samples.values(), []) if name == 'total' else samples[name])
+        report[name] = {
+            'requests': len(values),
+            'errors': sum(errors.values()) if name == 'total' else errors[name],
+            'rps': len(values) / wall,
+            'p50': percentile(values, 0.50) * 1000,
+            'p95': percentile(values, 0.95) * 1000,
+            'p99': percentile(values, 0.99) * 1000,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"{'scenario':<20}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in report.items():
+        print(f"{name:<20}{row['requests']:>10}{row['errors']:>8}{row['rps']:>10.1f}"
+              f"{row['p50']:>10.1f}{row['p95']:>10.1f}{row['p99']:>10.1f}")
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for name, row in report.items():
+        base = baseline.get(name)
+        if not base or not row['requests']:
+            continue
+        if row['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: rps {row['rps']:.1f} < baseline {base['rps']:.1f}")
+        for key in ('p50', 'p95', 'p99'):
+            if row[key] > base[key] * (1 + tolerance):
+                regressions.append(f'{name}: {key} {row[key]:.1f}ms > baseline {base[key]:.1f}ms')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10, help='number of concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=15, help='test duration in seconds')
+    parser.add_argument('--think-time', type=float, default=0.0, help='max pause between scenarios')
+    parser.add_argument('--url', help='run against a live server instead of the in-process app')
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--reviews', type=int, default=5000)
+    parser.add_argument('--lab5-users', type=int, default=50)
+    parser.add_argument('--visit-logs', type=int, default=5000)
+    parser.add_argument('--image-id', action='append', help='lab6 image id to fetch in --url mode')
+    parser.add_argument('--lab6-login', action='append', help='lab6 login (password "password") in --url mode')
+    parser.add_argument('--db-latency', type=float, default=0.0, help='seconds added to each fake MySQL query')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    parser.add_argument('--save-baseline', help='write this run as a JSON baseline')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    if args.url:
+        # Живой сервер: идентификаторы берутся из уже заполненной БД
+        dataset = {
+            'course_ids': list(range(1, args.courses + 1)),
+            'course_pages': max(1, args.courses // 20),
+            'image_ids': args.image_id or ['missing'],
+            'lab6_logins': args.lab6_login or ['user'],
+            'visit_log_pages': max(3, args.visit_logs // 10),
+        }
+        report = run(args, None, dataset)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            application, dataset, patcher = boot(args, workdir)
+            try:
+                report = run(args, application, dataset)
+            finally:
+                patcher.stop()
+
+    print_report(report)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print('REGRESSION', line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
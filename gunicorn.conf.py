@@ -0,0 +1,51 @@
+# Конфигурация gunicorn для объединённого приложения (app:application).
+# Параметры можно переопределить переменными окружения GUNICORN_*.
+import multiprocessing
+import os
+
+WORKER_CLASSES = ('sync', 'gthread', 'gevent')
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class not in WORKER_CLASSES:
+    raise ValueError(f'GUNICORN_WORKER_CLASS must be one of {", ".join(WORKER_CLASSES)}')
+
+# sync: один запрос на воркер, поэтому воркеров больше;
+# gthread: воркеров по числу ядер, запросы внутри воркера обслуживают потоки
+default_workers = cpu_count * 2 + 1 if worker_class == 'sync' else cpu_count + 1
+workers = int(os.environ.get('GUNICORN_WORKERS', default_workers))
+threads = int(os.environ.get('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Приложение импортируется один раз в мастере, воркеры получают его через fork
+# и делят неизменённые страницы памяти. gevent должен пропатчить модули до
+# импорта приложения, поэтому с ним предзагрузка отключена.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1' and worker_class != 'gevent'
+
+# Периодический перезапуск воркеров от утечек памяти; разброс не дает
+# всем воркерам уйти на перезапуск одновременно
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    import app
+    app.reset_after_fork()
+    server.log.info('Worker %s: database state reset after fork', worker.pid)
+
+
+def child_exit(server, worker):
+    # Модуль метрик не тянет за собой приложение, поэтому годится и без preload
+    from root_app import metrics
+    metrics.mark_process_dead(worker.pid)
@@ -1,5 +1,6 @@
 from flask import Flask
 from .db import dbConnector as db
+from .query_stats import queryStats
 
 def create_app(test_config=None):
     app = Flask(__name__, instance_relative_config=False)
@@ -9,9 +10,11 @@ def create_app(test_config=None):
         app.config.from_mapping(test_config)
 
     db.init_app(app)
+    queryStats.init_app(app)
 
-    from .cli import init_db_command
+    from .cli import init_db_command, migrate_command
     app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_command)
 
     from . import auth
     app.register_blueprint(auth.bp)
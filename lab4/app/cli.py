@@ -2,6 +2,7 @@ import click
 
 from flask import current_app
 from .db import dbConnector as db
+from .migrate import MigrationRunner
 
 @click.command('init-db')
 def init_db_command():
@@ -15,4 +16,21 @@ def init_db_command():
                     cursor.execute(statement)
                     
         connection.commit()
-    click.echo('Initialized the database.')
\ No newline at end of file
+    _run_migrations()
+    click.echo('Initialized the database.')
+
+def _run_migrations():
+    return MigrationRunner(db).migrate(current_app.config.get('MIGRATIONS_LOCK_TIMEOUT', 60),
+                                       current_app.config.get('MIGRATIONS_LOCK_WAIT_TIMEOUT', 10),
+                                       echo=click.echo)
+
+# Применяет к существующей базе изменения схемы без потери данных
+@click.command('migrate')
+@click.option('--status', 'show_status', is_flag=True, help='List migrations and whether they are applied.')
+def migrate_command(show_status):
+    if show_status:
+        for version, description, applied in MigrationRunner(db).status():
+            click.echo(f"{version}\t{'applied' if applied else 'pending'}\t{description}")
+        return
+    if not _run_migrations():
+        click.echo('Schema is up to date.')
\ No newline at end of file
@@ -1,5 +1,5 @@
 import mysql.connector
-from flask import g
+from flask import g, has_app_context
 
 class DBConnector:
     def __init__(self, app=None):
@@ -25,7 +25,9 @@ class DBConnector:
     
     def connect(self):
         if 'db' not in g:
-            g.db = mysql.connector.connect(**self._get_config())
+            connection = mysql.connector.connect(**self._get_config())
+            stats = self.app.extensions.get('query_stats')
+            g.db = stats.instrument(connection) if stats else connection
         return g.db
     
     def disconnect(self, e=None):
@@ -36,4 +38,13 @@ class DBConnector:
         except RuntimeError:
             pass
 
+    def reset(self):
+        # Вызывается в воркере gunicorn после fork. Соединение, открытое в мастере,
+        # принадлежит и родителю, поэтому его не закрываем, а только забываем
+        if has_app_context():
+            g.pop('db', None)
+        stats = self.app.extensions.get('query_stats')
+        if stats is not None:
+            stats.reset_after_fork()
+
 dbConnector = DBConnector()
\ No newline at end of file
@@ -0,0 +1,114 @@
+# Версионные миграции поверх schema.sql. schema.sql пересоздает все таблицы
+# и годится только для init-db; изменения рабочей базы добавляются сюда
+# новой версией в конец MIGRATIONS и применяются командой flask migrate.
+# Примененные версии хранятся в schema_migrations, шаги только вперед.
+
+
+class AddIndex:
+    def __init__(self, table, name, columns):
+        self.table = table
+        self.name = name
+        self.columns = columns
+
+    def describe(self):
+        return f"add index {self.name} on {self.table} ({', '.join(self.columns)})"
+
+    def apply(self, cursor):
+        if index_exists(cursor, self.table, self.name):
+            return False
+        # INPLACE + LOCK=NONE: индекс строится без блокировки записи в таблицу.
+        # Если MySQL не может построить его онлайн, ALTER завершится ошибкой,
+        # а не заблокирует таблицу на время копирования
+        columns = ', '.join(self.columns)
+        cursor.execute(f'ALTER TABLE {self.table} ADD INDEX {self.name} ({columns}), ALGORITHM=INPLACE, LOCK=NONE;')
+        return True
+
+
+class DropIndex:
+    def __init__(self, table, name):
+        self.table = table
+        self.name = name
+
+    def describe(self):
+        return f'drop index {self.name} on {self.table}'
+
+    def apply(self, cursor):
+        if not index_exists(cursor, self.table, self.name):
+            return False
+        cursor.execute(f'ALTER TABLE {self.table} DROP INDEX {self.name}, ALGORITHM=INPLACE, LOCK=NONE;')
+        return True
+
+
+def index_exists(cursor, table, name):
+    cursor.execute('SELECT 1 FROM information_schema.STATISTICS '
+                   'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1;',
+                   (table, name))
+    return cursor.fetchone() is not None
+
+
+# (версия, описание, шаги). Уже примененные версии не менять -- только добавлять новые
+MIGRATIONS = [
+    ('0001', 'Index users by last name', [
+        AddIndex('users', 'ix_users_last_name', ['last_name']),
+    ]),
+]
+
+
+class MigrationRunner:
+    def __init__(self, db_connector, migrations=None):
+        self.db_connector = db_connector
+        self.migrations = MIGRATIONS if migrations is None else migrations
+
+    def ensure_table(self, cursor):
+        cursor.execute('CREATE TABLE IF NOT EXISTS schema_migrations ('
+                       'version VARCHAR(64) PRIMARY KEY, '
+                       'description VARCHAR(255) NOT NULL, '
+                       'applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP'
+                       ') ENGINE INNODB;')
+
+    def get_applied(self, cursor):
+        cursor.execute('SELECT version FROM schema_migrations;')
+        return {row[0] for row in cursor.fetchall()}
+
+    def status(self):
+        connection = self.db_connector.connect()
+        with connection.cursor() as cursor:
+            self.ensure_table(cursor)
+            applied = self.get_applied(cursor)
+        return [(version, description, version in applied) for version, description, _ in self.migrations]
+
+    def migrate(self, lock_timeout=60, lock_wait_timeout=10, echo=None):
+        connection = self.db_connector.connect()
+        applied_now = []
+        with connection.cursor() as cursor:
+            # Два одновременных запуска (например, при выкладке на несколько
+            # серверов) не должны строить один индекс дважды
+            cursor.execute("SELECT GET_LOCK(CONCAT(DATABASE(), '.schema_migrations'), %s);", (lock_timeout,))
+            if cursor.fetchone()[0] != 1:
+                raise RuntimeError('Another migration is running')
+            try:
+                # ALTER ждет metadata lock за долгими транзакциями, а новые запросы
+                # к таблице встают в очередь за ним -- лучше быстро упасть и повторить
+                cursor.execute('SET SESSION lock_wait_timeout = %s;', (lock_wait_timeout,))
+                self.ensure_table(cursor)
+                applied = self.get_applied(cursor)
+                for version, description, steps in self.migrations:
+                    if version in applied:
+                        continue
+                    # DDL в MySQL не откатывается: если шаг упал, версия не записывается,
+                    # а при повторном запуске уже выполненные шаги пропускаются
+                    for step in steps:
+                        changed = step.apply(cursor)
+                        if echo is not None:
+                            echo(f"  {step.describe()}{'' if changed else ' (already done)'}")
+                    cursor.execute('INSERT INTO schema_migrations (version, description) VALUES (%s, %s);',
+                                   (version, description))
+                    connection.commit()
+                    applied_now.append(version)
+                    if echo is not None:
+                        echo(f'Applied {version}: {description}')
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(CONCAT(DATABASE(), '.schema_migrations'));")
+                cursor.fetchone()
+        return applied_now
+
@@ -0,0 +1,16 @@
+from app.migrate import MigrationRunner, MIGRATIONS, index_exists
+
+def test_migrate_adds_indexes_once(app, db_connector):
+    with app.app_context():
+        runner = MigrationRunner(db_connector)
+        runner.migrate()
+
+        with db_connector.connect().cursor() as cursor:
+            assert index_exists(cursor, 'users', 'ix_users_last_name')
+
+        assert runner.migrate() == []
+        assert all(applied for _, _, applied in runner.status())
+
+def test_migration_versions_are_unique_and_ordered():
+    versions = [version for version, _, _ in MIGRATIONS]
+    assert versions == sorted(set(versions))
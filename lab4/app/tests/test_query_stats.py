@@ -0,0 +1,64 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.query_stats import InstrumentedConnection, fingerprint, queryStats
+
+@pytest.fixture
+def stats(app):
+    queryStats.reset()
+    yield queryStats
+    queryStats.reset()
+
+@pytest.fixture
+def raw_connection():
+    connection = MagicMock()
+    cursor = MagicMock()
+    cursor.rowcount = -1
+    connection.cursor.return_value = cursor
+    cursor.__enter__.return_value = cursor
+    return connection
+
+def test_fingerprint_normalizes_literals():
+    query = "SELECT * FROM users WHERE id = %s AND username = 'admin' AND role_id IN (1, 2);"
+    assert fingerprint(query) == 'SELECT * FROM users WHERE id = ? AND username = ? AND role_id IN (...)'
+
+def test_instrumented_cursor_records_rows(app, stats, raw_connection):
+    raw_connection.cursor.return_value.fetchall.return_value = [(1,), (2,)]
+
+    connection = InstrumentedConnection(raw_connection, stats)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT id FROM roles')
+        cursor.fetchall()
+
+    totals = stats.snapshot()['SELECT id FROM roles']
+    assert totals['count'] == 1
+    assert totals['rows'] == 2
+
+def test_query_log_is_capped(app, stats, raw_connection, monkeypatch):
+    monkeypatch.setitem(app.config, 'SQL_DEBUG_PANEL', True)
+    monkeypatch.setitem(app.config, 'SQL_DEBUG_PANEL_LIMIT', 2)
+
+    connection = InstrumentedConnection(raw_connection, stats)
+    with app.app_context():
+        with connection.cursor() as cursor:
+            for i in range(5):
+                cursor.execute('SELECT * FROM users WHERE id = %s', (i,))
+        context = stats._context_processor()
+
+    assert len(context['query_log']) == 2
+    assert context['query_summary']['count'] == 5
+
+def test_metrics_requires_login(client):
+    response = client.get('/metrics')
+    assert response.status_code == 302
+    assert '/auth/login' in response.location
+
+def test_metrics_for_logged_in_user(logged_in_client, stats, raw_connection):
+    connection = InstrumentedConnection(raw_connection, stats)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT * FROM roles')
+
+    response = logged_in_client.get('/metrics')
+    assert response.status_code == 200
+    assert 'sql_queries_total{fingerprint="SELECT * FROM roles"} 1' in response.text
@@ -1,5 +1,8 @@
 from flask import Flask
 from .db import dbConnector as db
+from .query_stats import queryStats
+from .visit_sketches import visitSketches
+from .user_deletion import userDeletions
 
 def create_app(test_config=None):
     app = Flask(__name__, instance_relative_config=False)
@@ -9,9 +12,21 @@ def create_app(test_config=None):
         app.config.from_mapping(test_config)
 
     db.init_app(app)
+    queryStats.init_app(app)
+    visitSketches.init_app(app)
+    userDeletions.init_app(app)
 
-    from .cli import init_db_command
+    from .cli import (init_db_command, migrate_command, create_partitions_command, prune_visit_logs_command,
+                      export_visit_logs_command, visit_report_command, process_user_deletions_command,
+                      seed_command)
     app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(create_partitions_command)
+    app.cli.add_command(prune_visit_logs_command)
+    app.cli.add_command(export_visit_logs_command)
+    app.cli.add_command(visit_report_command)
+    app.cli.add_command(process_user_deletions_command)
+    app.cli.add_command(seed_command)
 
     from . import auth
     app.register_blueprint(auth.bp)
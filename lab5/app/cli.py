@@ -1,11 +1,21 @@
+import os
+import time
+from datetime import date, timedelta
+
 import click
 
 from flask import current_app
+from flask.cli import with_appcontext
 from .db import dbConnector as db
+from .migrate import MigrationRunner
+from .repositories.user_repository import UserRepository
+from .repositories.visit_log_repository import VisitLogRepository
 
+# Новая база проходит те же миграции, что и рабочая; существующие данные не удаляются
 @click.command('init-db')
 def init_db_command():
-    with current_app.open_resource('schema.sql') as f:
+    _run_migrations()
+    with current_app.open_resource('default_data.sql') as f:
         connection = db.connect()
         with connection.cursor() as cursor:
             sql_script = f.read().decode('utf8')
@@ -15,4 +25,142 @@ def init_db_command():
                     cursor.execute(statement)
                     
         connection.commit()
-    click.echo('Initialized the database.')
\ No newline at end of file
+    VisitLogRepository(db).create_partitions(current_app.config.get('VISIT_LOGS_PARTITIONS_AHEAD', 3))
+    click.echo('Initialized the database.')
+
+def _run_migrations():
+    return MigrationRunner(db).migrate(current_app.config.get('MIGRATIONS_LOCK_TIMEOUT', 60),
+                                       current_app.config.get('MIGRATIONS_LOCK_WAIT_TIMEOUT', 10),
+                                       echo=click.echo)
+
+# Применяет к существующей базе изменения схемы без потери данных
+@click.command('migrate')
+@click.option('--status', 'show_status', is_flag=True, help='List migrations and whether they are applied.')
+@with_appcontext
+def migrate_command(show_status):
+    if show_status:
+        for version, description, applied in MigrationRunner(db).status():
+            click.echo(f"{version}\t{'applied' if applied else 'pending'}\t{description}")
+        return
+    if not _run_migrations():
+        click.echo('Schema is up to date.')
+
+# Запускать по расписанию (cron) раз в сутки или неделю:
+#   flask --app app create-partitions && flask --app app prune-visit-logs
+@click.command('create-partitions')
+@click.option('--months-ahead', type=int, default=None, help='How many months after the current one to prepare.')
+@with_appcontext
+def create_partitions_command(months_ahead):
+    if months_ahead is None:
+        months_ahead = current_app.config.get('VISIT_LOGS_PARTITIONS_AHEAD', 3)
+    created = VisitLogRepository(db).create_partitions(months_ahead)
+    click.echo(f"Created partitions: {', '.join(created)}" if created else 'Partitions are up to date.')
+
+@click.command('prune-visit-logs')
+@click.option('--keep-months', type=int, default=None, help='Full months of visit logs to keep before the current one.')
+@click.option('--archive/--drop', default=False,
+              help='Move expired partitions into visit_logs_archive_<YYYYMM> tables instead of dropping them.')
+@with_appcontext
+def prune_visit_logs_command(keep_months, archive):
+    if keep_months is None:
+        keep_months = current_app.config.get('VISIT_LOGS_RETENTION_MONTHS', 12)
+    repository = VisitLogRepository(db)
+    expired = repository.get_expired_partitions(keep_months)
+    if not expired:
+        click.echo('Nothing to prune.')
+        return
+    if archive:
+        for name in expired:
+            click.echo(f'Archived {name} into {repository.archive_partition(name)}.')
+    else:
+        repository.drop_partitions(expired)
+        click.echo(f"Dropped partitions: {', '.join(expired)}")
+
+def _archive_dir():
+    return current_app.config.get('VISIT_LOGS_ARCHIVE_DIR') or os.path.join(current_app.instance_path, 'visit_logs_archive')
+
+# Выгрузка перед prune-visit-logs: закрытые месяцы из разделов visit_logs и
+# таблиц visit_logs_archive_<ГГГГММ> в файлы архива
+@click.command('export-visit-logs')
+@click.option('--month', type=click.DateTime(['%Y-%m']), default=None, help='Export only this month (YYYY-MM).')
+@click.option('--force', is_flag=True, help='Overwrite files that already exist.')
+@with_appcontext
+def export_visit_logs_command(month, force):
+    from .visit_archive import closed_months, export_month
+
+    visit_log_repository = VisitLogRepository(db)
+    months = closed_months(visit_log_repository)
+    if month is not None:
+        month = month.date()
+        months = {month: months.get(month)}
+    directory = _archive_dir()
+    for window, source in months.items():
+        count = export_month(visit_log_repository, UserRepository(db), directory, window, source=source, force=force)
+        if count is None:
+            click.echo(f'{window:%Y-%m}: already exported.')
+        else:
+            click.echo(f"{window:%Y-%m}: {count} visits from {source or 'visit_logs'}.")
+
+@click.command('visit-report')
+@click.argument('report', type=click.Choice(['pages', 'users', 'hourly']))
+@click.option('--from', 'date_from', type=click.DateTime(['%Y-%m-%d']), default=None)
+@click.option('--to', 'date_to', type=click.DateTime(['%Y-%m-%d']), default=None, help='Exclusive end date.')
+@click.option('--top', type=int, default=None)
+@with_appcontext
+def visit_report_command(report, date_from, date_to, top):
+    from . import visit_analytics
+
+    frame = visit_analytics.load(_archive_dir(),
+                                 date_from.date() if date_from else None,
+                                 date_to.date() if date_to else None)
+    if report == 'pages':
+        for row in visit_analytics.page_report(frame, top):
+            click.echo(f"{row['visit_count']}\t{row['path']}")
+    elif report == 'users':
+        for row in visit_analytics.user_report(frame, top):
+            click.echo(f"{row['visit_count']}\t{row['user']}")
+    else:
+        for hour, count in enumerate(visit_analytics.hourly_traffic(frame)):
+            click.echo(f'{hour:02d}:00\t{count}')
+
+@click.command('process-user-deletions')
+@with_appcontext
+def process_user_deletions_command():
+    from .user_deletion import userDeletions
+
+    processed = userDeletions.run_pending()
+    click.echo(f"Deleted users: {', '.join(map(str, processed))}" if processed else 'No pending user deletions.')
+
+# Таблицы production-размера для профилирования: пользователи и посещения
+# за последние --days дней (по умолчанию до вчерашнего дня включительно)
+@click.command('seed')
+@click.option('--users', 'user_count', type=int, default=1000, show_default=True, help='Users to add.')
+@click.option('--visits', 'visit_count', type=int, default=100000, show_default=True, help='Visit log rows to add.')
+@click.option('--days', type=int, default=365, show_default=True, help='Spread visits over this many days.')
+@click.option('--batch-size', type=int, default=10000, show_default=True, help='Rows per INSERT statement.')
+@click.option('--load-data', is_flag=True,
+              help='Load visits with LOAD DATA LOCAL INFILE (needs local_infile=ON on the server).')
+@click.option('--seed', 'random_seed', type=int, default=None, help='Random seed for reproducible data.')
+@with_appcontext
+def seed_command(user_count, visit_count, days, batch_size, load_data, random_seed):
+    from .seed import Seeder
+
+    seeder = Seeder(db, seed=random_seed, batch_size=batch_size, load_data=load_data)
+    date_from = date.today() - timedelta(days=days)
+
+    started = time.monotonic()
+    if user_count:
+        seeder.seed_users(user_count, date_from)
+        click.echo(f'Added {user_count} users in {time.monotonic() - started:.1f}s.')
+
+    if visit_count:
+        started = time.monotonic()
+        step = max(visit_count // 10, batch_size)
+
+        def progress(written):
+            if written % step < batch_size or written == visit_count:
+                elapsed = time.monotonic() - started
+                click.echo(f'  {written}/{visit_count} visits, {written / max(elapsed, 1e-9) * 60:,.0f} rows/min')
+
+        written = seeder.seed_visits(visit_count, date_from, days, progress)
+        click.echo(f'Added {written} visits in {time.monotonic() - started:.1f}s.')
@@ -1,35 +1,161 @@
+import functools
+import logging
+import time
+from contextlib import contextmanager
+
 import mysql.connector
-from flask import g
+from flask import g, has_app_context
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'primary'
+REPORTING = 'reporting'
+
 
 class DBConnector:
+    # Роли соединений: primary -- основная база (все записи), reporting --
+    # реплика для тяжелых отчетов. Реплика задается MYSQL_REPORTING (словарь
+    # с host/port/user/password/database поверх основных настроек); без нее
+    # отчеты идут на основную базу. Реплика, отставшая больше
+    # MYSQL_REPORTING_MAX_LAG секунд или недоступная, временно не используется.
     def __init__(self, app=None):
+        self._lag_checked_at = 0.0
+        self._reporting_ok = False
+        self._reporting_retry_at = 0.0
         if app is not None:
             self.init_app(app)
 
     def init_app(self, app):
         self.app = app
+        app.config.setdefault('MYSQL_REPORTING', None)
+        app.config.setdefault('MYSQL_REPORTING_MAX_LAG', 30)
+        app.config.setdefault('MYSQL_REPORTING_CHECK_INTERVAL', 5)
+        app.config.setdefault('MYSQL_REPORTING_RETRY_SECONDS', 30)
         if not hasattr(app, 'extensions'):
             app.extensions = {}
         if 'db_connector' not in app.extensions:
             app.extensions['db_connector'] = self
             app.teardown_appcontext(self.disconnect)
 
-    def _get_config(self):
-        return {
+    def _get_config(self, role=PRIMARY):
+        config = {
             'user': self.app.config["MYSQL_USER"],
             'password': self.app.config["MYSQL_PASSWORD"],
             'host': self.app.config["MYSQL_HOST"],
             'database': self.app.config["MYSQL_DATABASE"]
         }
-    
-    def connect(self):
-        if 'db' not in g:
-            g.db = mysql.connector.connect(**self._get_config())
-        return g.db
-    
+        if role == REPORTING:
+            config.update(self.app.config['MYSQL_REPORTING'] or {})
+        return config
+
+    def connect(self, role=None):
+        role = role or g.get('db_role', PRIMARY)
+        if role == REPORTING and not self._reporting_available():
+            role = PRIMARY
+        if role == PRIMARY:
+            return self._open(PRIMARY)
+        try:
+            return self._open(role)
+        except mysql.connector.Error:
+            logger.exception('Reporting replica is unavailable, using primary')
+            self._mark_reporting_down()
+            return self._open(PRIMARY)
+
+    def _open(self, role):
+        key = 'db' if role == PRIMARY else f'db_{role}'
+        if key not in g:
+            connection = mysql.connector.connect(**self._get_config(role))
+            stats = self.app.extensions.get('query_stats')
+            setattr(g, key, stats.instrument(connection) if stats else connection)
+        return g.get(key)
+
+    @contextmanager
+    def role(self, role):
+        # Соединения, которые репозиторий возьмет внутри блока, будут этой роли
+        previous = g.get('db_role')
+        g.db_role = role
+        try:
+            yield
+        finally:
+            g.db_role = previous
+
+    def _reporting_available(self):
+        if not self.app.config['MYSQL_REPORTING']:
+            return False
+        now = time.monotonic()
+        if now < self._reporting_retry_at:
+            return False
+        if now - self._lag_checked_at < self.app.config['MYSQL_REPORTING_CHECK_INTERVAL']:
+            return self._reporting_ok
+        # Отставание проверяется не чаще раза в MYSQL_REPORTING_CHECK_INTERVAL на процесс
+        self._lag_checked_at = now
+        self._reporting_ok = False
+        try:
+            lag = self.get_replica_lag(self._open(REPORTING))
+        except mysql.connector.Error:
+            logger.exception('Reporting replica is unavailable, using primary')
+            self._mark_reporting_down()
+            return False
+        max_lag = self.app.config['MYSQL_REPORTING_MAX_LAG']
+        # lag is None: репликация остановлена
+        self._reporting_ok = lag is not None and lag <= max_lag
+        if not self._reporting_ok:
+            logger.warning('Reporting replica lag %s s exceeds %s s, using primary', lag, max_lag)
+        return self._reporting_ok
+
+    def _mark_reporting_down(self):
+        self._reporting_ok = False
+        self._reporting_retry_at = time.monotonic() + self.app.config['MYSQL_REPORTING_RETRY_SECONDS']
+        bad = g.pop(f'db_{REPORTING}', None)
+        if bad is not None:
+            try:
+                bad.close()
+            except mysql.connector.Error:
+                pass
+
+    def get_replica_lag(self, connection):
+        """Отставание реплики в секундах, 0 -- если сервер не реплика."""
+        with connection.cursor(dictionary=True) as cursor:
+            try:
+                cursor.execute('SHOW REPLICA STATUS')
+            except mysql.connector.Error:
+                # MySQL до 8.0.22
+                cursor.execute('SHOW SLAVE STATUS')
+            rows = cursor.fetchall()
+        if not rows:
+            return 0
+        status = rows[0]
+        return status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+
+    def open_connection(self, **options):
+        # Отдельное соединение в обход g, например с allow_local_infile для LOAD DATA
+        return mysql.connector.connect(**self._get_config(), **options)
+
     def disconnect(self, e=None):
-        if 'db' in g:
-            g.db.close()
-        g.pop('db', None)
+        for key in ('db', f'db_{REPORTING}'):
+            if key in g:
+                g.pop(key).close()
+        g.pop('db_role', None)
+
+    def reset(self):
+        # Вызывается в воркере gunicorn после fork. Соединение, открытое в мастере,
+        # принадлежит и родителю, поэтому его не закрываем, а только забываем
+        if has_app_context():
+            g.pop('db', None)
+            g.pop(f'db_{REPORTING}', None)
+        self._lag_checked_at = 0.0
+        stats = self.app.extensions.get('query_stats')
+        if stats is not None:
+            stats.reset_after_fork()
+
+
+def read_only(method):
+    """Метод репозитория только читает: его запросы можно отдать реплике отчетов."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.db_connector.role(REPORTING):
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
-dbConnector = DBConnector()
\ No newline at end of file
+dbConnector = DBConnector()
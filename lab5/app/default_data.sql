@@ -0,0 +1,13 @@
+-- Начальные данные для init-db, таблицы создают миграции (migrate.py).
+-- INSERT IGNORE: повторный init-db не трогает уже существующие строки
+INSERT IGNORE INTO roles (id, name, description) VALUES (1, 'admin', 'Administrator with full rights');
+INSERT IGNORE INTO roles (id, name, description) VALUES (2, 'user', 'Regular user with limited rights');
+
+-- Admin user
+INSERT IGNORE INTO users (username, first_name, last_name, password_hash, role_id)
+VALUES ('admin', 'Иван', 'Иванов', SHA2('qwerty', 256), 1);
+-- Regular users
+INSERT IGNORE INTO users (username, first_name, last_name, password_hash, role_id)
+VALUES ('user1', 'Петр', 'Петров', SHA2('password123', 256), 2);
+INSERT IGNORE INTO users (username, first_name, last_name, password_hash, role_id)
+VALUES ('user2', 'Анна', 'Сидорова', SHA2('securepass', 256), 2);
@@ -0,0 +1,341 @@
+# Версионные миграции схемы. Версия 0001 -- исходная схема лабораторной,
+# остальные -- изменения поверх нее; и новая база (init-db), и рабочая
+# (flask migrate) проходят одни и те же шаги. Изменение схемы добавляется
+# новой версией в конец MIGRATIONS. Примененные версии хранятся в
+# schema_migrations, шаги только вперед.
+from datetime import date
+
+from .repositories.visit_log_repository import MAX_PARTITION, add_months, month_start, partition_name
+
+
+class AddIndex:
+    def __init__(self, table, name, columns, unique=False):
+        self.table = table
+        self.name = name
+        self.columns = columns
+        self.unique = unique
+
+    def describe(self):
+        kind = 'unique index' if self.unique else 'index'
+        return f"add {kind} {self.name} on {self.table} ({', '.join(self.columns)})"
+
+    def apply(self, cursor):
+        if index_exists(cursor, self.table, self.name):
+            return False
+        # INPLACE + LOCK=NONE: индекс строится без блокировки записи в таблицу.
+        # Если MySQL не может построить его онлайн, ALTER завершится ошибкой,
+        # а не заблокирует таблицу на время копирования
+        columns = ', '.join(self.columns)
+        kind = 'UNIQUE INDEX' if self.unique else 'INDEX'
+        cursor.execute(f'ALTER TABLE {self.table} ADD {kind} {self.name} ({columns}), ALGORITHM=INPLACE, LOCK=NONE;')
+        return True
+
+
+class DropIndex:
+    def __init__(self, table, name):
+        self.table = table
+        self.name = name
+
+    def describe(self):
+        return f'drop index {self.name} on {self.table}'
+
+    def apply(self, cursor):
+        if not index_exists(cursor, self.table, self.name):
+            return False
+        cursor.execute(f'ALTER TABLE {self.table} DROP INDEX {self.name}, ALGORITHM=INPLACE, LOCK=NONE;')
+        return True
+
+
+class CreateTable:
+    def __init__(self, name, definition):
+        self.name = name
+        self.definition = definition
+
+    def describe(self):
+        return f'create table {self.name}'
+
+    def apply(self, cursor):
+        if table_exists(cursor, self.name):
+            return False
+        cursor.execute(f'CREATE TABLE {self.name} ({self.definition}) ENGINE INNODB;')
+        return True
+
+
+class AddColumn:
+    def __init__(self, table, name, definition):
+        self.table = table
+        self.name = name
+        self.definition = definition
+
+    def describe(self):
+        return f'add column {self.name} to {self.table}'
+
+    def apply(self, cursor):
+        if column_exists(cursor, self.table, self.name):
+            return False
+        cursor.execute(f'ALTER TABLE {self.table} ADD COLUMN {self.name} {self.definition}, '
+                       f'ALGORITHM=INPLACE, LOCK=NONE;')
+        return True
+
+
+def _in_id_windows(cursor, table, sql, first_id=0, batch_size=10000):
+    # sql выполняется для окон id (first_id, first_id + batch_size], ...; каждое
+    # окно -- своя короткая транзакция, блокировки строк не копятся
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table};')
+    max_id = cursor.fetchone()[0]
+    while first_id < max_id:
+        cursor.execute(sql, (first_id, first_id + batch_size))
+        cursor.execute('COMMIT;')
+        first_id += batch_size
+    return max_id
+
+
+class InternVisitLogPaths:
+    """Словарь paths и visit_logs.path_id из старого столбца visit_logs.path."""
+
+    def __init__(self, batch_size=10000):
+        self.batch_size = batch_size
+
+    def describe(self):
+        return 'fill paths and visit_logs.path_id from visit_logs.path'
+
+    def apply(self, cursor):
+        if not column_exists(cursor, 'visit_logs', 'path'):
+            return False
+        self.backfill(cursor)
+        return True
+
+    def backfill(self, cursor):
+        # Без псевдонимов таблиц: те же запросы выполняются под LOCK TABLES
+        cursor.execute('INSERT IGNORE INTO paths (path) '
+                       'SELECT DISTINCT path COLLATE utf8mb4_bin FROM visit_logs WHERE path_id IS NULL;')
+        cursor.execute('COMMIT;')
+        cursor.execute('SELECT COALESCE(MIN(id), 1) - 1 FROM visit_logs WHERE path_id IS NULL;')
+        _in_id_windows(cursor, 'visit_logs',
+                       'UPDATE visit_logs JOIN paths ON paths.path = visit_logs.path COLLATE utf8mb4_bin '
+                       'SET visit_logs.path_id = paths.id '
+                       'WHERE visit_logs.id > %s AND visit_logs.id <= %s AND visit_logs.path_id IS NULL;',
+                       cursor.fetchone()[0], self.batch_size)
+
+
+VISIT_LOGS_COLUMNS = """
+    id INT NOT NULL AUTO_INCREMENT,
+    path_id INT NOT NULL,
+    route_id INT DEFAULT NULL,
+    user_id INT DEFAULT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at),
+    KEY ix_visit_logs_user_id (user_id),
+    KEY ix_visit_logs_path_id (path_id),
+    KEY ix_visit_logs_route_id (route_id)
+"""
+
+
+class PartitionVisitLogs:
+    """Перестраивает visit_logs в таблицу с помесячными разделами.
+
+    Ключ разбиения должен входить в первичный ключ, а внешние ключи в разбитых
+    таблицах не поддерживаются, поэтому ALTER ... PARTITION BY здесь не подходит:
+    строки копируются пачками в новую таблицу visit_logs_new, последние
+    дописываются под LOCK TABLES, и таблицы меняются местами. Старый столбец
+    path при копировании отбрасывается.
+    """
+
+    def __init__(self, months_ahead=3, batch_size=10000, today=None):
+        self.months_ahead = months_ahead
+        self.batch_size = batch_size
+        self.today = today
+
+    def describe(self):
+        return 'rebuild visit_logs with monthly partitions'
+
+    def apply(self, cursor):
+        if is_partitioned(cursor, 'visit_logs'):
+            return False
+        # Остаток прерванного запуска: копирование начинается заново
+        cursor.execute('DROP TABLE IF EXISTS visit_logs_new;')
+        cursor.execute(f'CREATE TABLE visit_logs_new ({VISIT_LOGS_COLUMNS}) ENGINE INNODB '
+                       f'PARTITION BY RANGE COLUMNS (created_at) ({self.partitions(cursor)});')
+
+        has_path = column_exists(cursor, 'visit_logs', 'path')
+        copy = ('INSERT INTO visit_logs_new (id, path_id, route_id, user_id, created_at) '
+                'SELECT id, path_id, route_id, user_id, COALESCE(created_at, CURRENT_TIMESTAMP) FROM visit_logs '
+                'WHERE id > %s AND id <= %s;')
+        copied = _in_id_windows(cursor, 'visit_logs', copy, 0, self.batch_size)
+
+        # Строки, записанные во время копирования. Запись в таблицу блокируется
+        # только на время дописывания и переименования
+        cursor.execute('LOCK TABLES visit_logs WRITE, visit_logs_new WRITE, paths WRITE;')
+        try:
+            if has_path:
+                # Старая версия приложения могла записать путь без path_id
+                InternVisitLogPaths(self.batch_size).backfill(cursor)
+            _in_id_windows(cursor, 'visit_logs', copy, copied, self.batch_size)
+            cursor.execute('RENAME TABLE visit_logs TO visit_logs_old, visit_logs_new TO visit_logs;')
+        finally:
+            cursor.execute('UNLOCK TABLES;')
+        cursor.execute('DROP TABLE visit_logs_old;')
+        return True
+
+    def partitions(self, cursor):
+        # Разделы с месяца самой старой записи до months_ahead месяцев вперед
+        current = month_start(self.today or date.today())
+        cursor.execute('SELECT MIN(created_at) FROM visit_logs;')
+        oldest = cursor.fetchone()[0]
+        month = min(month_start(oldest), current) if oldest is not None else current
+        definitions = []
+        while month <= add_months(current, self.months_ahead):
+            bound = add_months(month, 1)
+            definitions.append(f"PARTITION {partition_name(month)} VALUES LESS THAN ('{bound:%Y-%m-%d}')")
+            month = add_months(month, 1)
+        definitions.append(f'PARTITION {MAX_PARTITION} VALUES LESS THAN (MAXVALUE)')
+        return ', '.join(definitions)
+
+
+def index_exists(cursor, table, name):
+    cursor.execute('SELECT 1 FROM information_schema.STATISTICS '
+                   'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s LIMIT 1;',
+                   (table, name))
+    return cursor.fetchone() is not None
+
+def table_exists(cursor, table):
+    cursor.execute('SELECT 1 FROM information_schema.TABLES '
+                   'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s LIMIT 1;', (table,))
+    return cursor.fetchone() is not None
+
+def column_exists(cursor, table, column):
+    cursor.execute('SELECT 1 FROM information_schema.COLUMNS '
+                   'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s LIMIT 1;',
+                   (table, column))
+    return cursor.fetchone() is not None
+
+def is_partitioned(cursor, table):
+    cursor.execute('SELECT 1 FROM information_schema.PARTITIONS '
+                   'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL LIMIT 1;',
+                   (table,))
+    return cursor.fetchone() is not None
+
+
+# (версия, описание, шаги). Уже примененные версии не менять -- только добавлять новые
+MIGRATIONS = [
+    # База, созданная до появления миграций, уже содержит эти таблицы
+    ('0001', 'Baseline schema', [
+        CreateTable('roles', 'id INTEGER PRIMARY KEY AUTO_INCREMENT, '
+                             'name VARCHAR(25) NOT NULL, '
+                             'description TEXT'),
+        CreateTable('users', 'id INTEGER PRIMARY KEY AUTO_INCREMENT, '
+                             'username VARCHAR(25) UNIQUE NOT NULL, '
+                             'first_name VARCHAR(25) NOT NULL, '
+                             'last_name VARCHAR(25) NOT NULL, '
+                             'middle_name VARCHAR(25) DEFAULT NULL, '
+                             'password_hash VARCHAR(255) NOT NULL, '
+                             'created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, '
+                             'role_id INTEGER, '
+                             'FOREIGN KEY (role_id) REFERENCES roles(id)'),
+        CreateTable('visit_logs', 'id INT PRIMARY KEY AUTO_INCREMENT, '
+                                  'path VARCHAR(100) NOT NULL, '
+                                  'user_id INT DEFAULT NULL, '
+                                  'created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, '
+                                  'FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL'),
+    ]),
+    # Словарь путей вместо строки пути в каждой записи журнала
+    ('0002', 'Intern visit log paths and record route templates', [
+        CreateTable('paths', 'id INT PRIMARY KEY AUTO_INCREMENT, '
+                             'path VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL, '
+                             'UNIQUE KEY uq_paths_path (path)'),
+        AddColumn('visit_logs', 'path_id', 'INT DEFAULT NULL'),
+        AddColumn('visit_logs', 'route_id', 'INT DEFAULT NULL'),
+        InternVisitLogPaths(),
+    ]),
+    # Помесячные разделы; внешний ключ на users заменяет отвязка записей приложением
+    ('0003', 'Partition visit_logs by month', [
+        PartitionVisitLogs(),
+    ]),
+    ('0004', 'Delete users in the background', [
+        AddColumn('users', 'deleted_at', 'DATETIME DEFAULT NULL'),
+        CreateTable('user_deletions', "user_id INT PRIMARY KEY, "
+                                      "username VARCHAR(25) NOT NULL, "
+                                      "status VARCHAR(10) NOT NULL DEFAULT 'pending', "
+                                      "total_rows INT DEFAULT NULL, "
+                                      "detached_rows INT NOT NULL DEFAULT 0, "
+                                      "requested_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+                                      "heartbeat_at DATETIME DEFAULT NULL, "
+                                      "finished_at DATETIME DEFAULT NULL, "
+                                      "KEY ix_user_deletions_status (status, requested_at)"),
+    ]),
+    ('0005', 'Indexes for visit log and user queries', [
+        # Журнал посещений и отчеты за период: ORDER BY / WHERE по created_at
+        AddIndex('visit_logs', 'ix_visit_logs_created_at', ['created_at']),
+        # Журнал пользователя по времени и отвязка записей при удалении;
+        # заменяет индекс только по user_id
+        AddIndex('visit_logs', 'ix_visit_logs_user_id_created_at', ['user_id', 'created_at']),
+        DropIndex('visit_logs', 'ix_visit_logs_user_id'),
+        AddIndex('users', 'ix_users_last_name', ['last_name']),
+    ]),
+    # Логин удаленного пользователя освобождается сразу, а не после фоновой
+    # очистки: уникален только среди неудаленных (NULL в уникальном индексе не повторяется)
+    ('0006', 'Unique usernames among active users', [
+        AddColumn('users', 'active_username', 'VARCHAR(25) AS (IF(deleted_at IS NULL, username, NULL)) VIRTUAL'),
+        AddIndex('users', 'uq_users_active_username', ['active_username'], unique=True),
+        DropIndex('users', 'username'),
+    ]),
+]
+
+class MigrationRunner:
+    def __init__(self, db_connector, migrations=None):
+        self.db_connector = db_connector
+        self.migrations = MIGRATIONS if migrations is None else migrations
+
+    def ensure_table(self, cursor):
+        cursor.execute('CREATE TABLE IF NOT EXISTS schema_migrations ('
+                       'version VARCHAR(64) PRIMARY KEY, '
+                       'description VARCHAR(255) NOT NULL, '
+                       'applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP'
+                       ') ENGINE INNODB;')
+
+    def get_applied(self, cursor):
+        cursor.execute('SELECT version FROM schema_migrations;')
+        return {row[0] for row in cursor.fetchall()}
+
+    def status(self):
+        connection = self.db_connector.connect()
+        with connection.cursor() as cursor:
+            self.ensure_table(cursor)
+            applied = self.get_applied(cursor)
+        return [(version, description, version in applied) for version, description, _ in self.migrations]
+
+    def migrate(self, lock_timeout=60, lock_wait_timeout=10, echo=None):
+        connection = self.db_connector.connect()
+        applied_now = []
+        with connection.cursor() as cursor:
+            # Два одновременных запуска (например, при выкладке на несколько
+            # серверов) не должны строить один индекс дважды
+            cursor.execute("SELECT GET_LOCK(CONCAT(DATABASE(), '.schema_migrations'), %s);", (lock_timeout,))
+            if cursor.fetchone()[0] != 1:
+                raise RuntimeError('Another migration is running')
+            try:
+                # ALTER ждет metadata lock за долгими транзакциями, а новые запросы
+                # к таблице встают в очередь за ним -- лучше быстро упасть и повторить
+                cursor.execute('SET SESSION lock_wait_timeout = %s;', (lock_wait_timeout,))
+                self.ensure_table(cursor)
+                applied = self.get_applied(cursor)
+                for version, description, steps in self.migrations:
+                    if version in applied:
+                        continue
+                    # DDL в MySQL не откатывается: если шаг упал, версия не записывается,
+                    # а при повторном запуске уже выполненные шаги пропускаются
+                    for step in steps:
+                        changed = step.apply(cursor)
+                        if echo is not None:
+                            echo(f"  {step.describe()}{'' if changed else ' (already done)'}")
+                    cursor.execute('INSERT INTO schema_migrations (version, description) VALUES (%s, %s);',
+                                   (version, description))
+                    connection.commit()
+                    applied_now.append(version)
+                    if echo is not None:
+                        echo(f'Applied {version}: {description}')
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(CONCAT(DATABASE(), '.schema_migrations'));")
+                cursor.fetchone()
+        return applied_now
+
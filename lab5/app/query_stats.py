@@ -0,0 +1,246 @@
+import logging
+import random
+import re
+import time
+from threading import Lock
+
+from flask import Blueprint, Response, current_app, g, has_app_context
+
+from .auth import check_rights
+
+bp = Blueprint('query_stats', __name__)
+
+slow_query_logger = logging.getLogger('app.slow_queries')
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM_RE = re.compile(r'%s|%\(\w+\)s')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(query):
+    if isinstance(query, (bytes, bytearray)):
+        query = query.decode('utf8', errors='replace')
+    query = _STRING_RE.sub('?', query)
+    query = _PARAM_RE.sub('?', query)
+    query = _NUMBER_RE.sub('?', query)
+    query = _IN_LIST_RE.sub('(...)', query)
+    query = _SPACE_RE.sub(' ', query).strip().rstrip(';').strip()
+    return query
+
+
+class QueryStats:
+    def __init__(self, app=None):
+        self._lock = Lock()
+        self._totals = {}
+        self._slow_handler = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('SQL_INSTRUMENTATION', True)
+        app.config.setdefault('SQL_DEBUG_PANEL', app.debug)
+        app.config.setdefault('SQL_DEBUG_PANEL_LIMIT', 100)
+        app.config.setdefault('SLOW_QUERY_THRESHOLD_MS', 200)
+        app.config.setdefault('SLOW_QUERY_LOG_FILE', None)
+        app.config.setdefault('SLOW_QUERY_EXPLAIN_RATE', 0.0)
+
+        if not hasattr(app, 'extensions'):
+            app.extensions = {}
+        app.extensions['query_stats'] = self
+
+        log_file = app.config['SLOW_QUERY_LOG_FILE']
+        if log_file and self._slow_handler is None:
+            self._slow_handler = logging.FileHandler(log_file, encoding='utf8')
+            self._slow_handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            slow_query_logger.addHandler(self._slow_handler)
+            slow_query_logger.setLevel(logging.INFO)
+
+        app.register_blueprint(bp)
+        app.context_processor(self._context_processor)
+
+    def instrument(self, connection):
+        if not self.app.config['SQL_INSTRUMENTATION']:
+            return connection
+        return InstrumentedConnection(connection, self)
+
+    def record(self, entry):
+        key = entry['fingerprint']
+        with self._lock:
+            totals = self._totals.get(key)
+            if totals is None:
+                totals = self._totals[key] = {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                              'rows': 0, 'slow': 0}
+            totals['count'] += 1
+            totals['seconds'] += entry['duration']
+            totals['max_seconds'] = max(totals['max_seconds'], entry['duration'])
+            totals['rows'] += entry['rows']
+            totals['slow'] += int(entry['slow'])
+
+        # Запросы контекста копятся только для панели и не больше SQL_DEBUG_PANEL_LIMIT:
+        # у CLI-команд и фоновых задач контекст живет долго. Итоги считаются по всем
+        if has_app_context() and self.app.config['SQL_DEBUG_PANEL']:
+            summary = g.setdefault('query_summary', {'count': 0, 'seconds': 0.0})
+            summary['count'] += 1
+            summary['seconds'] += entry['duration']
+            log = g.setdefault('query_log', [])
+            if len(log) < self.app.config['SQL_DEBUG_PANEL_LIMIT']:
+                log.append(entry)
+
+    def is_slow(self, duration):
+        return duration * 1000 >= self.app.config['SLOW_QUERY_THRESHOLD_MS']
+
+    def should_explain(self, query):
+        rate = self.app.config['SLOW_QUERY_EXPLAIN_RATE']
+        if not rate or not fingerprint(query).upper().startswith('SELECT'):
+            return False
+        return random.random() < rate
+
+    def log_slow(self, entry, plan=None):
+        message = f"{entry['duration'] * 1000:.1f}ms rows={entry['rows']} {entry['fingerprint']}"
+        if plan:
+            message += f' | EXPLAIN {plan}'
+        slow_query_logger.warning(message)
+
+    def snapshot(self):
+        with self._lock:
+            return {key: dict(value) for key, value in self._totals.items()}
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+    def reset_after_fork(self):
+        # Блокировка могла быть захвачена другим потоком мастера в момент fork
+        self._lock = Lock()
+        self._totals.clear()
+
+    def _context_processor(self):
+        return {'query_log': g.get('query_log', []),
+                'query_summary': g.get('query_summary', {'count': 0, 'seconds': 0.0})}
+
+
+class InstrumentedConnection:
+    def __init__(self, connection, stats):
+        self._connection = connection
+        self._stats = stats
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._connection.cursor(*args, **kwargs), self._connection, self._stats)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, connection, stats):
+        self._cursor = cursor
+        self._connection = connection
+        self._stats = stats
+        self._pending = None
+
+    def execute(self, operation, params=(), *args, **kwargs):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._pending = {
+                'query': operation,
+                'params': params,
+                'fingerprint': fingerprint(operation),
+                'duration': time.perf_counter() - start,
+                'rows': 0,
+            }
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None and self._pending is not None:
+            self._pending['rows'] += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        if self._pending is not None:
+            self._pending['rows'] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if self._pending is not None:
+            self._pending['rows'] += len(rows)
+        return rows
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._finish()
+        return self._cursor.__exit__(*exc_info)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _finish(self):
+        entry, self._pending = self._pending, None
+        if entry is None:
+            return
+
+        # Для INSERT/UPDATE/DELETE число строк известно только из rowcount
+        rowcount = getattr(self._cursor, 'rowcount', None)
+        if isinstance(rowcount, int) and rowcount > entry['rows']:
+            entry['rows'] = rowcount
+
+        entry['slow'] = self._stats.is_slow(entry['duration'])
+        query, params = entry.pop('query'), entry.pop('params')
+        self._stats.record(entry)
+
+        if entry['slow']:
+            plan = None
+            if self._stats.should_explain(query):
+                plan = self._explain(query, params)
+            self._stats.log_slow(entry, plan)
+
+    def _explain(self, query, params):
+        try:
+            with self._connection.cursor(dictionary=True) as cursor:
+                cursor.execute(f'EXPLAIN {query}', params)
+                return cursor.fetchall()
+        except Exception as e:
+            return f'failed: {e}'
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+@bp.route('/metrics')
+@check_rights(['admin'])
+def metrics():
+    stats = current_app.extensions['query_stats'].snapshot()
+    lines = []
+    series = (
+        ('sql_queries_total', 'counter', 'count'),
+        ('sql_query_duration_seconds_sum', 'counter', 'seconds'),
+        ('sql_query_duration_seconds_max', 'gauge', 'max_seconds'),
+        ('sql_query_rows_total', 'counter', 'rows'),
+        ('sql_slow_queries_total', 'counter', 'slow'),
+    )
+    for name, kind, field in series:
+        lines.append(f'# TYPE {name} {kind}')
+        for key, totals in stats.items():
+            lines.append(f'{name}{{fingerprint="{_escape_label(key)}"}} {totals[field]}')
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+queryStats = QueryStats()
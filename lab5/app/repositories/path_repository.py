@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from threading import Lock
+
+# Длина столбца paths.path
+PATH_MAX_LENGTH = 255
+
+
+class PathCache:
+    # Словарь paths почти не меняется, поэтому его id держим в памяти процесса:
+    # при записи посещения путь переводится в id без запроса к БД
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._ids = OrderedDict()
+        self._paths = {}
+
+    def get_id(self, path):
+        with self._lock:
+            path_id = self._ids.get(path)
+            if path_id is not None:
+                self._ids.move_to_end(path)
+            return path_id
+
+    def get_path(self, path_id):
+        with self._lock:
+            return self._paths.get(path_id)
+
+    def add(self, path, path_id):
+        with self._lock:
+            self._ids[path] = path_id
+            self._ids.move_to_end(path)
+            self._paths[path_id] = path
+            while len(self._ids) > self.max_entries:
+                _, evicted_id = self._ids.popitem(last=False)
+                self._paths.pop(evicted_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._paths.clear()
+
+
+path_cache = PathCache()
+
+
+class PathRepository:
+    def __init__(self, db_connector, cache=None):
+        self.db_connector = db_connector
+        self.cache = cache if cache is not None else path_cache
+
+    def get_id(self, path):
+        if path is None:
+            return None
+        path = path[:PATH_MAX_LENGTH]
+        path_id = self.cache.get_id(path)
+        if path_id is not None:
+            return path_id
+
+        connection = self.db_connector.connect()
+        with connection.cursor() as cursor:
+            # LAST_INSERT_ID(id) возвращает id и для уже существующей строки:
+            # одна команда вместо SELECT + INSERT и без гонки между воркерами
+            cursor.execute('INSERT INTO paths (path) VALUES (%s) ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id);',
+                           (path,))
+            path_id = cursor.lastrowid
+            connection.commit()
+        self.cache.add(path, path_id)
+        return path_id
+
+    def get_paths(self, path_ids):
+        result = {}
+        missing = []
+        for path_id in path_ids:
+            if path_id is None:
+                continue
+            path = self.cache.get_path(path_id)
+            if path is None:
+                missing.append(path_id)
+            else:
+                result[path_id] = path
+
+        if missing:
+            with self.db_connector.connect().cursor() as cursor:
+                placeholders = ', '.join(['%s'] * len(missing))
+                cursor.execute(f'SELECT id, path FROM paths WHERE id IN ({placeholders});', tuple(missing))
+                for path_id, path in cursor.fetchall():
+                    self.cache.add(path, path_id)
+                    result[path_id] = path
+        return result
@@ -0,0 +1,61 @@
+class UserDeletionRepository:
+    # Очередь удалений в таблице user_deletions: пользователь сразу помечается
+    # удаленным (users.deleted_at), а его записи visit_logs отвязываются
+    # фоновой задачей порциями, после чего строка users удаляется
+    def __init__(self, db_connector):
+        self.db_connector = db_connector
+
+    def claim(self, stale_seconds):
+        # Задачу, воркер которой перестал отмечаться (перезапуск gunicorn), подхватывает другой
+        connection = self.db_connector.connect()
+        with connection.cursor(dictionary=True) as cursor:
+            cursor.execute(
+                "SELECT user_id, total_rows FROM user_deletions "
+                "WHERE status = 'pending' OR (status = 'running' AND heartbeat_at < NOW() - INTERVAL %s SECOND) "
+                "ORDER BY requested_at LIMIT 1 FOR UPDATE SKIP LOCKED;", (stale_seconds,))
+            task = cursor.fetchone()
+            if task is not None:
+                cursor.execute("UPDATE user_deletions SET status = 'running', heartbeat_at = NOW() WHERE user_id = %s;",
+                               (task['user_id'],))
+            connection.commit()
+        return task
+
+    def count_rows(self, user_id):
+        connection = self.db_connector.connect()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM visit_logs WHERE user_id = %s;", (user_id,))
+            total = cursor.fetchone()[0]
+            cursor.execute("UPDATE user_deletions SET total_rows = detached_rows + %s WHERE user_id = %s;",
+                           (total, user_id))
+            connection.commit()
+        return total
+
+    def detach_batch(self, user_id, batch_size):
+        # Каждая порция -- отдельная короткая транзакция: блокировки строк
+        # visit_logs не копятся и не мешают записи новых посещений
+        connection = self.db_connector.connect()
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE visit_logs SET user_id = NULL WHERE user_id = %s LIMIT %s;", (user_id, batch_size))
+            detached = cursor.rowcount
+            cursor.execute("UPDATE user_deletions SET detached_rows = detached_rows + %s, heartbeat_at = NOW() "
+                           "WHERE user_id = %s;", (detached, user_id))
+            connection.commit()
+        return detached
+
+    def finish(self, user_id):
+        connection = self.db_connector.connect()
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM users WHERE id = %s AND deleted_at IS NOT NULL;", (user_id,))
+            cursor.execute("UPDATE user_deletions SET status = 'done', finished_at = NOW() WHERE user_id = %s;",
+                           (user_id,))
+            connection.commit()
+
+    def get_recent(self, limit=10):
+        with self.db_connector.connect().cursor(dictionary=True) as cursor:
+            cursor.execute(
+                "SELECT user_id, username, status, total_rows, detached_rows, requested_at, finished_at "
+                "FROM user_deletions "
+                "WHERE status <> 'done' OR finished_at > NOW() - INTERVAL 1 DAY "
+                "ORDER BY requested_at DESC LIMIT %s;", (limit,))
+            deletions = cursor.fetchall()
+        return deletions
@@ -5,24 +5,34 @@ class UserRepository:
     def get_by_id(self, user_id):
         with self.db_connector.connect().cursor(dictionary=True) as cursor:
             # Включаем название роли в результат
-            cursor.execute('SELECT users.*, roles.name AS role_name FROM users LEFT JOIN roles ON users.role_id = roles.id WHERE users.id = %s;', (user_id,))
+            cursor.execute('SELECT users.*, roles.name AS role_name FROM users LEFT JOIN roles ON users.role_id = roles.id WHERE users.id = %s AND users.deleted_at IS NULL;', (user_id,))
             user = cursor.fetchone()
         return user
     
     def get_by_username_and_password(self, username, password):
         with self.db_connector.connect().cursor(dictionary=True) as cursor:
             # Включаем название роли в результат
-            cursor.execute('SELECT users.*, roles.name AS role_name FROM users LEFT JOIN roles ON users.role_id = roles.id WHERE username = %s AND password_hash = SHA2(%s, 256);', (username, password))
+            cursor.execute('SELECT users.*, roles.name AS role_name FROM users LEFT JOIN roles ON users.role_id = roles.id WHERE username = %s AND password_hash = SHA2(%s, 256) AND users.deleted_at IS NULL;', (username, password))
             user = cursor.fetchone()
         return user
 
     def all(self):
         with self.db_connector.connect().cursor(dictionary=True) as cursor:
             # Включаем название роли в результат для всех пользователей
-            cursor.execute('SELECT users.*, roles.name AS role_name FROM users LEFT JOIN roles ON users.role_id = roles.id;')
+            cursor.execute('SELECT users.*, roles.name AS role_name FROM users LEFT JOIN roles ON users.role_id = roles.id WHERE users.deleted_at IS NULL;')
             users = cursor.fetchall()
         return users
     
+    def get_names_by_ids(self, user_ids):
+        if not user_ids:
+            return []
+        with self.db_connector.connect().cursor(dictionary=True) as cursor:
+            placeholders = ', '.join(['%s'] * len(user_ids))
+            cursor.execute(f'SELECT id, first_name, last_name, middle_name FROM users WHERE id IN ({placeholders});',
+                           tuple(user_ids))
+            users = cursor.fetchall()
+        return users
+
     def create(self, username, password, first_name, middle_name, last_name, role_id):
         connection = self.db_connector.connect()
         with connection.cursor(dictionary=True) as cursor:
@@ -66,7 +76,12 @@ class UserRepository:
         return result
    
     def delete(self, user_id):
+        # Пользователь сразу скрывается и теряет доступ; записи журнала посещений
+        # отвязывает фоновая задача (user_deletion.py), она же удаляет строку users
         connection = self.db_connector.connect()
         with connection.cursor(dictionary=True) as cursor:
-            cursor.execute('DELETE FROM users WHERE id = %s', (user_id,))
+            cursor.execute('UPDATE users SET deleted_at = NOW() WHERE id = %s AND deleted_at IS NULL', (user_id,))
+            if cursor.rowcount:
+                cursor.execute('INSERT INTO user_deletions (user_id, username) SELECT id, username FROM users WHERE id = %s',
+                               (user_id,))
             connection.commit()
\ No newline at end of file
@@ -1,33 +1,88 @@
-from datetime import datetime
+from datetime import date, datetime
+
+from ..db import read_only
+from .path_repository import PathRepository
+
+# visit_logs разбита на помесячные разделы p<ГГГГММ> по created_at и раздел pmax
+# для всего, что новее последнего месяца. Разделы наперед создает команда
+# create-partitions, старые целиком удаляет или архивирует prune-visit-logs.
+MAX_PARTITION = 'pmax'
+
+# Группировка отчета по страницам: столбец с id из словаря paths
+PAGE_GROUPS = {'path': 'path_id', 'route': 'route_id'}
+NO_ROUTE = '(маршрут не найден)'
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+def add_months(day, months):
+    years, month = divmod(day.month - 1 + months, 12)
+    return date(day.year + years, month + 1, 1)
+
+def partition_name(month):
+    return f'p{month:%Y%m}'
+
+def archive_table_name(partition):
+    return f'visit_logs_archive_{partition[1:]}'
+
+def _parse_bound(description):
+    if description is None or description == 'MAXVALUE':
+        return None
+    return datetime.fromisoformat(description.strip("'")).date()
+
+def _date_range(column, date_from=None, date_to=None):
+    # Условия прямо на created_at, без функций над столбцом: иначе MySQL
+    # не сможет отбросить лишние разделы
+    conditions, params = [], []
+    if date_from is not None:
+        conditions.append(f'{column} >= %s')
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append(f'{column} < %s')
+        params.append(date_to)
+    return conditions, params
+
 
 class VisitLogRepository:
-    def __init__(self, db_connector):
+    def __init__(self, db_connector, path_cache=None):
         self.db_connector = db_connector
+        self.paths = PathRepository(db_connector, path_cache)
 
-    def create(self, path, user_id=None):
+    def create(self, path, user_id=None, route=None):
+        # route -- шаблон правила Flask (request.url_rule.rule), например /users/<int:user_id>/edit
+        path_id = self.paths.get_id(path)
+        route_id = self.paths.get_id(route)
         connection = self.db_connector.connect()
         with connection.cursor() as cursor:
-            query = "INSERT INTO visit_logs (path, user_id) VALUES (%s, %s);"
-            cursor.execute(query, (path, user_id))
+            query = "INSERT INTO visit_logs (path_id, route_id, user_id) VALUES (%s, %s, %s);"
+            cursor.execute(query, (path_id, route_id, user_id))
             connection.commit()
 
-    def get_all_logs(self, limit=None, offset=None, user_id=None):
+    @read_only
+    def get_all_logs(self, limit=None, offset=None, user_id=None, date_from=None, date_to=None):
         with self.db_connector.connect().cursor(dictionary=True) as cursor:
             query = """
                 SELECT
                     vl.id,
-                    vl.path,
+                    p.path,
                     vl.created_at,
                     u.first_name,
                     u.last_name,
                     u.middle_name
                 FROM visit_logs vl
+                JOIN paths p ON p.id = vl.path_id
                 LEFT JOIN users u ON vl.user_id = u.id
             """
-            params = []
+            conditions, params = [], []
             if user_id is not None:
-                query += " WHERE vl.user_id = %s"
+                conditions.append("vl.user_id = %s")
                 params.append(user_id)
+            range_conditions, range_params = _date_range('vl.created_at', date_from, date_to)
+            conditions += range_conditions
+            params += range_params
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
 
             query += " ORDER BY vl.created_at DESC"
             
@@ -39,44 +94,175 @@ class VisitLogRepository:
             logs = cursor.fetchall()
         return logs
 
-    def get_log_count(self, user_id=None):
+    @read_only
+    def get_log_count(self, user_id=None, date_from=None, date_to=None):
         with self.db_connector.connect().cursor() as cursor:
             query = "SELECT COUNT(*) FROM visit_logs"
-            params = []
+            conditions, params = [], []
             if user_id is not None:
-                query += " WHERE user_id = %s"
+                conditions.append("user_id = %s")
                 params.append(user_id)
+            range_conditions, range_params = _date_range('created_at', date_from, date_to)
+            conditions += range_conditions
+            params += range_params
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
             cursor.execute(query, tuple(params))
             count = cursor.fetchone()[0]
         return count
 
-    def get_page_visit_stats(self):
+    @read_only
+    def get_page_visit_stats(self, date_from=None, date_to=None, group_by='path'):
+        # Группировка по целочисленному id, строки подставляются из кеша словаря paths
+        column = PAGE_GROUPS[group_by]
+        conditions, params = _date_range('created_at', date_from, date_to)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
         with self.db_connector.connect().cursor(dictionary=True) as cursor:
-            query = """
+            query = f"""
                 SELECT
-                    path,
+                    {column} AS path_id,
                     COUNT(*) AS visit_count
                 FROM visit_logs
-                GROUP BY path
+                {where}
+                GROUP BY {column}
                 ORDER BY visit_count DESC;
             """
-            cursor.execute(query)
-            stats = cursor.fetchall()
-        return stats
+            cursor.execute(query, tuple(params))
+            rows = cursor.fetchall()
+        names = self.paths.get_paths([row['path_id'] for row in rows])
+        return [{'path': names.get(row['path_id'], NO_ROUTE), 'visit_count': row['visit_count']} for row in rows]
 
-    def get_user_visit_stats(self):
+    @read_only
+    def get_user_visit_stats(self, date_from=None, date_to=None):
+        # Период в условии соединения: пользователи без посещений за период остаются с нулем
+        conditions, params = _date_range('vl.created_at', date_from, date_to)
+        period = "".join(" AND " + condition for condition in conditions)
         with self.db_connector.connect().cursor(dictionary=True) as cursor:
-            query = """
+            query = f"""
                 SELECT
                     u.first_name,
                     u.last_name,
                     u.middle_name,
                     COUNT(vl.id) AS visit_count
-                FROM uesrs u
-                LEFT JOIN visit_logs vl ON vl.user_id = u.id
+                FROM users u
+                LEFT JOIN visit_logs vl ON vl.user_id = u.id{period}
+                WHERE u.deleted_at IS NULL
                 GROUP BY u.id, u.first_name, u.last_name, u.middle_name
                 ORDER BY visit_count DESC;
             """
-            cursor.execute(query)
+            cursor.execute(query, tuple(params))
             stats = cursor.fetchall()
-        return stats
\ No newline at end of file
+        return stats
+
+    def iter_logs_between(self, date_from, date_to, table=None, batch_size=10000):
+        # Небуферизованный курсор: строки окна не собираются в памяти целиком
+        table = table or 'visit_logs'
+        with self.db_connector.connect().cursor() as cursor:
+            cursor.execute(f"SELECT vl.id, p.path, vl.user_id, vl.created_at FROM {table} vl "
+                           "JOIN paths p ON p.id = vl.path_id "
+                           "WHERE vl.created_at >= %s AND vl.created_at < %s ORDER BY vl.created_at, vl.id",
+                           (date_from, date_to))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def get_partitions(self):
+        with self.db_connector.connect().cursor(dictionary=True) as cursor:
+            cursor.execute("""
+                SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS description, TABLE_ROWS AS table_rows
+                FROM information_schema.PARTITIONS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'visit_logs' AND PARTITION_NAME IS NOT NULL
+                ORDER BY PARTITION_ORDINAL_POSITION;
+            """)
+            rows = cursor.fetchall()
+        return [{'name': row['name'], 'upper_bound': _parse_bound(row['description']), 'table_rows': row['table_rows']}
+                for row in rows]
+
+    def create_partitions(self, months_ahead=3, today=None):
+        current = month_start(today or date.today())
+        bounded = [p for p in self.get_partitions() if p['upper_bound'] is not None]
+        # Первый раздел принимает и все более старые строки
+        month = bounded[-1]['upper_bound'] if bounded else current
+        last = add_months(current, months_ahead)
+
+        created = []
+        while month <= last:
+            created.append((partition_name(month), add_months(month, 1)))
+            month = add_months(month, 1)
+        if not created:
+            return []
+
+        definitions = ", ".join(f"PARTITION {name} VALUES LESS THAN ('{bound:%Y-%m-%d}')" for name, bound in created)
+        connection = self.db_connector.connect()
+        with connection.cursor() as cursor:
+            # pmax обычно пуст, поэтому его разделение затрагивает только метаданные
+            cursor.execute(f"ALTER TABLE visit_logs REORGANIZE PARTITION {MAX_PARTITION} INTO "
+                           f"({definitions}, PARTITION {MAX_PARTITION} VALUES LESS THAN (MAXVALUE))")
+        return [name for name, _ in created]
+
+    def create_past_partitions(self, since):
+        # Помесячные разделы назад до since (для загрузки исторических данных).
+        # Делится первый раздел, а REORGANIZE переписывает его строки, поэтому
+        # вызывать стоит до загрузки, пока он пуст
+        bounded = [p for p in self.get_partitions() if p['upper_bound'] is not None]
+        if not bounded:
+            return []
+        first = bounded[0]
+        first_month = add_months(first['upper_bound'], -1)
+        month = month_start(since)
+
+        created = []
+        while month < first_month:
+            created.append((partition_name(month), add_months(month, 1)))
+            month = add_months(month, 1)
+        if not created:
+            return []
+
+        definitions = ", ".join(f"PARTITION {name} VALUES LESS THAN ('{bound:%Y-%m-%d}')" for name, bound in created)
+        connection = self.db_connector.connect()
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE visit_logs REORGANIZE PARTITION {first['name']} INTO "
+                           f"({definitions}, PARTITION {first['name']} VALUES LESS THAN "
+                           f"('{first['upper_bound']:%Y-%m-%d}'))")
+        return [name for name, _ in created]
+
+    def get_expired_partitions(self, keep_months, today=None):
+        cutoff = add_months(month_start(today or date.today()), -keep_months)
+        return [p['name'] for p in self.get_partitions()
+                if p['upper_bound'] is not None and p['upper_bound'] <= cutoff]
+
+    def drop_partitions(self, names):
+        if not names:
+            return
+        connection = self.db_connector.connect()
+        with connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE visit_logs DROP PARTITION {', '.join(names)}")
+
+    def get_archive_tables(self):
+        with self.db_connector.connect().cursor() as cursor:
+            cursor.execute("SELECT TABLE_NAME FROM information_schema.TABLES "
+                           "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME LIKE 'visit\\_logs\\_archive\\_%'")
+            tables = sorted(row[0] for row in cursor.fetchall())
+        return [(datetime.strptime(table[-6:], '%Y%m').date(), table) for table in tables]
+
+    def archive_partition(self, name):
+        # Раздел обменивается с пустой таблицей той же структуры: строки не
+        # копируются, после обмена в visit_logs остается пустой раздел
+        table = archive_table_name(name)
+        connection = self.db_connector.connect()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM information_schema.TABLES "
+                           "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (table,))
+            if cursor.fetchone()[0]:
+                # Архив остался от прерванного запуска: повторный обмен вернул бы строки обратно
+                cursor.execute(f"SELECT COUNT(*) FROM visit_logs PARTITION ({name})")
+                if cursor.fetchone()[0]:
+                    raise RuntimeError(f'Archive table {table} already exists and partition {name} is not empty')
+            else:
+                cursor.execute(f"CREATE TABLE {table} LIKE visit_logs")
+                cursor.execute(f"ALTER TABLE {table} REMOVE PARTITIONING")
+                cursor.execute(f"ALTER TABLE visit_logs EXCHANGE PARTITION {name} WITH TABLE {table}")
+            cursor.execute(f"ALTER TABLE visit_logs DROP PARTITION {name}")
+        return table
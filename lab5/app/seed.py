@@ -0,0 +1,265 @@
+# Синтетические данные production-размера для профилирования журнала и
+# отчетов: flask seed --users 10000 --visits 5000000 --days 365
+#
+# Посещения генерируются по дням в порядке времени (id растут вместе с
+# created_at, как в рабочей базе) и пишутся многострочными INSERT или,
+# с --load-data, через LOAD DATA LOCAL INFILE.
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .repositories.visit_log_repository import VisitLogRepository
+
+# Пароль всех сгенерированных пользователей
+SEED_PASSWORD = 'Qwerty123'
+USERNAME_PREFIX = 'seed'
+
+MALE_NAMES = [
+    ('Иван', 'Иванов', 'Иванович'), ('Петр', 'Петров', 'Петрович'), ('Сергей', 'Смирнов', 'Сергеевич'),
+    ('Алексей', 'Кузнецов', 'Алексеевич'), ('Дмитрий', 'Попов', 'Дмитриевич'), ('Андрей', 'Васильев', 'Андреевич'),
+    ('Михаил', 'Соколов', 'Михайлович'), ('Николай', 'Михайлов', 'Николаевич'), ('Павел', 'Новиков', 'Павлович'),
+    ('Артем', 'Федоров', 'Артемович'),
+]
+FEMALE_NAMES = [
+    ('Анна', 'Иванова', 'Ивановна'), ('Мария', 'Петрова', 'Петровна'), ('Елена', 'Смирнова', 'Сергеевна'),
+    ('Ольга', 'Кузнецова', 'Алексеевна'), ('Татьяна', 'Попова', 'Дмитриевна'), ('Наталья', 'Васильева', 'Андреевна'),
+    ('Ирина', 'Соколова', 'Михайловна'), ('Екатерина', 'Михайлова', 'Николаевна'), ('Дарья', 'Новикова', 'Павловна'),
+    ('Юлия', 'Федорова', 'Артемовна'),
+]
+# Доля пользователей без отчества
+NO_MIDDLE_NAME_SHARE = 0.2
+
+# Относительная посещаемость по часу суток: ночью почти никого, пик днем
+HOURLY_PROFILE = np.array([2, 1, 1, 1, 1, 2, 4, 8, 14, 18, 20, 20,
+                           17, 19, 20, 19, 17, 14, 11, 9, 8, 6, 4, 3], dtype=float)
+WEEKEND_FACTOR = 0.6
+ANONYMOUS_SHARE = 0.3
+# Показатель закона Ципфа для популярности пользователей и их страниц
+ZIPF_EXPONENT = 1.1
+
+# Страницы без параметров: (путь, маршрут, вес, доступна без входа)
+STATIC_PAGES = [
+    ('/', '/', 30, True),
+    ('/auth/login', '/auth/login', 15, True),
+    ('/auth/logout', '/auth/logout', 3, False),
+    ('/users/', '/users/', 10, False),
+    ('/users/new', '/users/new', 1, False),
+    ('/visit_logs/', '/visit_logs/', 6, False),
+    ('/visit_logs/pages_report', '/visit_logs/pages_report', 2, False),
+    ('/visit_logs/users_report', '/visit_logs/users_report', 2, False),
+]
+# Страницы пользователя: (шаблон пути, маршрут, суммарный вес)
+USER_PAGES = [
+    ('/users/{}', '/users/<int:user_id>', 20),
+    ('/users/{}/edit', '/users/<int:user_id>/edit', 3),
+    ('/users/{}/edit_password', '/users/<int:user_id>/edit_password', 1),
+]
+
+
+def zipf_weights(n, exponent=ZIPF_EXPONENT):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def user_rows(rng, count, first_number, created_before):
+    """Кортежи для INSERT INTO users (username, password_hash, first_name, middle_name, last_name, role_id, created_at)."""
+    password_hash = hashlib.sha256(SEED_PASSWORD.encode()).hexdigest()
+    names = MALE_NAMES + FEMALE_NAMES
+    picks = rng.integers(len(names), size=count)
+    no_middle = rng.random(count) < NO_MIDDLE_NAME_SHARE
+    # Зарегистрированы в течение года до начала посещений
+    ages = rng.integers(365 * 24 * 3600, size=count)
+    start = datetime.combine(created_before, datetime.min.time())
+    rows = []
+    for i in range(count):
+        first_name, last_name, middle_name = names[picks[i]]
+        rows.append((f'{USERNAME_PREFIX}{first_number + i}', password_hash, first_name,
+                     None if no_middle[i] else middle_name, last_name, 2,
+                     start - timedelta(seconds=int(ages[i]))))
+    return rows
+
+
+def daily_counts(rng, total, date_from, days):
+    """Число посещений по дням: поровну с поправкой на выходные."""
+    weights = np.array([WEEKEND_FACTOR if (date_from + timedelta(days=d)).weekday() >= 5 else 1.0
+                        for d in range(days)])
+    return rng.multinomial(total, weights / weights.sum())
+
+
+def visit_times(rng, day, count):
+    """Отсортированные моменты посещений за день, секунды от 1970-01-01."""
+    hours = rng.choice(24, size=count, p=HOURLY_PROFILE / HOURLY_PROFILE.sum())
+    day_start = int(np.datetime64(day, 's').astype(np.int64))
+    return np.sort(day_start + hours * 3600 + rng.integers(3600, size=count))
+
+
+class PageCatalog:
+    """Страницы, по которым распределяются посещения: id пути и маршрута с весами."""
+
+    def __init__(self, rng, user_ids):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        # Популярность пользователя не зависит от его id
+        self.popularity = np.zeros(len(self.user_ids))
+        self.popularity[rng.permutation(len(self.user_ids))] = zipf_weights(len(self.user_ids))
+
+        self.paths, self.routes, weights, public = [], [], [], []
+        for path, route, weight, is_public in STATIC_PAGES:
+            self.paths.append(path)
+            self.routes.append(route)
+            weights.append(weight)
+            public.append(is_public)
+        for template, route, weight in USER_PAGES:
+            for user_id, share in zip(self.user_ids.tolist(), self.popularity):
+                self.paths.append(template.format(user_id))
+                self.routes.append(route)
+                weights.append(weight * share)
+                public.append(False)
+        weights = np.array(weights)
+        public = np.array(public)
+        self.weights = weights / weights.sum()
+        self.public_weights = np.where(public, weights, 0) / weights[public].sum()
+        self.path_ids = self.route_ids = None
+
+    def resolve(self, ids):
+        # ids: словарь путь -> id из таблицы paths
+        self.path_ids = np.array([ids[path] for path in self.paths], dtype=np.int64)
+        self.route_ids = np.array([ids[route] for route in self.routes], dtype=np.int64)
+
+    def sample(self, rng, count):
+        """(path_id, route_id, user_id) для count посещений, user_id = -1 у анонимных."""
+        anonymous = rng.random(count) < ANONYMOUS_SHARE
+        if not len(self.user_ids):
+            anonymous[:] = True
+        pages = np.empty(count, dtype=np.int64)
+        n_anonymous = int(anonymous.sum())
+        # Без входа доступны только главная и страница входа
+        pages[anonymous] = rng.choice(len(self.paths), size=n_anonymous, p=self.public_weights)
+        pages[~anonymous] = rng.choice(len(self.paths), size=count - n_anonymous, p=self.weights)
+        users = np.full(count, -1, dtype=np.int64)
+        if len(self.user_ids):
+            # Активность пользователя пропорциональна популярности: чаще ходят те же, кого чаще смотрят
+            users[~anonymous] = rng.choice(self.user_ids, size=count - n_anonymous, p=self.popularity)
+        return self.path_ids[pages], self.route_ids[pages], users
+
+
+def visit_batches(rng, catalog, total, date_from, days, batch_size):
+    """Пачки посещений (path_id, route_id, user_id, created_at) по возрастанию времени."""
+    buffer, buffered = [], 0
+    for offset, count in enumerate(daily_counts(rng, total, date_from, days)):
+        if not count:
+            continue
+        path_ids, route_ids, user_ids = catalog.sample(rng, count)
+        times = visit_times(rng, date_from + timedelta(days=offset), count)
+        buffer.append((path_ids, route_ids, user_ids, times))
+        buffered += count
+        while buffered >= batch_size:
+            merged = [np.concatenate(column) for column in zip(*buffer)]
+            yield [column[:batch_size] for column in merged]
+            rest = [column[batch_size:] for column in merged]
+            buffer, buffered = [rest], len(rest[0])
+    if buffered:
+        yield [np.concatenate(column) for column in zip(*buffer)]
+
+
+def format_values(batch):
+    # Все значения -- сгенерированные числа и даты, экранирование не нужно
+    path_ids, route_ids, user_ids, times = batch
+    users = np.where(user_ids < 0, 'NULL', user_ids.astype(str))
+    stamps = times.astype('datetime64[s]').astype(str)
+    return ','.join(f"({p},{r},{u},'{t}')"
+                    for p, r, u, t in zip(path_ids.tolist(), route_ids.tolist(), users.tolist(), stamps.tolist()))
+
+
+def format_tsv(batch):
+    path_ids, route_ids, user_ids, times = batch
+    users = np.where(user_ids < 0, '\\N', user_ids.astype(str))
+    stamps = times.astype('datetime64[s]').astype(str)
+    return ''.join(f'{p}\t{r}\t{u}\t{t}\n'
+                   for p, r, u, t in zip(path_ids.tolist(), route_ids.tolist(), users.tolist(), stamps.tolist()))
+
+
+class Seeder:
+    def __init__(self, db_connector, seed=None, batch_size=10000, load_data=False):
+        self.db_connector = db_connector
+        self.rng = np.random.default_rng(seed)
+        self.batch_size = batch_size
+        self.load_data = load_data
+
+    def seed_users(self, count, created_before):
+        connection = self.db_connector.connect()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM users;')
+            first_number = cursor.fetchone()[0] + 1
+            rows = user_rows(self.rng, count, first_number, created_before)
+            for start in range(0, count, self.batch_size):
+                # executemany сворачивает INSERT ... VALUES в один многострочный запрос
+                cursor.executemany('INSERT INTO users (username, password_hash, first_name, middle_name, last_name, '
+                                   'role_id, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s);',
+                                   rows[start:start + self.batch_size])
+                connection.commit()
+        return count
+
+    def get_user_ids(self):
+        with self.db_connector.connect().cursor() as cursor:
+            cursor.execute('SELECT id FROM users WHERE deleted_at IS NULL ORDER BY id;')
+            return [row[0] for row in cursor.fetchall()]
+
+    def intern_paths(self, catalog):
+        connection = self.db_connector.connect()
+        with connection.cursor() as cursor:
+            names = sorted(set(catalog.paths) | set(catalog.routes))
+            for start in range(0, len(names), self.batch_size):
+                cursor.executemany('INSERT IGNORE INTO paths (path) VALUES (%s);',
+                                   [(name,) for name in names[start:start + self.batch_size]])
+            connection.commit()
+            cursor.execute('SELECT path, id FROM paths;')
+            catalog.resolve(dict(cursor.fetchall()))
+
+    def seed_visits(self, count, date_from, days, progress=None):
+        catalog = PageCatalog(self.rng, self.get_user_ids())
+        self.intern_paths(catalog)
+        repository = VisitLogRepository(self.db_connector)
+        repository.create_partitions()
+        repository.create_past_partitions(date_from)
+
+        batches = visit_batches(self.rng, catalog, count, date_from, days, self.batch_size)
+        return self._load(batches, progress) if self.load_data else self._insert(batches, progress)
+
+    def _insert(self, batches, progress):
+        connection = self.db_connector.connect()
+        written = 0
+        with connection.cursor() as cursor:
+            for batch in batches:
+                cursor.execute('INSERT INTO visit_logs (path_id, route_id, user_id, created_at) VALUES '
+                               + format_values(batch))
+                connection.commit()
+                written += len(batch[0])
+                if progress is not None:
+                    progress(written)
+        return written
+
+    def _load(self, batches, progress):
+        # LOAD DATA LOCAL требует local_infile=ON на сервере и разрешения в клиенте
+        connection = self.db_connector.open_connection(allow_local_infile=True)
+        written = 0
+        try:
+            with connection.cursor() as cursor:
+                for batch in batches:
+                    with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False, encoding='utf8') as f:
+                        f.write(format_tsv(batch))
+                    try:
+                        cursor.execute(f"LOAD DATA LOCAL INFILE '{f.name}' INTO TABLE visit_logs "
+                                       "(path_id, route_id, user_id, created_at);")
+                        connection.commit()
+                    finally:
+                        os.unlink(f.name)
+                    written += len(batch[0])
+                    if progress is not None:
+                        progress(written)
+        finally:
+            connection.close()
+        return written
+
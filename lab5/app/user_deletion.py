@@ -0,0 +1,88 @@
+import logging
+import threading
+import time
+
+from .db import dbConnector as db
+from .repositories.user_deletion_repository import UserDeletionRepository
+
+logger = logging.getLogger(__name__)
+
+
+class UserDeletions:
+    # Фоновое завершение удалений пользователей. Поток запускается в воркере,
+    # который принял запрос на удаление, и работает, пока в очереди есть задачи.
+    # Те же задачи выполняет команда flask process-user-deletions (например, из
+    # cron), если воркер был перезапущен посреди работы.
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wakeup = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('USER_DELETION_BATCH_SIZE', 5000)
+        app.config.setdefault('USER_DELETION_PAUSE', 0.05)
+        app.config.setdefault('USER_DELETION_STALE_SECONDS', 60)
+        app.config.setdefault('USER_DELETION_BACKGROUND', not app.testing)
+
+        if not hasattr(app, 'extensions'):
+            app.extensions = {}
+        app.extensions['user_deletions'] = self
+
+    def start(self):
+        if not self.app.config['USER_DELETION_BACKGROUND']:
+            return
+        with self._lock:
+            # Поток, который уже доходит до конца очереди, проверит флаг и сделает еще проход
+            self._wakeup = True
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='user-deletions', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._wakeup:
+                    self._thread = None
+                    return
+                self._wakeup = False
+            # Свой контекст на каждый проход: соединение с БД закрывается в teardown
+            with self.app.app_context():
+                try:
+                    self.run_pending()
+                except Exception:
+                    # Задача останется в очереди и будет подхвачена повторно
+                    logger.exception('User deletion failed')
+
+    def run_pending(self):
+        repository = UserDeletionRepository(db)
+        processed = []
+        while True:
+            task = repository.claim(self.app.config['USER_DELETION_STALE_SECONDS'])
+            if task is None:
+                return processed
+            self.process(repository, task['user_id'])
+            processed.append(task['user_id'])
+
+    def process(self, repository, user_id):
+        config = self.app.config
+        repository.count_rows(user_id)
+        while True:
+            detached = repository.detach_batch(user_id, config['USER_DELETION_BATCH_SIZE'])
+            if detached < config['USER_DELETION_BATCH_SIZE']:
+                break
+            time.sleep(config['USER_DELETION_PAUSE'])
+        repository.finish(user_id)
+        logger.info('User %s deleted', user_id)
+
+    def reset_after_fork(self):
+        # Поток мастера в воркер не переходит
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wakeup = False
+
+
+userDeletions = UserDeletions()
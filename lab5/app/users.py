@@ -4,7 +4,9 @@ import mysql.connector as connector
 
 from .repositories.user_repository import UserRepository
 from .repositories.role_repository import RoleRepository
+from .repositories.user_deletion_repository import UserDeletionRepository
 from .auth import check_rights # Импортируем декоратор check_rights
+from .user_deletion import userDeletions
 
 from .utils.validator import *
 
@@ -12,6 +14,7 @@ from .db import dbConnector as db
 
 user_repository = UserRepository(db)
 role_repository = RoleRepository(db)
+user_deletion_repository = UserDeletionRepository(db)
 
 bp = Blueprint('users', __name__, url_prefix='/users')
 
@@ -20,7 +23,8 @@ bp = Blueprint('users', __name__, url_prefix='/users')
 @check_rights(['admin', 'user'])
 def index():
     users = user_repository.all()
-    return render_template('users/index.html', users=users, current_user=current_user)
+    deletions = user_deletion_repository.get_recent() if current_user.is_admin else []
+    return render_template('users/index.html', users=users, deletions=deletions, current_user=current_user)
 
 @bp.route('/<int:user_id>')
 @login_required
@@ -79,7 +83,8 @@ def delete(user_id):
         return redirect(url_for('users.index'))
     
     user_repository.delete(user_id)
-    flash('Пользователь удален!', 'success')
+    userDeletions.start()
+    flash('Пользователь удален! Записи журнала посещений отвязываются в фоне.', 'success')
     return redirect(url_for('users.index'))
 
 @bp.route('/<int:user_id>/edit', methods=['POST', 'GET'])
@@ -0,0 +1,133 @@
+# Отчеты по архиву visit_logs (см. visit_archive.py) без обращения к MySQL.
+# Вместо GROUP BY -- np.bincount по целочисленным индексам путей и
+# пользователей, поэтому отчет за несколько лет упирается только в чтение файлов.
+import os
+
+import numpy as np
+
+from .repositories.visit_log_repository import add_months
+from .visit_archive import archive_file_name, archived_months, to_seconds
+
+ANONYMOUS = 'Неаутентифицированный пользователь'
+
+
+class VisitFrame:
+    """Посещения из нескольких файлов архива с общими словарями путей и пользователей."""
+
+    def __init__(self, created_at, path_idx, user_idx, paths, user_ids, user_names):
+        self.created_at = created_at
+        self.path_idx = path_idx
+        self.user_idx = user_idx
+        self.paths = paths
+        self.user_ids = user_ids
+        self.user_names = user_names
+
+    def __len__(self):
+        return len(self.created_at)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, np.int64), np.empty(0, np.int32), np.empty(0, np.int32),
+                   np.empty(0, str), np.empty(0, np.int32), np.empty(0, str))
+
+
+def _remap(indices, mapping):
+    # -1 (аноним) остается -1
+    if len(mapping) == 0:
+        return indices
+    return np.where(indices >= 0, mapping[indices], -1).astype(np.int32)
+
+
+def load(directory, date_from=None, date_to=None):
+    """Читает файлы архива, пересекающиеся с [date_from, date_to)."""
+    start = to_seconds(date_from) if date_from is not None else None
+    end = to_seconds(date_to) if date_to is not None else None
+
+    parts = []
+    for month in archived_months(directory):
+        if date_to is not None and month >= date_to:
+            continue
+        if date_from is not None and add_months(month, 1) <= date_from:
+            continue
+        with np.load(os.path.join(directory, archive_file_name(month))) as data:
+            part = {name: data[name] for name in
+                    ('created_at', 'path_idx', 'user_idx', 'paths', 'user_ids', 'user_names')}
+        # Файл целиком внутри диапазона обходится без маски
+        mask = None
+        if start is not None:
+            mask = part['created_at'] >= start
+        if end is not None:
+            mask = part['created_at'] < end if mask is None else mask & (part['created_at'] < end)
+        if mask is not None and not mask.all():
+            for name in ('created_at', 'path_idx', 'user_idx'):
+                part[name] = part[name][mask]
+        parts.append(part)
+
+    if not parts:
+        return VisitFrame.empty()
+
+    # Общий словарь путей: np.unique по объединению словарей файлов, индексы
+    # каждого файла переводятся через обратное отображение
+    paths, path_inverse = np.unique(np.concatenate([p['paths'] for p in parts]), return_inverse=True)
+    user_ids, user_inverse = np.unique(np.concatenate([p['user_ids'] for p in parts]), return_inverse=True)
+    user_names = np.full(len(user_ids), '', dtype=object)
+
+    path_offset = user_offset = 0
+    path_idx, user_idx = [], []
+    for part in parts:
+        path_map = path_inverse[path_offset:path_offset + len(part['paths'])]
+        user_map = user_inverse[user_offset:user_offset + len(part['user_ids'])]
+        path_offset += len(part['paths'])
+        user_offset += len(part['user_ids'])
+        path_idx.append(path_map[part['path_idx']].astype(np.int32))
+        user_idx.append(_remap(part['user_idx'], user_map))
+        # Файлы идут по возрастанию месяца: остается самое свежее ФИО
+        known = part['user_names'] != ''
+        user_names[user_map[known]] = part['user_names'][known]
+
+    return VisitFrame(np.concatenate([p['created_at'] for p in parts]), np.concatenate(path_idx),
+                      np.concatenate(user_idx), paths, user_ids, user_names.astype(str))
+
+
+def top_indices(counts, n=None):
+    """Индексы ненулевых counts по убыванию (при равенстве -- по возрастанию индекса)."""
+    candidates = np.flatnonzero(counts)
+    if n is not None and n < len(candidates):
+        # argpartition -- O(N), полная сортировка нужна только для n лучших
+        candidates = candidates[np.argpartition(-counts[candidates], n - 1)[:n]]
+    return candidates[np.lexsort((candidates, -counts[candidates]))]
+
+
+def page_report(frame, top=None):
+    counts = np.bincount(frame.path_idx, minlength=len(frame.paths))
+    return [{'path': str(frame.paths[i]), 'visit_count': int(counts[i])} for i in top_indices(counts, top)]
+
+
+def user_report(frame, top=None):
+    # Ячейка 0 -- анонимные посещения, i + 1 -- пользователь user_ids[i]
+    counts = np.bincount(frame.user_idx + 1, minlength=len(frame.user_ids) + 1)
+    report = []
+    for i in top_indices(counts, top):
+        if i == 0:
+            report.append({'user_id': None, 'user': ANONYMOUS, 'visit_count': int(counts[i])})
+        else:
+            user_id = int(frame.user_ids[i - 1])
+            report.append({'user_id': user_id, 'user': str(frame.user_names[i - 1]) or f'#{user_id}',
+                           'visit_count': int(counts[i])})
+    return report
+
+
+def hourly_traffic(frame):
+    """Число посещений по часу суток, массив из 24 элементов."""
+    return np.bincount((frame.created_at // 3600) % 24, minlength=24)
+
+
+def traffic_timeline(frame, bucket=3600):
+    """Посещения по интервалам bucket секунд: (начала интервалов datetime64, счетчики)."""
+    if not len(frame):
+        return np.empty(0, 'datetime64[s]'), np.empty(0, np.int64)
+    buckets = frame.created_at // bucket
+    first = buckets.min()
+    counts = np.bincount(buckets - first)
+    starts = ((first + np.arange(len(counts))) * bucket).astype('datetime64[s]')
+    return starts, counts
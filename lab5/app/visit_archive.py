@@ -0,0 +1,123 @@
+# Архив visit_logs в сжатых столбцовых файлах: один файл .npz на закрытый
+# календарный месяц (совпадает с разделом таблицы). Пути и пользователи
+# интернированы: строки хранятся один раз в словаре файла, а в столбцах лежат
+# целочисленные индексы, поэтому файлы читаются прямо в массивы NumPy.
+#
+# Столбцы файла visit_logs_ГГГГММ.npz:
+#   id          int64   идентификатор записи
+#   created_at  int64   время посещения, секунды от 1970-01-01 (без часового пояса, как в БД)
+#   path_idx    int32   индекс в paths
+#   user_idx    int32   индекс в user_ids/user_names, -1 для анонимных посещений
+#   paths       str     словарь путей
+#   user_ids    int32   словарь пользователей
+#   user_names  str     ФИО на момент выгрузки (пустая строка, если пользователь удален)
+#   window      int64   [начало, конец) окна в секундах
+import os
+import re
+from datetime import date, datetime
+
+import numpy as np
+
+from .repositories.visit_log_repository import add_months
+
+FILE_PATTERN = re.compile(r'^visit_logs_(\d{4})(\d{2})\.npz$')
+BATCH_SIZE = 50000
+
+
+def archive_file_name(month):
+    return f'visit_logs_{month:%Y%m}.npz'
+
+def to_seconds(value):
+    return np.datetime64(value, 's').astype(np.int64)
+
+def full_name(user):
+    name = f"{user['last_name']} {user['first_name']}"
+    if user.get('middle_name'):
+        name += f" {user['middle_name']}"
+    return name
+
+
+def archived_months(directory):
+    months = []
+    if os.path.isdir(directory):
+        for file_name in os.listdir(directory):
+            match = FILE_PATTERN.match(file_name)
+            if match:
+                months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+def write_window(path, rows, names, window_start, window_end):
+    """Записывает окно из строк (id, path, user_id, created_at).
+
+    names -- функция, которая по списку id пользователей возвращает словарь id -> ФИО.
+    """
+    path_index = {}
+    user_index = {}
+    chunks = {'id': [], 'created_at': [], 'path_idx': [], 'user_idx': []}
+
+    batch = []
+    def flush():
+        if not batch:
+            return
+        ids, paths, users, created = zip(*batch)
+        chunks['id'].append(np.array(ids, dtype=np.int64))
+        chunks['created_at'].append(np.array(created, dtype='datetime64[s]').astype(np.int64))
+        chunks['path_idx'].append(np.array([path_index.setdefault(p, len(path_index)) for p in paths], dtype=np.int32))
+        chunks['user_idx'].append(np.array([-1 if u is None else user_index.setdefault(u, len(user_index))
+                                            for u in users], dtype=np.int32))
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    flush()
+
+    user_ids = list(user_index)
+    known = names(user_ids) if user_ids else {}
+    columns = {
+        name: np.concatenate(parts) if parts else np.empty(0, dtype=np.int32 if name.endswith('_idx') else np.int64)
+        for name, parts in chunks.items()
+    }
+    columns.update(
+        paths=np.array(list(path_index), dtype=str),
+        user_ids=np.array(user_ids, dtype=np.int32),
+        user_names=np.array([known.get(user_id, '') for user_id in user_ids], dtype=str),
+        window=np.array([to_seconds(window_start), to_seconds(window_end)], dtype=np.int64),
+    )
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez_compressed(tmp_path, **columns)
+    os.replace(tmp_path, path)
+    return len(columns['id'])
+
+
+def export_month(visit_log_repository, user_repository, directory, month, source=None, force=False):
+    """Выгружает месяц month в directory. Возвращает число записей или None, если файл уже есть."""
+    path = os.path.join(directory, archive_file_name(month))
+    if os.path.exists(path) and not force:
+        return None
+    window_end = add_months(month, 1)
+    rows = visit_log_repository.iter_logs_between(month, window_end, table=source)
+
+    def names(user_ids):
+        return {user['id']: full_name(user) for user in user_repository.get_names_by_ids(user_ids)}
+
+    return write_window(path, rows, names, datetime.combine(month, datetime.min.time()),
+                        datetime.combine(window_end, datetime.min.time()))
+
+
+def closed_months(visit_log_repository, today=None):
+    """Закрытые месяцы, данные которых еще лежат в MySQL: месяц -> таблица-источник."""
+    current = date.today() if today is None else today
+    current = date(current.year, current.month, 1)
+    months = {}
+    for partition in visit_log_repository.get_partitions():
+        bound = partition['upper_bound']
+        if bound is not None and bound <= current:
+            months[add_months(bound, -1)] = None
+    for month, table in visit_log_repository.get_archive_tables():
+        months.setdefault(month, table)
+    return dict(sorted(months.items()))
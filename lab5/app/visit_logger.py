@@ -1,10 +1,12 @@
 import csv
+from datetime import date, timedelta
 from io import StringIO, BytesIO
-from flask import Blueprint, request, render_template, current_app, send_file, flash, redirect, url_for
+from flask import Blueprint, request, render_template, current_app, send_file, flash, redirect, url_for, jsonify
 from flask_login import current_user
 from .repositories.visit_log_repository import VisitLogRepository
 from .db import dbConnector as db
 from .auth import check_rights
+from .visit_sketches import visitSketches
 
 bp = Blueprint('visit_logs', __name__, url_prefix='/visit_logs')
 
@@ -12,6 +14,23 @@ visit_log_repository = VisitLogRepository(db)
 
 RECORDS_PER_PAGE = 10
 
+def report_period():
+    # Период из строки запроса (обе даты включительно), по умолчанию последние
+    # VISIT_LOGS_REPORT_DAYS дней. Без периода запросы читали бы все разделы visit_logs
+    date_to = request.args.get('date_to', type=date.fromisoformat) or date.today()
+    days = current_app.config.get('VISIT_LOGS_REPORT_DAYS', 30)
+    date_from = request.args.get('date_from', type=date.fromisoformat) or date_to - timedelta(days=days - 1)
+    if date_from > date_to:
+        date_from, date_to = date_to, date_from
+    return {'date_from': date_from.isoformat(), 'date_to': date_to.isoformat()}
+
+def period_filter(period):
+    # Репозиторий ждет полуинтервал [date_from, date_to)
+    return {
+        'date_from': date.fromisoformat(period['date_from']),
+        'date_to': date.fromisoformat(period['date_to']) + timedelta(days=1),
+    }
+
 @bp.before_app_request
 def log_request_info():
     if request.endpoint and (request.endpoint.startswith('static') or \
@@ -25,23 +44,27 @@ def log_request_info():
     if path == '/favicon.ico':
         return
         
-    visit_log_repository.create(path, user_id)
+    route = request.url_rule.rule if request.url_rule is not None else None
+    visit_log_repository.create(path, user_id, route=route)
+    visitSketches.record(path, f'user:{user_id}' if user_id is not None else f'ip:{request.remote_addr}')
 
 @bp.route('/')
 @check_rights(['admin', 'user'])
 def index():
     page = request.args.get('page', 1, type=int)
+    period = report_period()
 
     if current_user.is_authenticated and current_user.is_admin:
         user_id = None
     else:
         user_id = current_user.id if current_user.is_authenticated else None
 
-    total_records = visit_log_repository.get_log_count(user_id=user_id)
+    total_records = visit_log_repository.get_log_count(user_id=user_id, **period_filter(period))
     total_pages = (total_records + RECORDS_PER_PAGE - 1) // RECORDS_PER_PAGE
     offset = (page - 1) * RECORDS_PER_PAGE
 
-    logs = visit_log_repository.get_all_logs(limit=RECORDS_PER_PAGE, offset=offset, user_id=user_id)
+    logs = visit_log_repository.get_all_logs(limit=RECORDS_PER_PAGE, offset=offset, user_id=user_id,
+                                             **period_filter(period))
     
     formatted_logs = []
     for log in logs:
@@ -62,18 +85,44 @@ def index():
                            logs=formatted_logs, 
                            page=page, 
                            total_pages=total_pages,
-                           total_records=total_records)
+                           total_records=total_records,
+                           period=period)
+
+def page_group():
+    # Отчет по конкретным путям или по шаблонам маршрутов (/users/<int:user_id>/edit)
+    group_by = request.args.get('group_by', 'path')
+    return group_by if group_by in ('path', 'route') else 'path'
 
 @bp.route('/pages_report')
 @check_rights(['admin'])
 def pages_report():
-    stats = visit_log_repository.get_page_visit_stats()
-    return render_template('visit_logs/pages_report.html', stats=stats)
+    group_by = page_group()
+    period = report_period()
+    stats = visit_log_repository.get_page_visit_stats(group_by=group_by, **period_filter(period))
+    return render_template('visit_logs/pages_report.html', stats=stats, group_by=group_by, period=period)
+
+LIVE_WINDOWS = (60, 300, 900)
+
+def live_snapshot():
+    window = request.args.get('window', 300, type=int)
+    if window not in LIVE_WINDOWS:
+        window = 300
+    return visitSketches.snapshot(window_seconds=window, top=request.args.get('top', 10, type=int))
+
+@bp.route('/live')
+@check_rights(['admin'])
+def live():
+    return render_template('visit_logs/live.html', snapshot=live_snapshot(), windows=LIVE_WINDOWS)
+
+@bp.route('/live.json')
+@check_rights(['admin'])
+def live_json():
+    return jsonify(live_snapshot())
 
 @bp.route('/pages_report/export_csv')
 @check_rights(['admin'])
 def pages_report_export_csv():
-    stats = visit_log_repository.get_page_visit_stats()
+    stats = visit_log_repository.get_page_visit_stats(group_by=page_group(), **period_filter(report_period()))
     
     si = StringIO()
     cw = csv.writer(si)
@@ -94,7 +143,8 @@ def pages_report_export_csv():
 @bp.route('/users_report')
 @check_rights(['admin'])
 def users_report():
-    stats = visit_log_repository.get_user_visit_stats()
+    period = report_period()
+    stats = visit_log_repository.get_user_visit_stats(**period_filter(period))
     formatted_stats = []
     for stat in stats:
         user_full_name = "Неаутентифицированный пользователь"
@@ -107,12 +157,12 @@ def users_report():
             'user': user_full_name,
             'visit_count': stat['visit_count']
         })
-    return render_template('visit_logs/users_report.html', stats=formatted_stats)
+    return render_template('visit_logs/users_report.html', stats=formatted_stats, period=period)
 
 @bp.route('/users_report/export_csv')
 @check_rights(['admin'])
 def users_report_export_csv():
-    stats = visit_log_repository.get_user_visit_stats()
+    stats = visit_log_repository.get_user_visit_stats(**period_filter(report_period()))
     
     si = StringIO()
     cw = csv.writer(si)
@@ -0,0 +1,331 @@
+# Приближенная статистика посещений в реальном времени без запросов к MySQL.
+# log_request_info передает сюда каждое посещение; в памяти процесса лежат
+# корзины по VISIT_SKETCHES_BUCKET_SECONDS секунд, в каждой:
+#   - Space-Saving: самые посещаемые пути (не более VISIT_SKETCHES_CAPACITY);
+#   - Count-Min: уточняет их счетчики сверху;
+#   - HyperLogLog: уникальные посетители всего и по каждому отслеживаемому пути.
+# Окно "последние N минут" собирается слиянием корзин. Воркеры gunicorn
+# сбрасывают свои корзины в VISIT_SKETCHES_DIR, панель сливает файлы всех воркеров.
+import base64
+import glob
+import hashlib
+import json
+import math
+import os
+import time
+from array import array
+from threading import Lock
+
+_MASK64 = (1 << 64) - 1
+
+
+def hash64(value):
+    # Встроенный hash() зависит от процесса, а скетчи разных воркеров сливаются
+    return int.from_bytes(hashlib.blake2b(value.encode('utf8'), digest_size=8).digest(), 'big')
+
+
+class CountMinSketch:
+    def __init__(self, width=1024, depth=4, table=None):
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else array('I', bytes(4 * width * depth))
+
+    def _indexes(self, key_hash):
+        # Двойное хеширование: depth индексов из одного 64-битного хеша
+        h1, h2 = key_hash & 0xffffffff, (key_hash >> 32) | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, key_hash, count=1):
+        for index in self._indexes(key_hash):
+            self.table[index] += count
+
+    def estimate(self, key_hash):
+        return min(self.table[index] for index in self._indexes(key_hash))
+
+    @staticmethod
+    def estimate_sum(sketches, key_hash):
+        # Оценка по объединению корзин без слияния таблиц целиком
+        if not sketches:
+            return 0
+        indexes = sketches[0]._indexes(key_hash)
+        return min(sum(sketch.table[index] for sketch in sketches) for index in indexes)
+
+    def to_state(self):
+        return {'width': self.width, 'depth': self.depth, 'table': base64.b64encode(self.table.tobytes()).decode()}
+
+    @classmethod
+    def from_state(cls, state):
+        table = array('I')
+        table.frombytes(base64.b64decode(state['table']))
+        return cls(state['width'], state['depth'], table)
+
+
+class SpaceSaving:
+    def __init__(self, capacity=100, counters=None):
+        self.capacity = capacity
+        # ключ -> [счетчик, максимальная переоценка]
+        self.counters = counters if counters is not None else {}
+
+    def add(self, key, count=1):
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[key] = [count, 0]
+        else:
+            evicted = min(self.counters, key=lambda k: self.counters[k][0])
+            minimum = self.counters.pop(evicted)[0]
+            self.counters[key] = [minimum + count, minimum]
+            return evicted
+        return None
+
+    def min_count(self):
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(counter[0] for counter in self.counters.values())
+
+    def top(self, n=None):
+        items = sorted(self.counters.items(), key=lambda item: (-item[1][0], item[0]))
+        return [(key, count, error) for key, (count, error) in items[:n]]
+
+    @classmethod
+    def merge(cls, summaries, capacity):
+        # Ключ, которого нет в сводке, мог встретиться в ней не больше ее минимума
+        minimums = [summary.min_count() for summary in summaries]
+        keys = set().union(*(summary.counters for summary in summaries))
+        merged = {}
+        for key in keys:
+            count = error = 0
+            for summary, minimum in zip(summaries, minimums):
+                counter = summary.counters.get(key)
+                if counter is None:
+                    count += minimum
+                    error += minimum
+                else:
+                    count += counter[0]
+                    error += counter[1]
+            merged[key] = [count, error]
+        top = sorted(merged.items(), key=lambda item: -item[1][0])[:capacity]
+        return cls(capacity, dict(top))
+
+
+class HyperLogLog:
+    def __init__(self, precision=10, registers=None):
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(1 << precision)
+
+    def add_hash(self, value_hash):
+        index = value_hash >> (64 - self.precision)
+        rest = (value_hash << self.precision) & _MASK64
+        rank = min(64 - rest.bit_length() + 1, 64 - self.precision + 1)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        m = len(self.registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Малые значения точнее считает линейный подсчет
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def copy(self):
+        return HyperLogLog(self.precision, bytearray(self.registers))
+
+    def to_state(self):
+        return base64.b64encode(bytes(self.registers)).decode()
+
+    @classmethod
+    def from_state(cls, state, precision):
+        return cls(precision, bytearray(base64.b64decode(state)))
+
+
+class SketchBucket:
+    def __init__(self, start, capacity, path_precision, visitor_precision):
+        self.start = start
+        self.total = 0
+        self.top = SpaceSaving(capacity)
+        self.counts = CountMinSketch()
+        self.visitors = HyperLogLog(visitor_precision)
+        # HLL только для путей из Space-Saving, иначе их число не ограничено
+        self.path_visitors = {}
+        self.path_precision = path_precision
+
+    def add(self, path, visitor_hash):
+        self.total += 1
+        self.counts.add(hash64(path))
+        evicted = self.top.add(path)
+        if evicted is not None:
+            self.path_visitors.pop(evicted, None)
+        self.visitors.add_hash(visitor_hash)
+        hll = self.path_visitors.get(path)
+        if hll is None:
+            hll = self.path_visitors[path] = HyperLogLog(self.path_precision)
+        hll.add_hash(visitor_hash)
+
+    def to_state(self):
+        return {
+            'start': self.start,
+            'total': self.total,
+            'top': self.top.counters,
+            'counts': self.counts.to_state(),
+            'visitors': self.visitors.to_state(),
+            'path_visitors': {path: hll.to_state() for path, hll in self.path_visitors.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state, capacity, path_precision, visitor_precision):
+        bucket = cls(state['start'], capacity, path_precision, visitor_precision)
+        bucket.total = state['total']
+        bucket.top = SpaceSaving(capacity, state['top'])
+        bucket.counts = CountMinSketch.from_state(state['counts'])
+        bucket.visitors = HyperLogLog.from_state(state['visitors'], visitor_precision)
+        bucket.path_visitors = {path: HyperLogLog.from_state(value, path_precision)
+                                for path, value in state['path_visitors'].items()}
+        return bucket
+
+
+class VisitSketches:
+    def __init__(self, app=None):
+        self._lock = Lock()
+        self._buckets = {}
+        self._last_flush = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('VISIT_SKETCHES_BUCKET_SECONDS', 30)
+        app.config.setdefault('VISIT_SKETCHES_RETENTION_SECONDS', 15 * 60)
+        app.config.setdefault('VISIT_SKETCHES_CAPACITY', 100)
+        app.config.setdefault('VISIT_SKETCHES_PATH_PRECISION', 8)
+        app.config.setdefault('VISIT_SKETCHES_VISITOR_PRECISION', 12)
+        app.config.setdefault('VISIT_SKETCHES_DIR', os.environ.get('VISIT_SKETCHES_DIR'))
+        app.config.setdefault('VISIT_SKETCHES_FLUSH_INTERVAL', 5.0)
+
+        if not hasattr(app, 'extensions'):
+            app.extensions = {}
+        app.extensions['visit_sketches'] = self
+        if app.config['VISIT_SKETCHES_DIR']:
+            os.makedirs(app.config['VISIT_SKETCHES_DIR'], exist_ok=True)
+
+    def _new_bucket(self, start):
+        config = self.app.config
+        return SketchBucket(start, config['VISIT_SKETCHES_CAPACITY'], config['VISIT_SKETCHES_PATH_PRECISION'],
+                            config['VISIT_SKETCHES_VISITOR_PRECISION'])
+
+    def record(self, path, visitor, now=None):
+        now = time.time() if now is None else now
+        size = self.app.config['VISIT_SKETCHES_BUCKET_SECONDS']
+        start = int(now // size) * size
+        visitor_hash = hash64(str(visitor))
+        with self._lock:
+            bucket = self._buckets.get(start)
+            if bucket is None:
+                bucket = self._buckets[start] = self._new_bucket(start)
+                self._expire(now)
+            bucket.add(path, visitor_hash)
+
+        if self.app.config['VISIT_SKETCHES_DIR'] and \
+                time.monotonic() - self._last_flush >= self.app.config['VISIT_SKETCHES_FLUSH_INTERVAL']:
+            self.flush()
+
+    def _expire(self, now):
+        oldest = now - self.app.config['VISIT_SKETCHES_RETENTION_SECONDS']
+        for start in [start for start in self._buckets if start + self.app.config['VISIT_SKETCHES_BUCKET_SECONDS'] <= oldest]:
+            del self._buckets[start]
+
+    def _state_file(self, pid=None):
+        return os.path.join(self.app.config['VISIT_SKETCHES_DIR'], f'visit_sketches_{pid or os.getpid()}.json')
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        with self._lock:
+            state = [bucket.to_state() for bucket in self._buckets.values()]
+        target = self._state_file()
+        with open(target + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(target + '.tmp', target)
+
+    def _all_buckets(self, since):
+        with self._lock:
+            buckets = [bucket for bucket in self._buckets.values() if bucket.start >= since]
+        directory = self.app.config['VISIT_SKETCHES_DIR']
+        if not directory:
+            return buckets
+
+        config = self.app.config
+        own = self._state_file()
+        retention = config['VISIT_SKETCHES_RETENTION_SECONDS']
+        for path in glob.glob(os.path.join(directory, 'visit_sketches_*.json')):
+            if path == own:
+                continue
+            try:
+                if os.path.getmtime(path) < time.time() - retention:
+                    # Воркер давно завершился, все его корзины вне окна
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    states = json.load(f)
+            except (OSError, ValueError):
+                continue
+            buckets += [SketchBucket.from_state(state, config['VISIT_SKETCHES_CAPACITY'],
+                                                config['VISIT_SKETCHES_PATH_PRECISION'],
+                                                config['VISIT_SKETCHES_VISITOR_PRECISION'])
+                        for state in states if state['start'] >= since]
+        return buckets
+
+    def snapshot(self, window_seconds=300, top=10, now=None):
+        now = time.time() if now is None else now
+        size = self.app.config['VISIT_SKETCHES_BUCKET_SECONDS']
+        # Окно выравнивается по границам корзин и может захватить до одной корзины больше
+        since = int((now - window_seconds) // size) * size
+        buckets = self._all_buckets(since)
+
+        visitors = HyperLogLog(self.app.config['VISIT_SKETCHES_VISITOR_PRECISION'])
+        for bucket in buckets:
+            visitors.merge(bucket.visitors)
+
+        capacity = self.app.config['VISIT_SKETCHES_CAPACITY']
+        summary = SpaceSaving.merge([bucket.top for bucket in buckets], capacity)
+        sketches = [bucket.counts for bucket in buckets]
+        pages = []
+        for path, count, error in summary.top():
+            key_hash = hash64(path)
+            path_visitors = None
+            for bucket in buckets:
+                hll = bucket.path_visitors.get(path)
+                if hll is not None:
+                    if path_visitors is None:
+                        path_visitors = hll.copy()
+                    else:
+                        path_visitors.merge(hll)
+            estimate = min(count, CountMinSketch.estimate_sum(sketches, key_hash))
+            pages.append({
+                'path': path,
+                'visit_count': estimate,
+                'max_error': min(error, estimate),
+                'unique_visitors': path_visitors.count() if path_visitors else 0,
+            })
+        pages.sort(key=lambda page: (-page['visit_count'], page['path']))
+
+        return {
+            'window_seconds': window_seconds,
+            'total': sum(bucket.total for bucket in buckets),
+            'unique_visitors': visitors.count(),
+            'top_pages': pages[:top],
+        }
+
+    def reset_after_fork(self):
+        # Корзины мастера не переносятся в воркеры
+        self._lock = Lock()
+        self._buckets = {}
+        self._last_flush = 0.0
+
+
+visitSketches = VisitSketches()
@@ -0,0 +1,54 @@
+import pytest
+from flask import url_for
+
+pytest.importorskip('pytest_benchmark')
+
+from app import visit_logger
+from app.repositories.path_repository import PathCache
+from app.repositories.visit_log_repository import VisitLogRepository
+from app.utils.validator import validate_password
+
+def test_visit_log_get_all_logs(benchmark, db_connector, size):
+    repository = VisitLogRepository(db_connector)
+    logs = benchmark(repository.get_all_logs, limit=10, offset=0)
+    assert len(logs) == min(10, size)
+    assert logs == sorted(logs, key=lambda log: log['created_at'], reverse=True)
+
+def test_visit_log_get_log_count(benchmark, db_connector, size):
+    repository = VisitLogRepository(db_connector)
+    assert benchmark(repository.get_log_count) == size
+
+def test_visit_log_page_stats(benchmark, db_connector, fake_db, size):
+    repository = VisitLogRepository(db_connector, path_cache=PathCache())
+    stats = benchmark(repository.get_page_visit_stats)
+    assert sum(row['visit_count'] for row in stats) == size
+    assert {row['path'] for row in stats} <= set(fake_db.paths)
+
+@pytest.mark.parametrize('endpoint', ['pages_report_export_csv', 'users_report_export_csv'])
+def test_csv_export(benchmark, app, admin_client, db_connector, fake_db, size, endpoint):
+    # Журналирование запроса остается заглушкой, отчеты выполняют настоящий SQL на базе в памяти
+    repository = VisitLogRepository(db_connector, path_cache=PathCache())
+    visit_logger.visit_log_repository.get_page_visit_stats.side_effect = repository.get_page_visit_stats
+    visit_logger.visit_log_repository.get_user_visit_stats.side_effect = repository.get_user_visit_stats
+
+    with app.test_request_context():
+        url = url_for(f'visit_logs.{endpoint}')
+    response = benchmark(admin_client.get, url)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = response.get_data(as_text=True).splitlines()[1:]
+    if endpoint == 'users_report_export_csv':
+        assert len(rows) == len(fake_db.users)
+        assert sum(int(row.rsplit(',', 1)[1]) for row in rows) == \
+            sum(1 for log in fake_db.visit_logs if log['user_id'] is not None)
+    else:
+        assert sum(int(row.rsplit(',', 1)[1]) for row in rows) == size
+
+@pytest.mark.parametrize('password', [
+    'Qwerty123',
+    'qwertyuiop',
+    'Пароль1Пароль1Пароль1Пароль1',
+    'A1b' * 42,
+], ids=['valid', 'no-upper', 'cyrillic', 'max-length'])
+def test_validate_password(benchmark, password):
+    benchmark(validate_password, password)
@@ -0,0 +1,59 @@
+# Микробенчмарки горячих путей lab5 (нужен pytest-benchmark).
+# Запуск из каталога lab5:
+#   python -m pytest benchmarks/bench_*.py --benchmark-group-by=func
+# Размеры наборов данных задаются через BENCH_SIZES (по умолчанию 10,100,1000).
+# MySQL подменяется заполненной базой в памяти из bench/fake_mysql.py: она
+# выполняет фильтры, сортировку и LIMIT, поэтому время растет с объемом данных.
+import os
+import sys
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app import create_app
+from app.auth import User as AuthUser
+from app.db import DBConnector
+
+# bench/ лежит в корне репозитория; в конец пути, чтобы app.py корня не заслонил пакет app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from bench.fake_mysql import FakeDatabase
+
+BENCH_SIZES = [int(x) for x in os.environ.get('BENCH_SIZES', '10,100,1000').split(',')]
+
+
+@pytest.fixture(params=BENCH_SIZES, ids=lambda size: f'n={size}')
+def size(request):
+    return request.param
+
+@pytest.fixture()
+def fake_db(size):
+    return FakeDatabase(users=50, visit_logs=size, seed=size)
+
+@pytest.fixture()
+def db_connector(app, fake_db):
+    connector = DBConnector()
+    connector.init_app(app)
+    # Свой контекст: в контексте сессии уже закешировано соединение-заглушка
+    with patch('mysql.connector.connect', side_effect=fake_db.connect), app.app_context():
+        yield connector
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'bench',
+        'SERVER_NAME': 'localhost.test',
+        'MYSQL_USER': 'bench',
+        'MYSQL_PASSWORD': 'bench',
+        'MYSQL_HOST': 'localhost',
+        'MYSQL_DATABASE': 'bench',
+    })
+    with patch('mysql.connector.connect', return_value=MagicMock()):
+        with app.app_context():
+            yield app
+
+@pytest.fixture()
+def admin_client(app, monkeypatch):
+    admin = AuthUser(1, 'admin', 1, 'admin')
+    monkeypatch.setattr('flask_login.utils._get_user', lambda: admin)
+    monkeypatch.setattr('app.visit_logger.visit_log_repository', MagicMock())
+    return app.test_client()
@@ -0,0 +1,84 @@
+from unittest.mock import MagicMock, patch
+
+import mysql.connector
+import pytest
+
+from app.db import DBConnector, read_only
+
+
+class Repository:
+    def __init__(self, db_connector):
+        self.db_connector = db_connector
+
+    @read_only
+    def report(self):
+        return self.db_connector.connect()
+
+    def write(self):
+        return self.db_connector.connect()
+
+
+def replica_connection(lag):
+    connection = MagicMock(name='replica')
+    cursor = connection.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [{'Seconds_Behind_Source': lag}]
+    return connection
+
+@pytest.fixture
+def connector(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'MYSQL_REPORTING', {'host': 'replica'})
+    monkeypatch.setitem(app.config, 'SQL_INSTRUMENTATION', False)
+    connector = DBConnector()
+    connector.init_app(app)
+    return connector
+
+def connect_by_host(primary, replica):
+    return lambda **config: replica if config['host'] == 'replica' else primary
+
+def test_read_only_methods_use_reporting_replica(app, connector):
+    primary, replica = MagicMock(name='primary'), replica_connection(0)
+    with patch('mysql.connector.connect', side_effect=connect_by_host(primary, replica)), app.app_context():
+        repository = Repository(connector)
+        assert repository.report() is replica
+        assert repository.write() is primary
+
+def test_lagging_replica_falls_back_to_primary(app, connector):
+    primary, replica = MagicMock(name='primary'), replica_connection(120)
+    with patch('mysql.connector.connect', side_effect=connect_by_host(primary, replica)), app.app_context():
+        assert Repository(connector).report() is primary
+
+def test_stopped_replication_falls_back_to_primary(app, connector):
+    primary, replica = MagicMock(name='primary'), replica_connection(None)
+    with patch('mysql.connector.connect', side_effect=connect_by_host(primary, replica)), app.app_context():
+        assert Repository(connector).report() is primary
+
+def test_lag_is_checked_once_per_interval(app, connector):
+    primary, replica = MagicMock(name='primary'), replica_connection(0)
+    with patch('mysql.connector.connect', side_effect=connect_by_host(primary, replica)):
+        for _ in range(3):
+            with app.app_context():
+                assert Repository(connector).report() is replica
+    cursor = replica.cursor.return_value.__enter__.return_value
+    assert cursor.execute.call_count == 1
+
+def test_unavailable_replica_is_skipped(app, connector):
+    primary = MagicMock(name='primary')
+
+    def connect(**config):
+        if config['host'] == 'replica':
+            raise mysql.connector.Error('Can\'t connect')
+        return primary
+
+    with patch('mysql.connector.connect', side_effect=connect) as connect_mock, app.app_context():
+        repository = Repository(connector)
+        assert repository.report() is primary
+        assert repository.report() is primary
+        hosts = [c.kwargs['host'] for c in connect_mock.call_args_list]
+        assert hosts.count('replica') == 1
+
+def test_without_replica_reports_use_primary(app, connector, monkeypatch):
+    monkeypatch.setitem(app.config, 'MYSQL_REPORTING', None)
+    primary = MagicMock(name='primary')
+    with patch('mysql.connector.connect', return_value=primary) as connect_mock, app.app_context():
+        assert Repository(connector).report() is primary
+        connect_mock.assert_called_once()
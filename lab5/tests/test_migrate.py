@@ -0,0 +1,192 @@
+from datetime import date, datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.migrate import (AddColumn, AddIndex, CreateTable, DropIndex, InternVisitLogPaths, MigrationRunner,
+                         MIGRATIONS, PartitionVisitLogs)
+
+
+@pytest.fixture
+def cursor(mock_db_connector):
+    return mock_db_connector.connect.return_value.cursor.return_value.__enter__.return_value
+
+def executed(cursor):
+    return [c.args[0] for c in cursor.execute.call_args_list]
+
+def test_add_index_is_online(cursor):
+    cursor.fetchone.return_value = None
+
+    assert AddIndex('visit_logs', 'ix_visit_logs_created_at', ['created_at']).apply(cursor) is True
+    cursor.execute.assert_called_with(
+        'ALTER TABLE visit_logs ADD INDEX ix_visit_logs_created_at (created_at), ALGORITHM=INPLACE, LOCK=NONE;')
+
+def test_add_unique_index(cursor):
+    cursor.fetchone.return_value = None
+
+    step = AddIndex('users', 'uq_users_active_username', ['active_username'], unique=True)
+    assert step.apply(cursor) is True
+    cursor.execute.assert_called_with('ALTER TABLE users ADD UNIQUE INDEX uq_users_active_username '
+                                      '(active_username), ALGORITHM=INPLACE, LOCK=NONE;')
+    assert step.describe().startswith('add unique index')
+
+def test_username_uniqueness_ignores_deleted_users():
+    steps = {version: steps for version, _, steps in MIGRATIONS}['0006']
+    assert 'IF(deleted_at IS NULL, username, NULL)' in steps[0].definition
+    assert steps[1].unique and steps[1].columns == ['active_username']
+    assert (steps[2].table, steps[2].name) == ('users', 'username')
+
+def test_add_index_skips_existing(cursor):
+    cursor.fetchone.return_value = (1,)
+
+    assert AddIndex('users', 'ix_users_last_name', ['last_name']).apply(cursor) is False
+    assert cursor.execute.call_count == 1
+    assert 'information_schema.STATISTICS' in cursor.execute.call_args.args[0]
+
+def test_drop_index_skips_missing(cursor):
+    cursor.fetchone.return_value = None
+
+    assert DropIndex('visit_logs', 'ix_visit_logs_user_id').apply(cursor) is False
+    assert cursor.execute.call_count == 1
+
+def test_migrate_applies_pending_versions(mock_db_connector, cursor):
+    first, second = MagicMock(), MagicMock()
+    migrations = [('0001', 'first', [first]), ('0002', 'second', [second])]
+    cursor.fetchone.return_value = (1,)
+    cursor.fetchall.return_value = [('0001',)]
+
+    assert MigrationRunner(mock_db_connector, migrations).migrate() == ['0002']
+
+    first.apply.assert_not_called()
+    second.apply.assert_called_once_with(cursor)
+    cursor.execute.assert_any_call('INSERT INTO schema_migrations (version, description) VALUES (%s, %s);',
+                                   ('0002', 'second'))
+    assert 'GET_LOCK' in executed(cursor)[0]
+    assert 'RELEASE_LOCK' in executed(cursor)[-1]
+    mock_db_connector.connect.return_value.commit.assert_called_once()
+
+def test_migrate_does_not_record_failed_version(mock_db_connector, cursor):
+    step = MagicMock()
+    step.apply.side_effect = RuntimeError('Lock wait timeout exceeded')
+    cursor.fetchone.return_value = (1,)
+    cursor.fetchall.return_value = []
+
+    with pytest.raises(RuntimeError):
+        MigrationRunner(mock_db_connector, [('0001', 'first', [step])]).migrate()
+
+    assert not any(sql.startswith('INSERT INTO schema_migrations') for sql in executed(cursor))
+    assert 'RELEASE_LOCK' in executed(cursor)[-1]
+
+def test_migrate_requires_lock(mock_db_connector, cursor):
+    cursor.fetchone.return_value = (0,)
+
+    with pytest.raises(RuntimeError, match='Another migration'):
+        MigrationRunner(mock_db_connector, MIGRATIONS).migrate(lock_timeout=0)
+
+    assert cursor.execute.call_count == 1
+
+def test_migration_versions_are_unique_and_ordered():
+    versions = [version for version, _, _ in MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+def test_add_column_is_online(cursor):
+    cursor.fetchone.return_value = None
+
+    assert AddColumn('users', 'deleted_at', 'DATETIME DEFAULT NULL').apply(cursor) is True
+    cursor.execute.assert_called_with(
+        'ALTER TABLE users ADD COLUMN deleted_at DATETIME DEFAULT NULL, ALGORITHM=INPLACE, LOCK=NONE;')
+
+def test_create_table_skips_existing(cursor):
+    cursor.fetchone.return_value = (1,)
+
+    assert CreateTable('paths', 'id INT PRIMARY KEY').apply(cursor) is False
+    assert 'information_schema.TABLES' in cursor.execute.call_args.args[0]
+
+def test_intern_paths_backfills_in_batches(cursor):
+    # столбец path есть; первая незаполненная запись -- id 1, последняя -- 15000
+    cursor.fetchone.side_effect = [(1,), (0,), (15000,)]
+
+    assert InternVisitLogPaths(batch_size=10000).apply(cursor) is True
+
+    sql = executed(cursor)
+    assert sql[1].startswith('INSERT IGNORE INTO paths (path) SELECT DISTINCT path')
+    updates = [c.args for c in cursor.execute.call_args_list if c.args[0].startswith('UPDATE visit_logs JOIN paths')]
+    assert [params for _, params in updates] == [(0, 10000), (10000, 20000)]
+
+def test_intern_paths_skips_without_path_column(cursor):
+    cursor.fetchone.return_value = None
+
+    assert InternVisitLogPaths().apply(cursor) is False
+    assert cursor.execute.call_count == 1
+
+def test_partition_visit_logs_copies_and_swaps_tables(cursor):
+    cursor.fetchone.side_effect = [
+        None,                          # таблица еще не разбита
+        (datetime(2024, 11, 5, 12),),  # самая старая запись
+        (1,),                          # столбец path еще есть
+        (25000,),                      # MAX(id) перед копированием
+        (25000,), (25000,),            # под блокировкой: все пути уже заполнены
+        (25010,),                      # MAX(id) после записей во время копирования
+    ]
+
+    step = PartitionVisitLogs(months_ahead=1, batch_size=10000, today=date(2025, 1, 15))
+    assert step.apply(cursor) is True
+
+    sql = executed(cursor)
+    create = next(s for s in sql if s.startswith('CREATE TABLE visit_logs_new'))
+    assert "PARTITION p202411 VALUES LESS THAN ('2024-12-01')" in create
+    assert "PARTITION p202502 VALUES LESS THAN ('2025-03-01'), PARTITION pmax VALUES LESS THAN (MAXVALUE)" in create
+    assert 'path VARCHAR' not in create
+
+    copies = [c.args[1] for c in cursor.execute.call_args_list if c.args[0].startswith('INSERT INTO visit_logs_new')]
+    assert copies == [(0, 10000), (10000, 20000), (20000, 30000), (25000, 35000)]
+
+    lock = sql.index('LOCK TABLES visit_logs WRITE, visit_logs_new WRITE, paths WRITE;')
+    rename = sql.index('RENAME TABLE visit_logs TO visit_logs_old, visit_logs_new TO visit_logs;')
+    assert lock < rename < sql.index('UNLOCK TABLES;') < sql.index('DROP TABLE visit_logs_old;')
+    # Дописывание последних строк идет под блокировкой
+    assert lock < sql.index('INSERT INTO visit_logs_new (id, path_id, route_id, user_id, created_at) '
+                            'SELECT id, path_id, route_id, user_id, COALESCE(created_at, CURRENT_TIMESTAMP) '
+                            'FROM visit_logs WHERE id > %s AND id <= %s;', lock)
+
+def test_partition_visit_logs_unlocks_on_error(cursor):
+    cursor.fetchone.side_effect = [None, (None,), None, (0,), (0,)]
+    def execute(sql, params=None):
+        if sql.startswith('RENAME TABLE'):
+            raise RuntimeError('rename failed')
+    cursor.execute.side_effect = execute
+
+    with pytest.raises(RuntimeError):
+        PartitionVisitLogs().apply(cursor)
+    assert executed(cursor)[-1] == 'UNLOCK TABLES;'
+
+def test_partition_visit_logs_skips_partitioned_table(cursor):
+    cursor.fetchone.return_value = (1,)
+
+    assert PartitionVisitLogs().apply(cursor) is False
+    assert cursor.execute.call_count == 1
+
+def test_migration_steps_describe_themselves():
+    for _, _, steps in MIGRATIONS:
+        for step in steps:
+            assert step.describe()
+
+def test_baseline_migration_creates_original_tables():
+    version, _, steps = MIGRATIONS[0]
+    assert version == '0001'
+    assert [step.name for step in steps] == ['roles', 'users', 'visit_logs']
+
+def test_init_db_runs_migrations_and_loads_default_data(app, mock_db_connector, cursor):
+    with patch('app.cli.db', mock_db_connector), \
+            patch('app.cli.MigrationRunner') as runner, \
+            patch('app.cli.VisitLogRepository') as repository:
+        result = app.test_cli_runner().invoke(args=['init-db'])
+
+    assert result.exit_code == 0, result.output
+    runner.return_value.migrate.assert_called_once()
+    repository.return_value.create_partitions.assert_called_once()
+    statements = executed(cursor)
+    assert len(statements) == 5
+    assert all('INSERT IGNORE' in s for s in statements)
+    assert not any('DROP' in s or 'CREATE' in s for s in statements)
+    mock_db_connector.connect.return_value.commit.assert_called_once()
@@ -0,0 +1,118 @@
+import logging
+import pytest
+from unittest.mock import MagicMock
+
+from app.query_stats import fingerprint, queryStats, InstrumentedConnection
+
+@pytest.fixture
+def stats(app):
+    queryStats.reset()
+    yield queryStats
+    queryStats.reset()
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = 200
+    app.config['SLOW_QUERY_EXPLAIN_RATE'] = 0.0
+
+@pytest.fixture
+def raw_connection():
+    connection = MagicMock()
+    cursor = MagicMock()
+    cursor.rowcount = -1
+    connection.cursor.return_value = cursor
+    cursor.__enter__.return_value = cursor
+    return connection
+
+def test_fingerprint_normalizes_literals_and_whitespace():
+    query = """SELECT * FROM users
+               WHERE id = %s AND name = 'Иван' AND role_id IN (1, 2, 3) LIMIT 10;"""
+    assert fingerprint(query) == 'SELECT * FROM users WHERE id = ? AND name = ? AND role_id IN (...) LIMIT ?'
+
+def test_fingerprint_groups_same_query_with_different_params():
+    assert fingerprint('SELECT * FROM roles WHERE id = 1') == fingerprint('SELECT * FROM roles WHERE id = %s;')
+
+def test_instrumented_cursor_records_duration_and_rows(app, stats, raw_connection):
+    raw_cursor = raw_connection.cursor.return_value
+    raw_cursor.fetchall.return_value = [{'id': 1}, {'id': 2}]
+
+    connection = InstrumentedConnection(raw_connection, stats)
+    with connection.cursor(dictionary=True) as cursor:
+        cursor.execute('SELECT * FROM roles WHERE id > %s', (0,))
+        rows = cursor.fetchall()
+
+    assert len(rows) == 2
+    raw_cursor.execute.assert_called_once_with('SELECT * FROM roles WHERE id > %s', (0,))
+    totals = stats.snapshot()['SELECT * FROM roles WHERE id > ?']
+    assert totals['count'] == 1
+    assert totals['rows'] == 2
+    assert totals['slow'] == 0
+
+def test_instrumented_cursor_uses_rowcount_for_writes(app, stats, raw_connection):
+    raw_connection.cursor.return_value.rowcount = 3
+
+    connection = InstrumentedConnection(raw_connection, stats)
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM visit_logs WHERE user_id = %s', (1,))
+
+    assert stats.snapshot()['DELETE FROM visit_logs WHERE user_id = ?']['rows'] == 3
+
+def test_slow_query_is_logged_with_explain(app, stats, raw_connection, caplog):
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = 0
+    app.config['SLOW_QUERY_EXPLAIN_RATE'] = 1.0
+    raw_cursor = raw_connection.cursor.return_value
+    raw_cursor.fetchall.side_effect = [[{'id': 1}], [{'type': 'ALL', 'rows': 1}]]
+
+    connection = InstrumentedConnection(raw_connection, stats)
+    with caplog.at_level(logging.WARNING, logger='app.slow_queries'):
+        with connection.cursor(dictionary=True) as cursor:
+            cursor.execute('SELECT * FROM users WHERE id = %s', (1,))
+            cursor.fetchall()
+
+    assert stats.snapshot()['SELECT * FROM users WHERE id = ?']['slow'] == 1
+    raw_cursor.execute.assert_called_with('EXPLAIN SELECT * FROM users WHERE id = %s', (1,))
+    assert 'EXPLAIN' in caplog.text
+    assert "'type': 'ALL'" in caplog.text
+
+def test_query_log_is_capped_but_summary_counts_all(app, stats, raw_connection, monkeypatch):
+    monkeypatch.setitem(app.config, 'SQL_DEBUG_PANEL', True)
+    monkeypatch.setitem(app.config, 'SQL_DEBUG_PANEL_LIMIT', 3)
+
+    connection = InstrumentedConnection(raw_connection, stats)
+    with app.app_context():
+        with connection.cursor() as cursor:
+            for i in range(10):
+                cursor.execute('SELECT * FROM roles WHERE id = %s', (i,))
+        context = stats._context_processor()
+
+    assert len(context['query_log']) == 3
+    assert context['query_summary']['count'] == 10
+
+def test_query_log_is_not_kept_without_debug_panel(app, stats, raw_connection, monkeypatch):
+    monkeypatch.setitem(app.config, 'SQL_DEBUG_PANEL', False)
+
+    connection = InstrumentedConnection(raw_connection, stats)
+    with app.app_context():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT * FROM roles')
+        assert stats._context_processor()['query_log'] == []
+
+    assert stats.snapshot()['SELECT * FROM roles']['count'] == 1
+
+def test_metrics_endpoint_requires_admin(client, login_as, mock_regular_user, mock_visit_log_repo):
+    login_as(None)
+    assert client.get('/metrics').status_code == 302
+
+    login_as(mock_regular_user)
+    assert client.get('/metrics').status_code == 302
+
+def test_metrics_endpoint_exposes_totals(client, stats, raw_connection, login_as, mock_admin_user,
+                                         mock_visit_log_repo):
+    login_as(mock_admin_user)
+    connection = InstrumentedConnection(raw_connection, stats)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT * FROM roles')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.data.decode('utf-8')
+    assert 'sql_queries_total{fingerprint="SELECT * FROM roles"} 1' in body
+    assert '# TYPE sql_query_duration_seconds_sum counter' in body
@@ -3,7 +3,8 @@ from unittest.mock import MagicMock
 
 from app.repositories.user_repository import UserRepository
 from app.repositories.visit_log_repository import VisitLogRepository
-from datetime import datetime
+from app.repositories.path_repository import PathCache, PathRepository
+from datetime import date, datetime
 
 def test_user_repository_get_by_id(mock_db_connector):
     repo = UserRepository(mock_db_connector)
@@ -15,7 +16,7 @@ def test_user_repository_get_by_id(mock_db_connector):
     assert user is not None
     assert user['username'] == 'testuser'
     mock_cursor.execute.assert_called_once_with(
-        'SELECT users.*, roles.name AS role_name FROM users LEFT JOIN roles ON users.role_id = roles.id WHERE users.id = %s;', (1,)
+        'SELECT users.*, roles.name AS role_name FROM users LEFT JOIN roles ON users.role_id = roles.id WHERE users.id = %s AND users.deleted_at IS NULL;', (1,)
     )
 
 def test_user_repository_get_by_username_and_password(mock_db_connector):
@@ -71,9 +72,13 @@ def test_user_repository_delete(mock_db_connector):
     mock_connection = mock_db_connector.connect.return_value
     mock_cursor = mock_connection.cursor.return_value.__enter__.return_value
 
+    mock_cursor.rowcount = 1
+
     repo.delete(1)
 
-    mock_cursor.execute.assert_called_once_with('DELETE FROM users WHERE id = %s', (1,))
+    assert mock_cursor.execute.call_args_list[0][0] == (
+        'UPDATE users SET deleted_at = NOW() WHERE id = %s AND deleted_at IS NULL', (1,))
+    assert 'INSERT INTO user_deletions' in mock_cursor.execute.call_args_list[1][0][0]
     mock_connection.commit.assert_called_once()
 
 def test_user_repository_check_password(mock_db_connector):
@@ -102,19 +107,40 @@ def test_user_repository_check_password_no_match(mock_db_connector):
     mock_cursor.execute.assert_called_once()
 
 def test_visit_log_repository_create(mock_db_connector):
-    repo = VisitLogRepository(mock_db_connector)
+    cache = PathCache()
+    cache.add('/some/path', 7)
+    cache.add('/some/<path>', 8)
+    repo = VisitLogRepository(mock_db_connector, path_cache=cache)
     mock_connection = mock_db_connector.connect.return_value
     mock_cursor = mock_connection.cursor.return_value.__enter__.return_value
 
-    repo.create('/some/path', user_id=1)
+    repo.create('/some/path', user_id=1, route='/some/<path>')
 
     mock_cursor.execute.assert_called_once()
     mock_connection.commit.assert_called_once()
     actual_query = mock_cursor.execute.call_args[0][0]
     actual_params = mock_cursor.execute.call_args[0][1]
 
-    assert 'INSERT INTO visit_logs (path, user_id) VALUES (%s, %s);' in actual_query
-    assert actual_params == ('/some/path', 1)
+    assert 'INSERT INTO visit_logs (path_id, route_id, user_id) VALUES (%s, %s, %s);' in actual_query
+    assert actual_params == (7, 8, 1)
+
+def test_path_repository_interns_paths_once(mock_db_connector):
+    repo = PathRepository(mock_db_connector, PathCache())
+    mock_connection = mock_db_connector.connect.return_value
+    mock_cursor = mock_connection.cursor.return_value.__enter__.return_value
+    mock_cursor.lastrowid = 42
+
+    assert repo.get_id('/users/') == 42
+    assert repo.get_id('/users/') == 42
+    assert repo.get_id(None) is None
+
+    mock_cursor.execute.assert_called_once()
+    assert 'ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)' in mock_cursor.execute.call_args[0][0]
+    mock_connection.commit.assert_called_once()
+
+    mock_cursor.fetchall.return_value = [(43, '/users/<int:user_id>')]
+    assert repo.get_paths([42, 43, None]) == {42: '/users/', 43: '/users/<int:user_id>'}
+    assert mock_cursor.execute.call_args[0][1] == (43,)
 
 def test_visit_log_repository_get_all_logs(mock_db_connector):
     repo = VisitLogRepository(mock_db_connector)
@@ -152,11 +178,14 @@ def test_visit_log_repository_get_log_count(mock_db_connector):
 
 
 def test_visit_log_repository_get_page_visit_stats(mock_db_connector):
-    repo = VisitLogRepository(mock_db_connector)
+    cache = PathCache()
+    cache.add('/page1', 1)
+    cache.add('/page2', 2)
+    repo = VisitLogRepository(mock_db_connector, path_cache=cache)
     mock_cursor = mock_db_connector.connect.return_value.cursor.return_value.__enter__.return_value
     mock_cursor.fetchall.return_value = [
-        {'path': '/page1', 'visit_count': 5},
-        {'path': '/page2', 'visit_count': 3}
+        {'path_id': 1, 'visit_count': 5},
+        {'path_id': 2, 'visit_count': 3}
     ]
 
     stats = repo.get_page_visit_stats()
@@ -168,9 +197,15 @@ def test_visit_log_repository_get_page_visit_stats(mock_db_connector):
 
     cleaned_query = ' '.join(actual_query.split()).strip()
 
-    expected_part = 'GROUP BY path ORDER BY visit_count DESC;'
+    expected_part = 'GROUP BY path_id ORDER BY visit_count DESC;'
     assert expected_part in cleaned_query
 
+    mock_cursor.reset_mock()
+    mock_cursor.fetchall.return_value = [{'path_id': None, 'visit_count': 2}]
+    stats = repo.get_page_visit_stats(group_by='route')
+    assert 'GROUP BY route_id' in mock_cursor.execute.call_args[0][0]
+    assert stats == [{'path': '(маршрут не найден)', 'visit_count': 2}]
+
 def test_visit_log_repository_get_user_visit_stats(mock_db_connector):
     repo = VisitLogRepository(mock_db_connector)
     mock_cursor = mock_db_connector.connect.return_value.cursor.return_value.__enter__.return_value
@@ -189,4 +224,78 @@ def test_visit_log_repository_get_user_visit_stats(mock_db_connector):
     cleaned_query = ' '.join(actual_query.split()).strip()
 
     expected_part = 'GROUP BY u.id, u.first_name, u.last_name, u.middle_name ORDER BY visit_count DESC;'
-    assert expected_part in cleaned_query
\ No newline at end of file
+    assert expected_part in cleaned_query
+    # Удаленные пользователи в отчет не попадают
+    assert 'WHERE u.deleted_at IS NULL' in cleaned_query
+
+def test_visit_log_repository_date_range_filters_created_at(mock_db_connector):
+    repo = VisitLogRepository(mock_db_connector)
+    mock_cursor = mock_db_connector.connect.return_value.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchone.return_value = (3,)
+
+    repo.get_log_count(user_id=1, date_from=date(2024, 1, 1), date_to=date(2024, 2, 1))
+
+    mock_cursor.execute.assert_called_once_with(
+        'SELECT COUNT(*) FROM visit_logs WHERE user_id = %s AND created_at >= %s AND created_at < %s',
+        (1, date(2024, 1, 1), date(2024, 2, 1))
+    )
+
+def test_visit_log_repository_create_partitions(mock_db_connector):
+    repo = VisitLogRepository(mock_db_connector)
+    mock_cursor = mock_db_connector.connect.return_value.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchall.return_value = [
+        {'name': 'p202411', 'description': "'2024-12-01 00:00:00'", 'table_rows': 10},
+        {'name': 'pmax', 'description': 'MAXVALUE', 'table_rows': 0},
+    ]
+
+    created = repo.create_partitions(months_ahead=1, today=date(2024, 12, 15))
+
+    assert created == ['p202412', 'p202501']
+    query = mock_cursor.execute.call_args[0][0]
+    assert query == ("ALTER TABLE visit_logs REORGANIZE PARTITION pmax INTO ("
+                     "PARTITION p202412 VALUES LESS THAN ('2025-01-01'), "
+                     "PARTITION p202501 VALUES LESS THAN ('2025-02-01'), "
+                     "PARTITION pmax VALUES LESS THAN (MAXVALUE))")
+
+    mock_cursor.reset_mock()
+    mock_cursor.fetchall.return_value = [
+        {'name': 'p202501', 'description': "'2025-02-01'", 'table_rows': 0},
+        {'name': 'pmax', 'description': 'MAXVALUE', 'table_rows': 0},
+    ]
+    assert repo.create_partitions(months_ahead=1, today=date(2024, 12, 15)) == []
+    mock_cursor.execute.assert_called_once()
+
+def test_visit_log_repository_expired_partitions(mock_db_connector):
+    repo = VisitLogRepository(mock_db_connector)
+    mock_cursor = mock_db_connector.connect.return_value.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchall.return_value = [
+        {'name': 'p202410', 'description': "'2024-11-01'", 'table_rows': 5},
+        {'name': 'p202411', 'description': "'2024-12-01'", 'table_rows': 5},
+        {'name': 'p202412', 'description': "'2025-01-01'", 'table_rows': 5},
+        {'name': 'pmax', 'description': 'MAXVALUE', 'table_rows': 0},
+    ]
+
+    assert repo.get_expired_partitions(keep_months=1, today=date(2025, 1, 10)) == ['p202410', 'p202411']
+
+    mock_cursor.reset_mock()
+    repo.drop_partitions(['p202410', 'p202411'])
+    mock_cursor.execute.assert_called_once_with('ALTER TABLE visit_logs DROP PARTITION p202410, p202411')
+
+def test_visit_log_repository_create_past_partitions(mock_db_connector):
+    repo = VisitLogRepository(mock_db_connector)
+    mock_cursor = mock_db_connector.connect.return_value.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchall.return_value = [
+        {'name': 'p202501', 'description': "'2025-02-01'", 'table_rows': 0},
+        {'name': 'pmax', 'description': 'MAXVALUE', 'table_rows': 0},
+    ]
+
+    assert repo.create_past_partitions(date(2024, 11, 20)) == ['p202411', 'p202412']
+    query = mock_cursor.execute.call_args[0][0]
+    assert query == ("ALTER TABLE visit_logs REORGANIZE PARTITION p202501 INTO ("
+                     "PARTITION p202411 VALUES LESS THAN ('2024-12-01'), "
+                     "PARTITION p202412 VALUES LESS THAN ('2025-01-01'), "
+                     "PARTITION p202501 VALUES LESS THAN ('2025-02-01'))")
+
+    mock_cursor.reset_mock()
+    assert repo.create_past_partitions(date(2025, 1, 5)) == []
+    mock_cursor.execute.assert_called_once()
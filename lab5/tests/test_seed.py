@@ -0,0 +1,89 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.seed import (PageCatalog, Seeder, daily_counts, format_tsv, format_values, user_rows,
+                      visit_batches, visit_times, STATIC_PAGES)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(7)
+
+@pytest.fixture
+def catalog(rng):
+    catalog = PageCatalog(rng, [1, 2, 3])
+    names = sorted(set(catalog.paths) | set(catalog.routes))
+    catalog.resolve({name: i for i, name in enumerate(names, 1)})
+    return catalog
+
+def test_user_rows(rng):
+    rows = user_rows(rng, 50, 4, date(2025, 1, 1))
+
+    assert [row[0] for row in rows] == [f'seed{i}' for i in range(4, 54)]
+    assert all(len(row[1]) == 64 for row in rows)
+    assert all(row[6].date() < date(2025, 1, 1) for row in rows)
+
+def test_daily_counts_weekends_are_quieter(rng):
+    # 2025-01-04 и 2025-01-05 -- выходные
+    counts = daily_counts(rng, 700000, date(2024, 12, 30), 7)
+
+    assert counts.sum() == 700000
+    assert counts[5] < counts[4] and counts[6] < counts[4]
+
+def test_visit_times_within_day(rng):
+    times = visit_times(rng, date(2025, 1, 1), 1000)
+    start = np.datetime64('2025-01-01', 's').astype(np.int64)
+
+    assert np.all(np.diff(times) >= 0)
+    assert times.min() >= start and times.max() < start + 86400
+
+def test_anonymous_visits_only_public_pages(rng, catalog):
+    path_ids, route_ids, user_ids = catalog.sample(rng, 5000)
+    public = {catalog.path_ids[i] for i, page in enumerate(STATIC_PAGES) if page[3]}
+
+    assert set(path_ids[user_ids < 0]) <= public
+    assert set(user_ids[user_ids >= 0]) <= {1, 2, 3}
+
+def test_visit_batches_sizes(rng, catalog):
+    batches = list(visit_batches(rng, catalog, 2500, date(2025, 1, 1), 10, 1000))
+
+    assert [len(batch[0]) for batch in batches] == [1000, 1000, 500]
+    times = np.concatenate([batch[3] for batch in batches])
+    assert np.all(np.diff(times) >= 0)
+
+def test_format_rows():
+    batch = [np.array([3, 4]), np.array([1, 2]), np.array([5, -1]),
+             np.array([0, 86399]) + np.datetime64('2025-01-01', 's').astype(np.int64)]
+
+    assert format_values(batch) == "(3,1,5,'2025-01-01T00:00:00'),(4,2,NULL,'2025-01-01T23:59:59')"
+    assert format_tsv(batch) == '3\t1\t5\t2025-01-01T00:00:00\n4\t2\t\\N\t2025-01-01T23:59:59\n'
+
+def test_seed_users_batches_inserts(mock_db_connector):
+    cursor = mock_db_connector.connect.return_value.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = (3,)
+
+    Seeder(mock_db_connector, seed=1, batch_size=10).seed_users(25, date(2025, 1, 1))
+
+    assert [len(c.args[1]) for c in cursor.executemany.call_args_list] == [10, 10, 5]
+    assert cursor.executemany.call_args_list[0].args[1][0][0] == 'seed4'
+
+def test_seed_visits_multirow_insert(mock_db_connector, monkeypatch):
+    cursor = mock_db_connector.connect.return_value.cursor.return_value.__enter__.return_value
+    seeder = Seeder(mock_db_connector, seed=1, batch_size=100)
+    monkeypatch.setattr(seeder, 'get_user_ids', lambda: [1, 2])
+    monkeypatch.setattr('app.seed.VisitLogRepository.create_partitions', lambda self: [])
+    monkeypatch.setattr('app.seed.VisitLogRepository.create_past_partitions', lambda self, since: [])
+
+    def resolve(catalog):
+        names = sorted(set(catalog.paths) | set(catalog.routes))
+        catalog.resolve({name: i for i, name in enumerate(names, 1)})
+    monkeypatch.setattr(seeder, 'intern_paths', resolve)
+
+    assert seeder.seed_visits(250, date(2025, 1, 1), 5) == 250
+
+    inserts = [c.args[0] for c in cursor.execute.call_args_list]
+    assert len(inserts) == 3
+    assert all(sql.startswith('INSERT INTO visit_logs (path_id, route_id, user_id, created_at) VALUES (')
+               for sql in inserts)
@@ -0,0 +1,47 @@
+from unittest.mock import MagicMock
+
+import pytest
+from flask import url_for
+
+from app.user_deletion import userDeletions
+
+
+@pytest.fixture
+def deletion_repo():
+    repo = MagicMock()
+    repo.claim.side_effect = [{'user_id': 5, 'total_rows': None}, None]
+    repo.count_rows.return_value = 12
+    return repo
+
+def test_process_detaches_in_batches_then_deletes(app, deletion_repo, monkeypatch):
+    monkeypatch.setitem(app.config, 'USER_DELETION_BATCH_SIZE', 5)
+    monkeypatch.setitem(app.config, 'USER_DELETION_PAUSE', 0)
+    monkeypatch.setattr('app.user_deletion.UserDeletionRepository', lambda db: deletion_repo)
+    deletion_repo.detach_batch.side_effect = [5, 5, 2]
+
+    assert userDeletions.run_pending() == [5]
+
+    assert deletion_repo.detach_batch.call_count == 3
+    deletion_repo.detach_batch.assert_called_with(5, 5)
+    deletion_repo.finish.assert_called_once_with(5)
+
+def test_background_disabled_in_tests(app):
+    assert app.config['USER_DELETION_BACKGROUND'] is False
+    userDeletions.start()
+    assert userDeletions._thread is None
+
+def test_users_index_shows_deletion_progress(client, login_as, mock_admin_user, mock_user_repo, monkeypatch):
+    login_as(mock_admin_user)
+    mock_user_repo.all.return_value = []
+    repo = MagicMock()
+    repo.get_recent.return_value = [
+        {'user_id': 5, 'username': 'gone', 'status': 'running', 'total_rows': 200, 'detached_rows': 50,
+         'requested_at': '2025-01-01 10:00:00', 'finished_at': None},
+    ]
+    monkeypatch.setattr('app.users.user_deletion_repository', repo)
+
+    response = client.get(url_for('users.index'))
+    body = response.data.decode('utf-8')
+    assert 'Удаление пользователей' in body
+    assert 'gone' in body
+    assert '25%' in body
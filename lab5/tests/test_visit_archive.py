@@ -0,0 +1,76 @@
+import pytest
+from datetime import date, datetime
+from unittest.mock import MagicMock
+
+np = pytest.importorskip('numpy')
+
+from app import visit_analytics
+from app.visit_archive import archive_file_name, archived_months, export_month, write_window
+
+
+def rows_for(month_start, visits):
+    return [(i + 1, path, user_id, month_start.replace(hour=hour))
+            for i, (path, user_id, hour) in enumerate(visits)]
+
+@pytest.fixture
+def archive_dir(tmp_path):
+    names = {1: 'Иванов Иван', 2: 'Петров Петр'}
+    lookup = lambda ids: {user_id: names[user_id] for user_id in ids if user_id in names}
+
+    write_window(str(tmp_path / archive_file_name(date(2024, 1, 1))), rows_for(datetime(2024, 1, 10), [
+        ('/users/', 1, 9), ('/users/', None, 9), ('/visit_logs/', 2, 10), ('/users/', 1, 23),
+    ]), lookup, datetime(2024, 1, 1), datetime(2024, 2, 1))
+    write_window(str(tmp_path / archive_file_name(date(2024, 2, 1))), rows_for(datetime(2024, 2, 5), [
+        ('/visit_logs/', 2, 10), ('/', None, 0), ('/visit_logs/', 3, 10),
+    ]), lookup, datetime(2024, 2, 1), datetime(2024, 3, 1))
+    return str(tmp_path)
+
+def test_window_file_interns_paths_and_users(archive_dir):
+    assert archived_months(archive_dir) == [date(2024, 1, 1), date(2024, 2, 1)]
+
+    with np.load(f'{archive_dir}/visit_logs_202401.npz') as data:
+        assert list(data['paths']) == ['/users/', '/visit_logs/']
+        assert list(data['path_idx']) == [0, 0, 1, 0]
+        assert list(data['user_ids']) == [1, 2]
+        assert list(data['user_idx']) == [0, -1, 1, 0]
+        assert data['created_at'][0] == np.datetime64('2024-01-10T09:00:00', 's').astype(np.int64)
+
+def test_reports_merge_files(archive_dir):
+    frame = visit_analytics.load(archive_dir)
+    assert len(frame) == 7
+
+    assert visit_analytics.page_report(frame) == [
+        {'path': '/users/', 'visit_count': 3},
+        {'path': '/visit_logs/', 'visit_count': 3},
+        {'path': '/', 'visit_count': 1},
+    ]
+    assert visit_analytics.page_report(frame, top=1) == [{'path': '/users/', 'visit_count': 3}]
+
+    users = visit_analytics.user_report(frame)
+    assert [(row['user'], row['visit_count']) for row in users] == [
+        (visit_analytics.ANONYMOUS, 2), ('Иванов Иван', 2), ('Петров Петр', 2), ('#3', 1),
+    ]
+
+    hourly = visit_analytics.hourly_traffic(frame)
+    assert hourly[10] == 3 and hourly[9] == 2 and hourly.sum() == 7
+
+def test_load_filters_date_range(archive_dir):
+    frame = visit_analytics.load(archive_dir, date(2024, 2, 1), date(2024, 3, 1))
+    assert len(frame) == 3
+    assert visit_analytics.page_report(frame)[0] == {'path': '/visit_logs/', 'visit_count': 2}
+
+    assert len(visit_analytics.load(archive_dir, date(2025, 1, 1))) == 0
+
+def test_export_month_skips_existing_file(tmp_path):
+    visit_log_repository = MagicMock()
+    visit_log_repository.iter_logs_between.return_value = iter(rows_for(datetime(2024, 3, 1), [('/', 1, 12)]))
+    user_repository = MagicMock()
+    user_repository.get_names_by_ids.return_value = [
+        {'id': 1, 'first_name': 'Иван', 'last_name': 'Иванов', 'middle_name': None}]
+
+    assert export_month(visit_log_repository, user_repository, str(tmp_path), date(2024, 3, 1)) == 1
+    visit_log_repository.iter_logs_between.assert_called_once_with(date(2024, 3, 1), date(2024, 4, 1), table=None)
+    assert export_month(visit_log_repository, user_repository, str(tmp_path), date(2024, 3, 1)) is None
+
+    frame = visit_analytics.load(str(tmp_path))
+    assert visit_analytics.user_report(frame) == [{'user_id': 1, 'user': 'Иванов Иван', 'visit_count': 1}]
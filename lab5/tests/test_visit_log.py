@@ -3,14 +3,20 @@ from flask import url_for, current_app
 from unittest.mock import ANY, call
 import csv
 from io import StringIO
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from conftest import admin_user_data, regular_user_data
+from app.repositories.visit_log_repository import VisitLogRepository
+
+def default_period():
+    # Последние 30 дней включая сегодня; date_to в репозитории не включается
+    today = date.today()
+    return {'date_from': today - timedelta(days=29), 'date_to': today + timedelta(days=1)}
 
 def test_log_request_info_authenticated_user(client, login_as, mock_admin_user, mock_visit_log_repo):
     login_as(mock_admin_user)
     test_path = url_for('users.index')
     client.get(test_path)
-    mock_visit_log_repo.create.assert_called_with(test_path, mock_admin_user.id)
+    mock_visit_log_repo.create.assert_called_with(test_path, mock_admin_user.id, route='/users/')
 
 def test_log_request_info_unauthenticated_user(client, mock_visit_log_repo, app, login_as):
 
@@ -19,7 +25,7 @@ def test_log_request_info_unauthenticated_user(client, mock_visit_log_repo, app,
     test_path = url_for('auth.login')
     client.get(test_path)
 
-    mock_visit_log_repo.create.assert_called_with(test_path, None)
+    mock_visit_log_repo.create.assert_called_with(test_path, None, route='/auth/login')
 
 def test_log_request_info_skips_static_and_favicon(client, mock_visit_log_repo):
 
@@ -46,8 +52,8 @@ def test_visit_logs_index_admin_sees_all(client, login_as, mock_admin_user, mock
     assert "D A M" in response.data.decode('utf-8')
     assert "U R" in response.data.decode('utf-8')
     assert "/p1" in response.data.decode('utf-8')
-    mock_visit_log_repo.get_log_count.assert_called_once_with(user_id=None)
-    mock_visit_log_repo.get_all_logs.assert_called_once_with(limit=10, offset=0, user_id=None)
+    mock_visit_log_repo.get_log_count.assert_called_once_with(user_id=None, **default_period())
+    mock_visit_log_repo.get_all_logs.assert_called_once_with(limit=10, offset=0, user_id=None, **default_period())
 
 def test_visit_logs_index_user_sees_own(client, login_as, mock_regular_user, mock_visit_log_repo):
     login_as(mock_regular_user)
@@ -69,8 +75,9 @@ def test_visit_logs_index_user_sees_own(client, login_as, mock_regular_user, moc
     assert "Отчет по страницам" in response.data.decode('utf-8')
     assert "Отчет по пользователям" in response.data.decode('utf-8')
 
-    mock_visit_log_repo.get_log_count.assert_called_once_with(user_id=mock_regular_user.id)
-    mock_visit_log_repo.get_all_logs.assert_called_once_with(limit=10, offset=0, user_id=mock_regular_user.id)
+    mock_visit_log_repo.get_log_count.assert_called_once_with(user_id=mock_regular_user.id, **default_period())
+    mock_visit_log_repo.get_all_logs.assert_called_once_with(limit=10, offset=0, user_id=mock_regular_user.id,
+                                                             **default_period())
 
 def test_visit_logs_index_pagination(client, login_as, mock_admin_user, mock_visit_log_repo):
     login_as(mock_admin_user)
@@ -78,7 +85,7 @@ def test_visit_logs_index_pagination(client, login_as, mock_admin_user, mock_vis
     mock_visit_log_repo.get_all_logs.return_value = []
 
     client.get(url_for('visit_logs.index', page=2))
-    mock_visit_log_repo.get_all_logs.assert_called_once_with(limit=10, offset=10, user_id=None)
+    mock_visit_log_repo.get_all_logs.assert_called_once_with(limit=10, offset=10, user_id=None, **default_period())
 
 def test_visit_logs_pages_report_get_admin(client, login_as, mock_admin_user, mock_visit_log_repo):
     login_as(mock_admin_user)
@@ -129,7 +136,7 @@ def test_visit_logs_users_report_get_admin(client, login_as, mock_admin_user, mo
     assert "User Admin" in response.data.decode('utf-8')
     assert "Неаутентифицированный пользователь" in response.data.decode('utf-8')
     assert "200" in response.data.decode('utf-8')
-    mock_visit_log_repo.get_user_visit_stats.assert_called_once()
+    mock_visit_log_repo.get_user_visit_stats.assert_called_once_with(**default_period())
 
 def test_visit_logs_users_report_export_csv_admin(client, login_as, mock_admin_user, mock_visit_log_repo):
     login_as(mock_admin_user)
@@ -150,4 +157,83 @@ def test_visit_logs_users_report_export_csv_admin(client, login_as, mock_admin_u
     assert rows[0] == ['№', 'Пользователь', 'Количество посещений']
     mock_visit_log_repo.get_user_visit_stats.assert_called_once()
 
-    # Пагинация, хостинг
\ No newline at end of file
+    # Пагинация, хостинг
+
+def test_visit_logs_index_period_from_query_string(client, login_as, mock_admin_user, mock_visit_log_repo):
+    login_as(mock_admin_user)
+    mock_visit_log_repo.get_log_count.return_value = 15
+    mock_visit_log_repo.get_all_logs.return_value = []
+
+    response = client.get(url_for('visit_logs.index', date_from='2024-01-01', date_to='2024-01-31'))
+    body = response.data.decode('utf-8')
+
+    period = {'date_from': date(2024, 1, 1), 'date_to': date(2024, 2, 1)}
+    mock_visit_log_repo.get_log_count.assert_called_once_with(user_id=None, **period)
+    mock_visit_log_repo.get_all_logs.assert_called_once_with(limit=10, offset=0, user_id=None, **period)
+    # Период сохраняется при переходе по страницам
+    assert 'date_from=2024-01-01&amp;date_to=2024-01-31' in body
+    assert 'value="2024-01-31"' in body
+
+def test_visit_logs_index_invalid_period_falls_back(client, login_as, mock_admin_user, mock_visit_log_repo):
+    login_as(mock_admin_user)
+    mock_visit_log_repo.get_log_count.return_value = 0
+    mock_visit_log_repo.get_all_logs.return_value = []
+
+    client.get(url_for('visit_logs.index', date_from='вчера', date_to=''))
+    mock_visit_log_repo.get_log_count.assert_called_once_with(user_id=None, **default_period())
+
+def test_visit_logs_index_swapped_period(client, login_as, mock_admin_user, mock_visit_log_repo):
+    login_as(mock_admin_user)
+    mock_visit_log_repo.get_log_count.return_value = 0
+    mock_visit_log_repo.get_all_logs.return_value = []
+
+    client.get(url_for('visit_logs.index', date_from='2024-02-10', date_to='2024-02-01'))
+    mock_visit_log_repo.get_log_count.assert_called_once_with(
+        user_id=None, date_from=date(2024, 2, 1), date_to=date(2024, 2, 11))
+
+def test_visit_logs_pages_report_period_reaches_sql(client, login_as, mock_admin_user, mock_db_connector, monkeypatch):
+    login_as(mock_admin_user)
+    monkeypatch.setattr('app.visit_logger.visit_log_repository', VisitLogRepository(mock_db_connector))
+    mock_cursor = mock_db_connector.connect.return_value.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchall.return_value = []
+
+    response = client.get(url_for('visit_logs.pages_report', group_by='route',
+                                  date_from='2024-03-01', date_to='2024-03-31'))
+    assert response.status_code == 200
+
+    query, params = mock_cursor.execute.call_args.args
+    assert 'WHERE created_at >= %s AND created_at < %s' in query
+    assert 'GROUP BY route_id' in query
+    assert params == (date(2024, 3, 1), date(2024, 4, 1))
+
+def test_visit_logs_pages_report_export_csv_period(client, login_as, mock_admin_user, mock_visit_log_repo):
+    login_as(mock_admin_user)
+    mock_visit_log_repo.get_page_visit_stats.return_value = []
+
+    client.get(url_for('visit_logs.pages_report_export_csv', date_from='2024-03-01', date_to='2024-03-31'))
+    mock_visit_log_repo.get_page_visit_stats.assert_called_once_with(
+        group_by='path', date_from=date(2024, 3, 1), date_to=date(2024, 4, 1))
+
+def test_visit_logs_users_report_period_reaches_sql(client, login_as, mock_admin_user, mock_db_connector, monkeypatch):
+    login_as(mock_admin_user)
+    monkeypatch.setattr('app.visit_logger.visit_log_repository', VisitLogRepository(mock_db_connector))
+    mock_cursor = mock_db_connector.connect.return_value.cursor.return_value.__enter__.return_value
+    mock_cursor.fetchall.return_value = []
+
+    response = client.get(url_for('visit_logs.users_report', date_from='2024-03-01', date_to='2024-03-31'))
+    assert response.status_code == 200
+    body = response.data.decode('utf-8')
+    assert 'date_from=2024-03-01&amp;date_to=2024-03-31' in body
+
+    query, params = mock_cursor.execute.call_args.args
+    # Период ограничивает соединение, а не список пользователей
+    assert 'ON vl.user_id = u.id AND vl.created_at >= %s AND vl.created_at < %s' in query
+    assert params == (date(2024, 3, 1), date(2024, 4, 1))
+
+def test_visit_logs_users_report_export_csv_period(client, login_as, mock_admin_user, mock_visit_log_repo):
+    login_as(mock_admin_user)
+    mock_visit_log_repo.get_user_visit_stats.return_value = []
+
+    client.get(url_for('visit_logs.users_report_export_csv', date_from='2024-03-01', date_to='2024-03-31'))
+    mock_visit_log_repo.get_user_visit_stats.assert_called_once_with(
+        date_from=date(2024, 3, 1), date_to=date(2024, 4, 1))
@@ -0,0 +1,86 @@
+import pytest
+from flask import Flask, url_for
+
+from app.visit_sketches import HyperLogLog, SpaceSaving, VisitSketches, hash64
+
+
+@pytest.fixture
+def make_sketches(tmp_path):
+    def _make(directory=None):
+        flask_app = Flask(__name__)
+        flask_app.config.update(VISIT_SKETCHES_BUCKET_SECONDS=10, VISIT_SKETCHES_RETENTION_SECONDS=600,
+                                VISIT_SKETCHES_CAPACITY=5, VISIT_SKETCHES_DIR=directory)
+        return VisitSketches(flask_app)
+    return _make
+
+def test_hyperloglog_estimates_and_merges():
+    first, second = HyperLogLog(12), HyperLogLog(12)
+    for i in range(20000):
+        (first if i % 2 else second).add_hash(hash64(f'user:{i}'))
+    first.add_hash(hash64('user:1'))
+
+    assert abs(first.count() - 10000) < 500
+    first.merge(second)
+    assert abs(first.count() - 20000) < 1000
+
+def test_space_saving_keeps_heavy_hitters():
+    summary = SpaceSaving(capacity=3)
+    for path in ['/a'] * 50 + ['/b'] * 30 + [f'/rare/{i}' for i in range(20)] + ['/a'] * 5:
+        summary.add(path)
+
+    assert [key for key, _, _ in summary.top(2)] == ['/a', '/b']
+    key, count, error = summary.top(1)[0]
+    assert count - error <= 55 <= count
+
+    other = SpaceSaving(capacity=3)
+    for path in ['/b'] * 40:
+        other.add(path)
+    merged = SpaceSaving.merge([summary, other], capacity=3)
+    assert merged.top(1)[0][0] == '/b'
+
+def test_snapshot_uses_sliding_window(make_sketches):
+    sketches = make_sketches()
+    for i in range(30):
+        sketches.record('/old', f'user:{i}', now=1000)
+    for i in range(20):
+        sketches.record('/users/', f'user:{i % 4}', now=1500)
+    sketches.record('/auth/login', 'ip:127.0.0.1', now=1505)
+
+    recent = sketches.snapshot(window_seconds=60, now=1510)
+    assert recent['total'] == 21
+    assert recent['top_pages'][0] == {'path': '/users/', 'visit_count': 20, 'max_error': 0, 'unique_visitors': 4}
+    assert recent['unique_visitors'] == 5
+
+    assert sketches.snapshot(window_seconds=600, now=1510)['total'] == 51
+
+def test_snapshot_merges_workers(make_sketches, tmp_path, monkeypatch):
+    first = make_sketches(str(tmp_path))
+    second = make_sketches(str(tmp_path))
+    monkeypatch.setattr(second, '_state_file', lambda pid=None: str(tmp_path / 'visit_sketches_other.json'))
+
+    now = pytest.importorskip('time').time()
+    for i in range(3):
+        first.record('/users/', f'user:{i}', now=now)
+        second.record('/users/', f'user:{i + 10}', now=now)
+    second.flush()
+
+    snapshot = first.snapshot(window_seconds=60, now=now)
+    assert snapshot['total'] == 6
+    assert snapshot['top_pages'][0]['visit_count'] == 6
+    assert snapshot['top_pages'][0]['unique_visitors'] == 6
+
+def test_live_dashboard_admin(client, login_as, mock_admin_user, mock_visit_log_repo):
+    login_as(mock_admin_user)
+    client.get('/users/')
+
+    response = client.get(url_for('visit_logs.live_json', window=60))
+    assert response.status_code == 200
+    assert response.json['window_seconds'] == 60
+    assert any(page['path'] == '/users/' for page in response.json['top_pages'])
+
+    response = client.get(url_for('visit_logs.live'))
+    assert 'Посещения в реальном времени' in response.data.decode('utf-8')
+
+def test_live_dashboard_user_denied(client, login_as, mock_regular_user):
+    login_as(mock_regular_user)
+    assert client.get(url_for('visit_logs.live')).status_code == 302
@@ -3,6 +3,9 @@ from flask_migrate import Migrate
 from sqlalchemy.exc import SQLAlchemyError
 
 from .models import db
+from .metrics import query_metrics
+from .replicas import replica_binds, replica_router
+from .category_cache import category_cache
 from .auth import bp as auth_bp, init_login_manager
 from .courses import bp as courses_bp
 from .routes import bp as main_bp
@@ -12,6 +15,24 @@ def handle_sqlalchemy_error(err):
                  'Повторите попытку позже.')
     return f'{error_msg} (Подробнее: {err})', 500
 
+def engine_options(config):
+    options = {
+        'pool_pre_ping': config.get('SQLALCHEMY_POOL_PRE_PING', True),
+        'pool_recycle': config.get('SQLALCHEMY_POOL_RECYCLE', 3600),
+    }
+    # SQLite работает через StaticPool/SingletonThreadPool, размер пула к ним не применим
+    if not config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        options['pool_size'] = config.get('SQLALCHEMY_POOL_SIZE', 10)
+        options['max_overflow'] = config.get('SQLALCHEMY_MAX_OVERFLOW', 20)
+        options['pool_timeout'] = config.get('SQLALCHEMY_POOL_TIMEOUT', 30)
+    return options
+
+def dispose_engines(app):
+    # Воркер gunicorn после fork не должен пользоваться соединениями из пула мастера
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
 def create_app(test_config=None):
     app = Flask(__name__, instance_relative_config=False)
     app.config.from_pyfile('config.py')
@@ -19,8 +40,19 @@ def create_app(test_config=None):
     if test_config:
         app.config.from_mapping(test_config)
 
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    app.config.setdefault('REVIEWS_KEYSET_THRESHOLD', 1000)
+    app.config['SQLALCHEMY_BINDS'] = replica_binds(app.config)
+
     db.init_app(app)
+    replica_router.init_app(app, db)
     migrate = Migrate(app, db)
+    query_metrics.init_app(app, db)
+    category_cache.init_app(app, db)
+
+    from .cli import invalidate_categories_command, seed_command
+    app.cli.add_command(invalidate_categories_command)
+    app.cli.add_command(seed_command)
 
     init_login_manager(app)
 
@@ -0,0 +1,215 @@
+# ASGI-режим lab6: каталог курсов, отзывы и картинки читаются через асинхронный
+# движок SQLAlchemy, остальные маршруты обслуживает обычное Flask-приложение
+# в пуле потоков. Запуск из каталога lab6:
+#   uvicorn app.asgi:application --workers 4
+import asyncio
+import io
+import sys
+import weakref
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+
+from . import engine_options
+from .category_cache import category_cache
+from .metrics import query_metrics
+from .models import db
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'mysql': 'mysql+aiomysql',
+}
+
+# Маршруты, которые выполняются через асинхронный движок. Это обычные
+# представления courses.py и routes.py: на время запроса db.session
+# указывает на сессию асинхронного движка
+ASYNC_ENDPOINTS = {'courses.index', 'courses.show', 'courses.all_reviews', 'main.image'}
+# Им нужно дерево категорий, оно загружается до входа в гринлет
+CATEGORY_ENDPOINTS = {'courses.index'}
+
+def async_database_uri(uri):
+    url = sa.engine.make_url(uri)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]).render_as_string(hide_password=False)
+
+
+def build_environ(scope, body):
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    server = scope.get('server') or ('localhost', 80)
+    environ['SERVER_NAME'], environ['SERVER_PORT'] = server[0], str(server[1])
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else 'HTTP_' + name
+        environ[key] = environ[key] + ',' + value if key in environ else value
+
+    # Тело уже прочитано целиком, в том числе если клиент слал его по частям
+    environ.pop('HTTP_TRANSFER_ENCODING', None)
+    environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+
+class AsyncCatalog:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        config = flask_app.config
+        uri = config.get('SQLALCHEMY_ASYNC_DATABASE_URI') or async_database_uri(config['SQLALCHEMY_DATABASE_URI'])
+        options = engine_options({**config, 'SQLALCHEMY_DATABASE_URI': uri})
+        self.engine = create_async_engine(uri, **options)
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+        query_metrics.instrument_engine(self.engine.sync_engine)
+        self._category_locks = weakref.WeakKeyDictionary()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        environ = build_environ(scope, bytes(body))
+
+        endpoint = self._match(environ)
+        if endpoint not in ASYNC_ENDPOINTS:
+            await self._call_wsgi(environ, send)
+            return
+
+        categories = await self._get_category_tree() if endpoint in CATEGORY_ENDPOINTS else None
+        async with self.sessionmaker() as db_session:
+            response = await db_session.run_sync(self._dispatch, environ, categories)
+        await self._send_response(scope, response, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _match(self, environ):
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except (HTTPException, RequestRedirect):
+            return None
+        return endpoint
+
+    async def _get_category_tree(self):
+        # Перезагрузка кэша держит threading.Lock на время запроса к БД. Внутри
+        # гринлета это остановило бы весь цикл событий, пока первый запрос ждет
+        # ответа БД, поэтому дерево загружается здесь, под asyncio.Lock: один
+        # запрос перечитывает, остальные ждут его результата
+        with self.flask_app.app_context():
+            tree = category_cache.get_fresh_tree()
+        if tree is not None:
+            return tree
+
+        loop = asyncio.get_running_loop()
+        lock = self._category_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            with self.flask_app.app_context():
+                tree = category_cache.get_fresh_tree()
+            if tree is None:
+                async with self.sessionmaker() as db_session:
+                    tree = await db_session.run_sync(self._load_category_tree)
+        return tree
+
+    def _load_category_tree(self, sync_session):
+        with self.flask_app.app_context():
+            db.session.registry.set(sync_session)
+            return category_cache.load()
+
+    # Выполняется в гринлете AsyncSession.run_sync: запросы представления и
+    # ленивые загрузки при рендеринге шаблона идут через асинхронный драйвер
+    # и не блокируют цикл событий
+    def _dispatch(self, sync_session, environ, categories):
+        app = self.flask_app
+        with app.request_context(environ):
+            db.session.registry.set(sync_session)
+            if categories is not None:
+                category_cache.pin(categories)
+            try:
+                response = app.full_dispatch_request()
+            except Exception as e:
+                response = app.handle_exception(e)
+            return response
+
+    async def _send_response(self, scope, response, send):
+        headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                   for name, value in response.headers.items()]
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        try:
+            if scope['method'] != 'HEAD' and response.direct_passthrough:
+                # Файл читается блоками в пуле потоков
+                loop = asyncio.get_running_loop()
+                iterator = iter(response.response)
+                while (chunk := await loop.run_in_executor(None, next, iterator, None)) is not None:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            elif scope['method'] != 'HEAD':
+                await send({'type': 'http.response.body', 'body': response.get_data(), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            response.close()
+
+    async def _call_wsgi(self, environ, send):
+        # Ответ WSGI-приложения передается клиенту по мере выдачи блоков,
+        # итератор читается в пуле потоков
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'], started['headers'] = status, headers
+
+        iterable = await loop.run_in_executor(None, self.flask_app, environ, start_response)
+        try:
+            iterator = iter(iterable)
+            # По PEP 3333 start_response можно вызвать и при выдаче первого блока
+            chunk = await loop.run_in_executor(None, next, iterator, None)
+            await send({
+                'type': 'http.response.start',
+                'status': int(started['status'].split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                            for name, value in started['headers']],
+            })
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(None, next, iterator, None)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(iterable, 'close'):
+                await loop.run_in_executor(None, iterable.close)
+
+
+def create_asgi_app(flask_app):
+    return AsyncCatalog(flask_app)
+
+
+from . import app as flask_app
+
+application = create_asgi_app(flask_app)
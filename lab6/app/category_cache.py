@@ -0,0 +1,99 @@
+import os
+import time
+from threading import Lock
+
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+
+from .models import Category
+from .repositories import CategoryRepository
+
+
+# Дерево категорий кэшируется на процесс. Кэш сбрасывается по TTL, при записи
+# категорий через сессию и командой `flask invalidate-categories`; остальные
+# воркеры gunicorn узнают о сбросе по времени изменения общего файла-версии.
+class CategoryCache:
+    def __init__(self):
+        self._lock = Lock()
+
+    def init_app(self, app, db):
+        app.config.setdefault('CATEGORY_CACHE_TTL', 300)
+        app.config.setdefault('CATEGORY_CACHE_VERSION_FILE',
+                              os.path.join(app.instance_path, 'category_cache.version'))
+        app.extensions['category_cache'] = {
+            'repository': CategoryRepository(db),
+            'tree': None,
+            'loaded_at': 0.0,
+            'version': None,
+        }
+
+        if not event.contains(db.session, 'before_flush', self._before_flush):
+            event.listen(db.session, 'before_flush', self._before_flush)
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_soft_rollback', self._after_soft_rollback)
+
+    def get_tree(self, repository=None):
+        if has_request_context() and 'category_tree' in g:
+            return g.category_tree
+        tree = self.get_fresh_tree()
+        if tree is None:
+            with self._lock:
+                # Пока ждали блокировку, дерево мог перечитать другой поток
+                tree = self.get_fresh_tree()
+                if tree is None:
+                    tree = self.load(repository)
+        return tree
+
+    def get_fresh_tree(self):
+        """Дерево из кэша или None, если его пора перечитать."""
+        state = current_app.extensions['category_cache']
+        if (state['tree'] is None or self._read_version() != state['version']
+                or time.monotonic() - state['loaded_at'] > current_app.config['CATEGORY_CACHE_TTL']):
+            return None
+        return state['tree']
+
+    def load(self, repository=None):
+        """Перечитывает дерево без блокировки; вызывающий сам не дает загружать его параллельно."""
+        state = current_app.extensions['category_cache']
+        version = self._read_version()
+        tree = (repository or state['repository']).get_category_tree()
+        state.update(tree=tree, loaded_at=time.monotonic(), version=version)
+        return tree
+
+    def pin(self, tree):
+        # Запрос видит это дерево без проверок (ASGI: загружено до входа в гринлет)
+        g.category_tree = tree
+
+    def get_all_categories(self, repository=None):
+        return list(self.get_tree(repository))
+
+    def invalidate(self):
+        state = current_app.extensions['category_cache']
+        state['tree'] = None
+
+        path = current_app.config['CATEGORY_CACHE_VERSION_FILE']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a'):
+            pass
+        os.utime(path, ns=(time.time_ns(), time.time_ns()))
+
+    def _read_version(self):
+        try:
+            return os.stat(current_app.config['CATEGORY_CACHE_VERSION_FILE']).st_mtime_ns
+        except OSError:
+            return None
+
+    def _before_flush(self, session, flush_context, instances):
+        changed = session.new | session.dirty | session.deleted
+        if any(isinstance(obj, Category) for obj in changed):
+            session.info['categories_changed'] = True
+
+    def _after_commit(self, session):
+        if session.info.pop('categories_changed', False):
+            self.invalidate()
+
+    def _after_soft_rollback(self, session, previous_transaction):
+        session.info.pop('categories_changed', None)
+
+
+category_cache = CategoryCache()
@@ -0,0 +1,51 @@
+import time
+
+import click
+
+from flask.cli import with_appcontext
+from .category_cache import category_cache
+
+@click.command('invalidate-categories')
+@with_appcontext
+def invalidate_categories_command():
+    category_cache.invalidate()
+    click.echo('Category cache invalidated.')
+
+# Данные для профилирования каталога и страниц отзывов на реалистичном объеме
+@click.command('seed')
+@click.option('--users', 'user_count', type=int, default=2000, show_default=True)
+@click.option('--courses', 'course_count', type=int, default=20000, show_default=True)
+@click.option('--reviews', 'review_count', type=int, default=1000000, show_default=True,
+              help='Total reviews, at most one per user and course.')
+@click.option('--images', 'image_count', type=int, default=50, show_default=True,
+              help='Placeholder background images written to UPLOAD_FOLDER.')
+@click.option('--batch-size', type=int, default=2000, show_default=True, help='Rows per INSERT statement.')
+@click.option('--seed', 'random_seed', type=int, default=None, help='Random seed for reproducible data.')
+@with_appcontext
+def seed_command(user_count, course_count, review_count, image_count, batch_size, random_seed):
+    from .models import db
+    from .seed import Seeder
+
+    seeder = Seeder(db, seed=random_seed, batch_size=batch_size)
+    started = time.monotonic()
+    category_ids = seeder.seed_categories()
+    # Категории могли быть добавлены в обход сессии
+    category_cache.invalidate()
+    user_ids = seeder.seed_users(user_count)
+    click.echo(f'Added {len(user_ids)} users in {time.monotonic() - started:.1f}s.')
+    image_ids = seeder.seed_images(max(image_count, 1))
+    click.echo(f'Added {len(image_ids)} images.')
+    # Авторы и рецензенты -- все пользователи, включая уже существующих
+    user_ids = seeder.get_user_ids()
+    if course_count and not user_ids:
+        raise click.UsageError('Courses need at least one user, pass --users.')
+
+    started = time.monotonic()
+    step = max(course_count // 10, batch_size)
+
+    def progress(courses, reviews):
+        if courses % step < batch_size or courses == course_count:
+            click.echo(f'  {courses}/{course_count} courses, {reviews} reviews, {time.monotonic() - started:.1f}s')
+
+    written = seeder.seed_courses(course_count, review_count, user_ids, category_ids, image_ids, progress)
+    click.echo(f'Added {course_count} courses and {written} reviews in {time.monotonic() - started:.1f}s.')
@@ -1,13 +1,13 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, abort
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, current_app, jsonify
 from flask_login import login_required, current_user
 from sqlalchemy.exc import IntegrityError
 
 from .models import db
-from .repositories import CourseRepository, UserRepository, CategoryRepository, ImageRepository, ReviewRepository
+from .category_cache import category_cache
+from .repositories import CourseRepository, UserRepository, ImageRepository, ReviewRepository, CursorMismatch
 
 user_repository = UserRepository(db)
 course_repository = CourseRepository(db)
-category_repository = CategoryRepository(db)
 image_repository = ImageRepository(db)
 review_repository = ReviewRepository(db)
 
@@ -26,11 +26,17 @@ def search_params():
         'category_ids': [x for x in request.args.getlist('category_ids') if x],
     }
 
+def course_search_params(categories):
+    # Выбор родительской категории включает курсы всех её подкатегорий
+    search = search_params()
+    search['category_ids'] = categories.expand(search['category_ids'])
+    return search
+
 @bp.route('/')
 def index():
-    pagination = course_repository.get_pagination_info(**search_params())
+    categories = category_cache.get_tree()
+    pagination = course_repository.get_pagination_info(**course_search_params(categories))
     courses = course_repository.get_all_courses(pagination=pagination)
-    categories = category_repository.get_all_categories()
     return render_template('courses/index.html',
                            courses=courses,
                            categories=categories,
@@ -41,7 +47,7 @@ def index():
 @login_required
 def new():
     course = course_repository.new_course()
-    categories = category_repository.get_all_categories()
+    categories = category_cache.get_all_categories()
     users = user_repository.get_all_users()
     return render_template('courses/new.html',
                            categories=categories,
@@ -63,7 +69,7 @@ def create():
         course = course_repository.add_course(**params(), background_image_id=image_id)
     except IntegrityError as err:
         flash(f'Возникла ошибка при записи данных в БД. Проверьте корректность введённых данных. ({err})', 'danger')
-        categories = category_repository.get_all_categories()
+        categories = category_cache.get_all_categories()
         users = user_repository.get_all_users()
         return render_template('courses/new.html',
                             categories=categories,
@@ -81,6 +87,7 @@ def show(course_id):
         abort(404)
 
     latest_reviews = review_repository.get_latest_reviews_for_course(course_id, limit=5)
+    review_stats = review_repository.get_review_stats(course_id)
 
     user_review = None
     if current_user.is_authenticated:
@@ -89,6 +96,7 @@ def show(course_id):
     return render_template('courses/show.html', 
                            course=course,
                            latest_reviews=latest_reviews,
+                           review_stats=review_stats,
                            user_review=user_review)
 
 @bp.route('/<int:course_id>/reviews')
@@ -99,30 +107,50 @@ def all_reviews(course_id):
 
     page = request.args.get('page', 1, type=int)
     sort_by = request.args.get('sort_by', 'newest')
+    cursor = request.args.get('cursor')
     
     per_page = 10
-    
-    pagination = review_repository.get_paginated_reviews_for_course(course_id, page, per_page, sort_by)
-    reviews = pagination.items
+
+    # Для популярных курсов OFFSET и COUNT слишком дороги — листаем по курсору
+    pagination = None
+    next_cursor = None
+    if cursor is not None or course.rating_num >= current_app.config['REVIEWS_KEYSET_THRESHOLD']:
+        try:
+            reviews, next_cursor = review_repository.get_reviews_page_after(course_id, per_page, sort_by, cursor)
+        except CursorMismatch:
+            abort(400)
+    else:
+        pagination = review_repository.get_paginated_reviews_for_course(course_id, page, per_page, sort_by)
+        reviews = pagination.items
 
     user_review = None
     if current_user.is_authenticated:
         user_review = review_repository.get_review_by_user_and_course(current_user.id, course_id)
 
+    review_stats = review_repository.get_review_stats(course_id)
+
     return render_template('courses/reviews.html',
                            course=course,
                            reviews=reviews,
+                           review_stats=review_stats,
                            pagination=pagination,
+                           next_cursor=next_cursor,
                            user_review=user_review,
                            sort_by=sort_by)
 
-@bp.route('/<int:course_id>/reviews/submit', methods=['POST'])
-@login_required
-def submit_review(course_id):
+@bp.route('/<int:course_id>/reviews/stats')
+def review_stats(course_id):
     course = course_repository.get_course_by_id(course_id)
     if course is None:
         abort(404)
 
+    stats = review_repository.get_review_stats(course_id).to_dict()
+    stats['rating'] = course.rating
+    return jsonify(stats)
+
+@bp.route('/<int:course_id>/reviews/submit', methods=['POST'])
+@login_required
+def submit_review(course_id):
     rating = request.form.get('rating', type=int)
     text = request.form.get('text')
 
@@ -133,18 +161,13 @@ def submit_review(course_id):
         flash('Текст отзыва не может быть пустым и должен содержать не менее 10 символов.', 'danger')
         return redirect(request.referrer or url_for('courses.show', course_id=course_id))
 
-    user_id = current_user.id
-    existing_review = review_repository.get_review_by_user_and_course(user_id, course_id)
-    print("EXISTING REVIEW: ", existing_review)
-    if existing_review:
-        old_rating = existing_review.rating
-        review_repository.update_review(existing_review.id, rating, text)
-        course_repository.update_course_rating(course_id, old_rating, rating)
-        flash('Ваш отзыв был успешно обновлен!', 'success')
-    else:
-        review_repository.add_review(course_id, user_id, rating, text)
-        # print('Rating : ', rating)
-        course_repository.update_course_rating(course_id, None, rating)
+    review, created = review_repository.upsert_review(course_id, current_user.id, rating, text)
+    if review is None:
+        abort(404)
+
+    if created:
         flash('Ваш отзыв был успешно добавлен!', 'success')
+    else:
+        flash('Ваш отзыв был успешно обновлен!', 'success')
     
     return redirect(request.referrer or url_for('courses.all_reviews', course_id=course_id))
\ No newline at end of file
@@ -0,0 +1,162 @@
+import logging
+import re
+import time
+from collections import Counter
+from threading import Lock
+
+from flask import Blueprint, Response, current_app, g, has_app_context, request
+from flask_login import login_required
+from sqlalchemy import event
+
+bp = Blueprint('metrics', __name__)
+
+logger = logging.getLogger(__name__)
+
+_SPACE_RE = re.compile(r'\s+')
+
+ENDPOINT_FIELDS = ('requests', 'queries', 'sql_seconds', 'pool_checkouts',
+                   'pool_wait_seconds', 'flush_seconds', 'n_plus_one')
+
+
+def fingerprint(statement):
+    return _SPACE_RE.sub(' ', statement).strip()
+
+
+class QueryMetrics:
+    def __init__(self):
+        self._lock = Lock()
+        self._endpoints = {}
+
+    def init_app(self, app, db):
+        app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', 5)
+        app.extensions['query_metrics'] = self
+
+        with app.app_context():
+            # Основная база и реплики (см. replicas.py)
+            for engine in db.engines.values():
+                self.instrument_engine(engine)
+
+        # Сессия одна на все приложения, поэтому слушатели вешаются один раз
+        if not event.contains(db.session, 'after_begin', self._after_begin):
+            event.listen(db.session, 'after_transaction_create', self._after_transaction_create)
+            event.listen(db.session, 'after_begin', self._after_begin)
+            event.listen(db.session, 'before_flush', self._before_flush)
+            event.listen(db.session, 'after_flush_postexec', self._after_flush_postexec)
+
+        app.after_request(self._after_request)
+        app.register_blueprint(bp)
+
+    def instrument_engine(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine.pool, 'checkout', self._on_checkout)
+
+    def _request_stats(self):
+        if not has_app_context():
+            return None
+        if 'sql_stats' not in g:
+            g.sql_stats = {
+                'queries': 0,
+                'sql_seconds': 0.0,
+                'pool_checkouts': 0,
+                'pool_wait_seconds': 0.0,
+                'flush_seconds': 0.0,
+                'statements': Counter(),
+            }
+        return g.sql_stats
+
+    # Время начала хранится в контексте выполнения, а не в стеке conn.info:
+    # при ошибке запроса after_cursor_execute не вызывается и стек бы рос
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start_time = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_query_start_time', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        stats = self._request_stats()
+        if stats is not None:
+            stats['queries'] += 1
+            stats['sql_seconds'] += elapsed
+            stats['statements'][fingerprint(statement)] += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        stats = self._request_stats()
+        if stats is not None:
+            stats['pool_checkouts'] += 1
+
+    # Между созданием транзакции и after_begin сессия получает соединение из пула,
+    # поэтому этот интервал и считается временем ожидания пула.
+    def _after_transaction_create(self, session, transaction):
+        if transaction.parent is None:
+            session.info['transaction_started'] = time.perf_counter()
+
+    def _after_begin(self, session, transaction, connection):
+        started = session.info.pop('transaction_started', None)
+        stats = self._request_stats()
+        if started is not None and stats is not None:
+            stats['pool_wait_seconds'] += time.perf_counter() - started
+
+    def _before_flush(self, session, flush_context, instances):
+        session.info['flush_started'] = time.perf_counter()
+
+    def _after_flush_postexec(self, session, flush_context):
+        started = session.info.pop('flush_started', None)
+        stats = self._request_stats()
+        if started is not None and stats is not None:
+            stats['flush_seconds'] += time.perf_counter() - started
+
+    def _after_request(self, response):
+        stats = g.pop('sql_stats', None)
+        endpoint = request.endpoint or 'unknown'
+        threshold = current_app.config['SQL_N_PLUS_ONE_THRESHOLD']
+
+        suspects = []
+        if stats is not None:
+            suspects = [(statement, count) for statement, count in stats['statements'].items()
+                        if count >= threshold and statement.upper().startswith('SELECT')]
+        for statement, count in suspects:
+            logger.warning('Possible N+1 in %s: %d x %s', endpoint, count, statement)
+
+        with self._lock:
+            totals = self._endpoints.setdefault(endpoint, dict.fromkeys(ENDPOINT_FIELDS, 0))
+            totals['requests'] += 1
+            totals['n_plus_one'] += len(suspects)
+            if stats is not None:
+                for field in ENDPOINT_FIELDS[1:-1]:
+                    totals[field] += stats[field]
+        return response
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(totals) for endpoint, totals in self._endpoints.items()}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+@bp.route('/metrics')
+@login_required
+def metrics():
+    snapshot = current_app.extensions['query_metrics'].snapshot()
+    series = (
+        ('lab6_requests_total', 'requests'),
+        ('lab6_sql_queries_total', 'queries'),
+        ('lab6_sql_seconds_total', 'sql_seconds'),
+        ('lab6_pool_checkouts_total', 'pool_checkouts'),
+        ('lab6_pool_wait_seconds_total', 'pool_wait_seconds'),
+        ('lab6_orm_flush_seconds_total', 'flush_seconds'),
+        ('lab6_n_plus_one_warnings_total', 'n_plus_one'),
+    )
+    lines = []
+    for name, field in series:
+        lines.append(f'# TYPE {name} counter')
+        for endpoint, totals in sorted(snapshot.items()):
+            lines.append(f'{name}{{endpoint="{endpoint}"}} {totals[field]}')
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+query_metrics = QueryMetrics()
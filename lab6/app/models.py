@@ -8,7 +8,9 @@ from flask import url_for
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey, Text, Integer, MetaData
+from sqlalchemy import String, ForeignKey, Text, Integer, MetaData, Index, UniqueConstraint
+
+from .replicas import RoutingSession
 
 
 class Base(DeclarativeBase):
@@ -20,7 +22,7 @@ class Base(DeclarativeBase):
         "pk": "pk_%(table_name)s"
     })
 
-db = SQLAlchemy(model_class=Base)
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
 
 class Category(Base):
     __tablename__ = 'categories'
@@ -82,6 +84,7 @@ class Course(Base):
     bg_image: Mapped["Image"] = relationship()
 
     reviews: Mapped[list["Review"]] = relationship(back_populates="course")
+    review_stats: Mapped[Optional["CourseReviewStats"]] = relationship(back_populates="course")
 
     def __repr__(self):
         return '<Course %r>' % self.name
@@ -117,6 +120,14 @@ class Image(Base):
 
 class Review(Base):
     __tablename__ = 'reviews'
+    __table_args__ = (
+        Index('ix_reviews_course_id_created_at', 'course_id', 'created_at'),
+        Index('ix_reviews_course_id_rating_created_at', 'course_id', 'rating', 'created_at'),
+        # Сортировка negative: оценка по возрастанию, внутри оценки новые первыми
+        Index('ix_reviews_course_id_rating_created_at_desc', 'course_id', 'rating',
+              sa.desc(sa.column('created_at')), sa.desc(sa.column('id'))),
+        UniqueConstraint('user_id', 'course_id', name='uq_reviews_user_id_course_id'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     rating: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -130,4 +141,44 @@ class Review(Base):
     user: Mapped["User"] = relationship(back_populates="reviews")
 
     def __repr__(self):
-        return f'<Review {self.id} for Course {self.course_id} by User {self.user_id}>'
\ No newline at end of file
+        return f'<Review {self.id} for Course {self.course_id} by User {self.user_id}>'
+
+class CourseReviewStats(Base):
+    __tablename__ = 'course_review_stats'
+
+    RATINGS = range(5, -1, -1)
+
+    course_id: Mapped[int] = mapped_column(ForeignKey("courses.id"), primary_key=True)
+    count_0: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    count_1: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    count_2: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    count_3: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    count_4: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    count_5: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_review_at: Mapped[Optional[datetime]]
+
+    course: Mapped["Course"] = relationship(back_populates="review_stats")
+
+    def __repr__(self):
+        return f'<CourseReviewStats for Course {self.course_id}>'
+
+    def count(self, rating):
+        return getattr(self, f'count_{rating}') or 0
+
+    def percent(self, rating):
+        if not self.total:
+            return 0
+        return self.count(rating) * 100 / self.total
+
+    @property
+    def histogram(self):
+        return [(rating, self.count(rating)) for rating in self.RATINGS]
+
+    def to_dict(self):
+        return {
+            'course_id': self.course_id,
+            'total': self.total or 0,
+            'counts': {str(rating): count for rating, count in self.histogram},
+            'last_review_at': self.last_review_at.isoformat() if self.last_review_at else None,
+        }
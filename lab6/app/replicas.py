@@ -0,0 +1,149 @@
+import functools
+import itertools
+import logging
+import time
+
+from flask import current_app, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Ключ в cookie-сессии Flask: до этого момента чтения пользователя идут на основную базу
+STICKY_KEY = '_db_primary_until'
+
+
+def replica_bind_key(index):
+    return f'replica_{index}'
+
+
+def replica_binds(config):
+    """SQLALCHEMY_BINDS с репликами из SQLALCHEMY_REPLICA_URIS (ключи replica_1, replica_2, ...)."""
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    for index, uri in enumerate(config.get('SQLALCHEMY_REPLICA_URIS') or [], start=1):
+        binds[replica_bind_key(index)] = uri
+    return binds
+
+
+# Чтение с реплик. Репозиторий помечает методы, которым достаточно данных
+# реплики, декоратором read_only; все остальное, включая ленивые загрузки
+# вне таких методов, идет на основную базу. После записи сессия (а через
+# cookie -- и следующие запросы того же пользователя в течение
+# REPLICA_STICKY_SECONDS) читает с основной базы, чтобы видеть свои изменения.
+# Реплика, на которой произошла ошибка соединения, исключается на
+# REPLICA_RETRY_SECONDS, а чтение повторяется на основной базе -- если упал
+# запрос именно к этой реплике и в транзакции сессии нет несохраненных записей.
+class ReplicaRouter:
+    def init_app(self, app, db):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 10)
+        app.config.setdefault('REPLICA_RETRY_SECONDS', 30)
+
+        keys = [replica_bind_key(index) for index in range(1, len(app.config['SQLALCHEMY_REPLICA_URIS']) + 1)]
+        state = app.extensions['replica_router'] = {
+            'keys': keys,
+            'evicted': {},
+            'evictions': 0,
+            'counter': itertools.count(),
+        }
+        with app.app_context():
+            for key in keys:
+                # У реплик нет своих таблиц: без этого create_all/drop_all пошли бы и к ним
+                db.metadatas.pop(key, None)
+                event.listen(db.engines[key], 'handle_error', self._error_handler(app, state, key))
+
+        if not event.contains(db.session, 'after_commit', self._after_commit):
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_rollback', self._after_rollback)
+
+    def _error_handler(self, app, state, key):
+        def handle_error(context):
+            if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+                state['evicted'][key] = time.monotonic() + app.config['REPLICA_RETRY_SECONDS']
+                state['evictions'] += 1
+                logger.warning('Replica %s evicted: %s', key, context.original_exception)
+        return handle_error
+
+    def healthy_replicas(self):
+        state = current_app.extensions['replica_router']
+        now = time.monotonic()
+        return [key for key in state['keys'] if state['evicted'].get(key, 0) <= now]
+
+    def use_replica(self, session, clause):
+        if not session.info.get('read_only') or session.info.get('wrote') or session.info.get('replica_failed'):
+            return False
+        if clause is not None and (not getattr(clause, 'is_select', False)
+                                   or getattr(clause, '_for_update_arg', None) is not None):
+            return False
+        if has_request_context() and flask_session.get(STICKY_KEY, 0) > time.time():
+            return False
+        return True
+
+    def get_replica(self, session):
+        healthy = self.healthy_replicas()
+        if not healthy:
+            return None
+        # Одна реплика на всю сессию: чтения запроса видят согласованный снимок
+        key = session.info.get('replica')
+        if key not in healthy:
+            state = current_app.extensions['replica_router']
+            key = session.info['replica'] = healthy[next(state['counter']) % len(healthy)]
+        session.info['bound_replica'] = key
+        return session._db.engines[key]
+
+    def can_retry(self, session):
+        # Откат потерял бы записи, отправленные в базу, но еще не зафиксированные
+        if session.info.get('uncommitted_writes') or session.new or session.dirty or session.deleted:
+            return False
+        # Повтор имеет смысл, только если упал запрос к реплике, которую обработчик ошибок исключил
+        key = session.info.get('bound_replica')
+        state = current_app.extensions['replica_router']
+        return key is not None and state['evicted'].get(key, 0) > time.monotonic()
+
+    def run_read_only(self, session, func, *args, **kwargs):
+        session.info['read_only'] = session.info.get('read_only', 0) + 1
+        try:
+            return func(*args, **kwargs)
+        except DBAPIError:
+            if not self.can_retry(session):
+                raise
+            logger.warning('Replica read failed, retrying on primary')
+            session.rollback()
+            session.info['replica_failed'] = True
+            return func(*args, **kwargs)
+        finally:
+            session.info['read_only'] -= 1
+
+    def _after_commit(self, session):
+        session.info.pop('uncommitted_writes', None)
+        if session.info.get('wrote') and has_request_context():
+            flask_session[STICKY_KEY] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+
+    def _after_rollback(self, session):
+        session.info.pop('uncommitted_writes', None)
+
+
+replica_router = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            # Реплику, к которой идет запрос, отмечает get_replica
+            self.info['bound_replica'] = None
+            if self._flushing or getattr(clause, 'is_dml', False):
+                self.info['wrote'] = self.info['uncommitted_writes'] = True
+            elif replica_router.use_replica(self, clause):
+                engine = replica_router.get_replica(self)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(method):
+    """Метод репозитория, которому достаточно данных реплики."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return replica_router.run_read_only(self.db.session, method, self, *args, **kwargs)
+    return wrapper
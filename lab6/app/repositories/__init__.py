@@ -2,4 +2,4 @@ from .user_repository import UserRepository
 from .course_repository import CourseRepository
 from .category_repository import CategoryRepository
 from .image_repository import ImageRepository
-from .review_repository import ReviewRepository
\ No newline at end of file
+from .review_repository import ReviewRepository, CursorMismatch
\ No newline at end of file
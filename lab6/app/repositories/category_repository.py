@@ -1,8 +1,83 @@
+from collections import namedtuple
+
 from ..models import Category
 
+CategoryNode = namedtuple('CategoryNode', ['id', 'name', 'parent_id', 'depth'])
+
+class CategoryTree:
+    def __init__(self, rows):
+        self.nodes = {}
+        self.children = {}
+        names = {}
+        parents = {}
+        for category_id, name, parent_id in rows:
+            names[category_id] = name
+            parents[category_id] = parent_id
+
+        # Категория с несуществующим родителем считается корневой
+        roots = []
+        for category_id in sorted(names, key=lambda i: (names[i], i)):
+            parent_id = parents[category_id]
+            if parent_id in names and parent_id != category_id:
+                self.children.setdefault(parent_id, []).append(category_id)
+            else:
+                roots.append(category_id)
+
+        # Обход в глубину без рекурсии; заодно строим замыкание "предок -> потомки".
+        # Категории, замкнутые в цикл, не достижимы от корней — обходим их отдельно
+        self.order = []
+        self.ancestors = {}
+        for root_id in roots + sorted(names, key=lambda i: (names[i], i)):
+            stack = [(root_id, ())]
+            while stack:
+                category_id, path = stack.pop()
+                if category_id in self.nodes:
+                    continue
+                self.nodes[category_id] = CategoryNode(category_id, names[category_id],
+                                                       parents[category_id] if path else None, len(path))
+                self.order.append(category_id)
+                self.ancestors[category_id] = path
+                for child_id in reversed(self.children.get(category_id, [])):
+                    stack.append((child_id, path + (category_id,)))
+
+        self.descendants = {category_id: {category_id} for category_id in self.nodes}
+        for category_id, path in self.ancestors.items():
+            for ancestor_id in path:
+                self.descendants[ancestor_id].add(category_id)
+
+    def __iter__(self):
+        return (self.nodes[category_id] for category_id in self.order)
+
+    def __len__(self):
+        return len(self.order)
+
+    def get(self, category_id):
+        return self.nodes.get(category_id)
+
+    def path(self, category_id):
+        return [self.nodes[i] for i in self.ancestors.get(category_id, ())]
+
+    def expand(self, category_ids):
+        result = set()
+        for category_id in category_ids:
+            try:
+                category_id = int(category_id)
+            except (TypeError, ValueError):
+                continue
+            result |= self.descendants.get(category_id, {category_id})
+        return sorted(result)
+
 class CategoryRepository:
     def __init__(self, db):
         self.db = db
 
+    # Дерево перечитывается сразу после сброса кэша, а реплика может еще не
+    # получить изменения категорий — поэтому читаем с основной базы
+    def get_category_tree(self):
+        rows = self.db.session.execute(
+            self.db.select(Category.id, Category.name, Category.parent_id)
+        ).all()
+        return CategoryTree(rows)
+
     def get_all_categories(self):
-        return self.db.session.execute(self.db.select(Category)).scalars()
\ No newline at end of file
+        return list(self.get_category_tree())
@@ -1,4 +1,5 @@
 from ..models import Course, db
+from ..replicas import read_only
 
 class CourseRepository:
     def __init__(self, db):
@@ -15,16 +16,19 @@ class CourseRepository:
 
         return query
 
+    @read_only
     def get_pagination_info(self, name=None, category_ids=None):
         query = self._all_query(name, category_ids)
         return self.db.paginate(query)
 
+    @read_only
     def get_all_courses(self, name=None, category_ids=None, pagination=None):
         if pagination is not None:
             return pagination.items
         
         return self.db.session.execute(self._all_query(name, category_ids)).scalars()
 
+    @read_only
     def get_course_by_id(self, course_id):
         return self.db.session.get(Course, course_id)
     
@@ -48,15 +52,3 @@ class CourseRepository:
             raise e
         
         return course
-
-    def update_course_rating(self, course_id, old_rating, new_rating):
-        course = self.db.session.get(Course, course_id)
-        if course:
-            if old_rating is not None:
-                course.rating_sum = course.rating_sum - old_rating
-                course.rating_sum = course.rating_sum + new_rating
-            else:
-                course.rating_sum = course.rating_sum + new_rating
-                course.rating_num = course.rating_sum + 1
-            self.db.session.commit()
-        return course
\ No newline at end of file
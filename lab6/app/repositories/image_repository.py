@@ -4,11 +4,13 @@ import os
 from werkzeug.utils import secure_filename
 from flask import current_app
 from ..models import Image
+from ..replicas import read_only
 
 class ImageRepository:
     def __init__(self, db):
         self.db = db
 
+    @read_only
     def get_by_id(self, image_id):
         return self.db.session.get(Image, image_id)
 
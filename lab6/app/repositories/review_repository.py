@@ -1,35 +1,156 @@
-from ..models import Review
-from sqlalchemy import desc, asc
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from ..models import Review, Course, CourseReviewStats
+from sqlalchemy import desc, asc, and_, or_, update, func
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import joinedload
+from ..replicas import read_only
+
+ReviewPage = namedtuple('ReviewPage', ['items', 'next_cursor'])
+
+# Каждому порядку соответствует индекс, читаемый без сортировки:
+# newest и positive -- обратным проходом, negative -- ix_reviews_course_id_rating_created_at_desc
+SORT_ORDERS = {
+    'newest': ((Review.created_at, 'desc'), (Review.id, 'desc')),
+    'positive': ((Review.rating, 'desc'), (Review.created_at, 'desc'), (Review.id, 'desc')),
+    'negative': ((Review.rating, 'asc'), (Review.created_at, 'desc'), (Review.id, 'desc')),
+}
+
+
+class CursorMismatch(ValueError):
+    """Курсор получен при другой сортировке отзывов."""
+
+# Взаимоблокировка и таймаут ожидания блокировки MySQL: транзакцию можно повторить
+RETRYABLE_ERRORS = {1213, 1205}
+UPSERT_ATTEMPTS = 3
+
+
+def _is_retryable(err):
+    orig = err.orig
+    code = getattr(orig, 'errno', None) or (orig.args[0] if getattr(orig, 'args', None) else None)
+    return code in RETRYABLE_ERRORS
+
 
 class ReviewRepository:
     def __init__(self, db):
         self.db = db
 
-    def add_review(self, course_id, user_id, rating, text):
-        review = Review(
-            course_id=course_id,
-            user_id=user_id,
-            rating=rating,
-            text=text
-        )
-        self.db.session.add(review)
-        self.db.session.commit()
-        return review
+    def upsert_review(self, course_id, user_id, rating, text):
+        # Отзыв и изменение рейтинга курса записываются в одной транзакции.
+        # Если параллельный запрос успел вставить такой же отзыв, уникальный
+        # индекс (user_id, course_id) вызовет IntegrityError и мы повторим
+        # попытку уже как обновление. Два первых отзыва одновременно берут
+        # gap-блокировки SELECT ... FOR UPDATE на отсутствующей строке, и MySQL
+        # обрывает одну транзакцию взаимоблокировкой -- её тоже повторяем.
+        for attempt in range(UPSERT_ATTEMPTS):
+            last_attempt = attempt == UPSERT_ATTEMPTS - 1
+            try:
+                return self._upsert_review(course_id, user_id, rating, text)
+            except IntegrityError:
+                self.db.session.rollback()
+                # Курса нет: внешний ключ, а не гонка, повтор не поможет
+                if self.db.session.get(Course, course_id) is None:
+                    return None, False
+                if last_attempt:
+                    raise
+            except OperationalError as e:
+                self.db.session.rollback()
+                if last_attempt or not _is_retryable(e):
+                    raise
+
+    def _upsert_review(self, course_id, user_id, rating, text):
+        session = self.db.session
+        review = session.execute(
+            self.db.select(Review).filter_by(user_id=user_id, course_id=course_id).with_for_update()
+        ).scalar_one_or_none()
 
-    def update_review(self, review_id, rating, text):
-        review = self.db.session.get(Review, review_id)
-        if review:
+        created = review is None
+        if created:
+            old_rating = None
+            review = Review(course_id=course_id, user_id=user_id, rating=rating, text=text)
+            session.add(review)
+            rating_delta, count_delta = rating, 1
+        else:
+            old_rating = review.rating
+            rating_delta, count_delta = rating - review.rating, 0
             review.rating = rating
             review.text = text
-            self.db.session.commit()
-        return review
+        session.flush()
+
+        result = session.execute(
+            update(Course)
+            .where(Course.id == course_id)
+            .values(rating_sum=Course.rating_sum + rating_delta,
+                    rating_num=Course.rating_num + count_delta)
+        )
+        if result.rowcount == 0:
+            session.rollback()
+            return None, False
 
+        self._apply_review_stats(course_id, old_rating, review)
+        session.commit()
+        return review, created
+
+    @read_only
+    def get_review_stats(self, course_id):
+        stats = self.db.session.get(CourseReviewStats, course_id)
+        if stats is None:
+            stats = CourseReviewStats(course_id=course_id, total=0)
+        return stats
+
+    def _apply_review_stats(self, course_id, old_rating, review):
+        # Гистограмма оценок обновляется приращениями в той же транзакции,
+        # что и сам отзыв, поэтому при чтении ничего не агрегируется
+        values = {}
+        if old_rating is None:
+            values['total'] = CourseReviewStats.total + 1
+            values['last_review_at'] = review.created_at
+        if old_rating != review.rating:
+            new_column = getattr(CourseReviewStats, f'count_{review.rating}')
+            values[new_column.key] = new_column + 1
+            if old_rating is not None:
+                old_column = getattr(CourseReviewStats, f'count_{old_rating}')
+                values[old_column.key] = old_column - 1
+        if not values:
+            return
+
+        result = self.db.session.execute(
+            update(CourseReviewStats)
+            .where(CourseReviewStats.course_id == course_id)
+            .values(values)
+        )
+        if result.rowcount == 0:
+            self._rebuild_review_stats(course_id)
+
+    def _rebuild_review_stats(self, course_id):
+        # Записи ещё нет (курс без отзывов или данные до появления статистики) —
+        # один раз считаем её по таблице отзывов
+        rows = self.db.session.execute(
+            self.db.select(Review.rating, func.count(Review.id), func.max(Review.created_at))
+            .filter_by(course_id=course_id)
+            .group_by(Review.rating)
+        ).all()
+        stats = CourseReviewStats(course_id=course_id, total=0, last_review_at=None,
+                                  **{f'count_{rating}': 0 for rating in CourseReviewStats.RATINGS})
+        for rating, count, last_review_at in rows:
+            setattr(stats, f'count_{rating}', count)
+            stats.total += count
+            if stats.last_review_at is None or last_review_at > stats.last_review_at:
+                stats.last_review_at = last_review_at
+        self.db.session.add(stats)
+        self.db.session.flush()
+        return stats
+
+    @read_only
     def get_review_by_user_and_course(self, user_id, course_id):
         return self.db.session.execute(
             self.db.select(Review).filter_by(user_id=user_id, course_id=course_id)
         ).scalar_one_or_none()
 
+    @read_only
     def get_latest_reviews_for_course(self, course_id, limit=5):
         return self.db.session.execute(
             self.db.select(Review)
@@ -39,6 +160,7 @@ class ReviewRepository:
             .options(joinedload(Review.user))
         ).scalars().all()
 
+    @read_only
     def get_paginated_reviews_for_course(self, course_id, page, per_page, sort_by='newest'):
         query = self.db.select(Review).filter_by(course_id=course_id).options(joinedload(Review.user))
 
@@ -49,4 +171,60 @@ class ReviewRepository:
         else:
             query = query.order_by(Review.created_at.desc())
 
-        return self.db.paginate(query, page=page, per_page=per_page, error_out=False)
\ No newline at end of file
+        return self.db.paginate(query, page=page, per_page=per_page, error_out=False)
+
+    @read_only
+    def get_reviews_page_after(self, course_id, per_page, sort_by='newest', cursor=None):
+        # Keyset-пагинация: вместо OFFSET продолжаем с последнего показанного отзыва,
+        # поэтому стоимость страницы не зависит от её номера
+        if sort_by not in SORT_ORDERS:
+            sort_by = 'newest'
+        order = SORT_ORDERS[sort_by]
+        query = self.db.select(Review).filter_by(course_id=course_id).options(joinedload(Review.user))
+
+        values = self._decode_cursor(cursor, sort_by, len(order))
+        if values is not None:
+            query = query.filter(self._keyset_filter(order, values))
+
+        query = query.order_by(*[column.desc() if direction == 'desc' else column.asc()
+                                 for column, direction in order])
+        items = self.db.session.execute(query.limit(per_page + 1)).scalars().all()
+
+        next_cursor = None
+        if len(items) > per_page:
+            items = items[:per_page]
+            last = items[-1]
+            next_cursor = self._encode_cursor(sort_by, [getattr(last, column.key) for column, _ in order])
+        return ReviewPage(items, next_cursor)
+
+    def _keyset_filter(self, order, values):
+        conditions = []
+        for i, (column, direction) in enumerate(order):
+            equal = [c == v for (c, _), v in zip(order[:i], values[:i])]
+            after = column < values[i] if direction == 'desc' else column > values[i]
+            conditions.append(and_(*equal, after))
+        return or_(*conditions)
+
+    def _encode_cursor(self, sort_by, values):
+        raw = {'sort': sort_by, 'after': [v.isoformat() if isinstance(v, datetime) else v for v in values]}
+        return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode().rstrip('=')
+
+    def _decode_cursor(self, cursor, sort_by, length):
+        # Испорченный курсор означает первую страницу; курсор другой сортировки
+        # -- ошибка: его значения означали бы совсем другую позицию
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = json.loads(base64.urlsafe_b64decode(padded))
+            cursor_sort, values = raw['sort'], raw['after']
+        except (ValueError, TypeError, KeyError):
+            return None
+        if cursor_sort != sort_by:
+            raise CursorMismatch(f'cursor was issued for sort_by={cursor_sort}')
+        if not isinstance(values, list) or len(values) != length:
+            return None
+        try:
+            return [datetime.fromisoformat(v) if isinstance(v, str) else v for v in values]
+        except ValueError:
+            return None
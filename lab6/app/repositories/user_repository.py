@@ -1,15 +1,19 @@
 from ..models import User
+from ..replicas import read_only
 
 class UserRepository:
     def __init__(self, db):
         self.db = db
 
+    @read_only
     def get_all_users(self):
         return self.db.session.execute(self.db.select(User)).scalars()
     
+    @read_only
     def get_user_by_id(self, user_id):
         return self.db.session.execute(self.db.select(User).filter_by(id=user_id)).scalar()
 
+    @read_only
     def get_user_by_login(self, login):
         return self.db.session.execute(self.db.select(User).filter_by(login=login)).scalar()
     
\ No newline at end of file
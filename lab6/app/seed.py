@@ -0,0 +1,203 @@
+import hashlib
+import os
+import random
+import struct
+import uuid
+import zlib
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+
+from .models import Category, Course, CourseReviewStats, Image, Review, User
+
+# Пароль всех сгенерированных пользователей
+SEED_PASSWORD = 'password'
+LOGIN_PREFIX = 'seed'
+# Файлы сгенерированных картинок (seed-<uuid>.png) не попадают в git
+IMAGE_PREFIX = 'seed-'
+
+DEFAULT_CATEGORIES = ['Программирование', 'Математика', 'Языкознание']
+
+FIRST_NAMES = ['Иван', 'Петр', 'Сергей', 'Алексей', 'Дмитрий', 'Анна', 'Мария', 'Елена', 'Ольга', 'Татьяна']
+LAST_NAMES = ['Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов', 'Михайлов', 'Новиков']
+MIDDLE_NAMES = ['Иванович', 'Петрович', 'Сергеевич', 'Алексеевич', 'Дмитриевич', None, None]
+
+COURSE_TOPICS = ['Python', 'Алгоритмы', 'Базы данных', 'Линейная алгебра', 'Теория вероятностей',
+                 'Английский язык', 'Веб-разработка', 'Машинное обучение', 'Статистика', 'Лингвистика']
+COURSE_LEVELS = ['для начинающих', 'для продолжающих', 'продвинутый уровень', 'интенсив', 'практикум']
+
+REVIEW_TEXTS = {
+    0: ['Курс не понравился совсем.', 'Материал устарел, задания не проверяются.'],
+    1: ['Очень слабо, много ошибок в материалах.', 'Не рекомендую.'],
+    2: ['Не очень понятно, нужно доработать.', 'Ожидал большего.'],
+    3: ['Нормально, но без изюминки.', 'Есть полезные темы, но подача скучная.'],
+    4: ['Хороший курс, но есть что улучшить.', 'Понятные объяснения, интересные задачи.'],
+    5: ['Отличный курс, всё очень понятно!', 'Лучший курс по теме, рекомендую.'],
+}
+
+# Популярность курсов по закону Ципфа: немногие курсы собирают большую часть отзывов
+ZIPF_EXPONENT = 1.0
+
+
+def placeholder_png(width, height, color):
+    """Однотонный PNG без сторонних библиотек."""
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    row = b'\x00' + bytes(color) * width
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(row * height, 9))
+            + chunk(b'IEND', b''))
+
+
+def review_counts(rnd, total, course_count, max_per_course):
+    """Число отзывов на курс: распределение Ципфа, не больше max_per_course (один отзыв на пользователя)."""
+    weights = [1 / rank ** ZIPF_EXPONENT for rank in range(1, course_count + 1)]
+    rnd.shuffle(weights)
+    counts = [0] * course_count
+    remaining = min(total, course_count * max_per_course)
+    while remaining:
+        # Остаток от курсов, упершихся в число пользователей, делится между остальными
+        open_courses = [i for i in range(course_count) if counts[i] < max_per_course]
+        open_weight = sum(weights[i] for i in open_courses)
+        added = 0
+        for i in open_courses:
+            extra = min(int(remaining * weights[i] / open_weight), max_per_course - counts[i])
+            counts[i] += extra
+            added += extra
+        if not added:
+            for i in rnd.choices(open_courses, [weights[i] for i in open_courses], k=remaining):
+                if counts[i] < max_per_course and added < remaining:
+                    counts[i] += 1
+                    added += 1
+        remaining -= added
+    return counts
+
+
+def course_ratings(rnd, count):
+    # У каждого курса свое «качество»: оценки группируются вокруг него
+    quality = rnd.betavariate(5, 2) * 5
+    return [min(5, max(0, round(rnd.gauss(quality, 1.0)))) for _ in range(count)]
+
+
+class Seeder:
+    def __init__(self, db, seed=None, batch_size=2000, now=None):
+        self.db = db
+        self.rnd = random.Random(seed)
+        self.batch_size = batch_size
+        self.now = now or datetime.now().replace(microsecond=0)
+
+    def _next_id(self, column):
+        # Явные id: курсы, их статистика и отзывы пишутся без чтения id обратно
+        return (self.db.session.execute(select(func.max(column))).scalar() or 0) + 1
+
+    def _insert(self, model, rows):
+        # insert() со списком строк: один скомпилированный запрос на все пачки,
+        # а драйвер MySQL сворачивает executemany в многострочный INSERT.
+        # insert().values([...]) компилируется заново для каждой пачки и
+        # на миллионах отзывов тратит на это больше времени, чем на запись
+        for start in range(0, len(rows), self.batch_size):
+            self.db.session.execute(insert(model.__table__), rows[start:start + self.batch_size])
+        self.db.session.commit()
+
+    def _random_time(self, since):
+        return since + timedelta(seconds=self.rnd.randrange(max(1, int((self.now - since).total_seconds()))))
+
+    def seed_categories(self):
+        category_ids = self.db.session.execute(select(Category.id)).scalars().all()
+        if not category_ids:
+            self._insert(Category, [{'name': name} for name in DEFAULT_CATEGORIES])
+            category_ids = self.db.session.execute(select(Category.id)).scalars().all()
+        return category_ids
+
+    def seed_users(self, count):
+        first_id = self._next_id(User.id)
+        # Хеширование медленное намеренно, поэтому один хеш на всех
+        password_hash = generate_password_hash(SEED_PASSWORD)
+        self._insert(User, [{
+            'id': first_id + i,
+            'login': f'{LOGIN_PREFIX}{first_id + i}',
+            'first_name': self.rnd.choice(FIRST_NAMES),
+            'last_name': self.rnd.choice(LAST_NAMES),
+            'middle_name': self.rnd.choice(MIDDLE_NAMES),
+            'password_hash': password_hash,
+            'created_at': self._random_time(self.now - timedelta(days=3 * 365)),
+        } for i in range(count)])
+        return list(range(first_id, first_id + count))
+
+    def get_user_ids(self):
+        return self.db.session.execute(select(User.id).order_by(User.id)).scalars().all()
+
+    def seed_images(self, count, width=300, height=200):
+        folder = current_app.config['UPLOAD_FOLDER']
+        os.makedirs(folder, exist_ok=True)
+        rows = []
+        for i in range(count):
+            # Разный цвет -- разный md5_hash (он уникален)
+            color = (self.rnd.randrange(256), self.rnd.randrange(256), i % 256)
+            data = placeholder_png(width, height, color)
+            md5_hash = hashlib.md5(data).hexdigest()
+            if self.db.session.execute(select(Image.id).filter_by(md5_hash=md5_hash)).first() is not None:
+                continue
+            image = {'id': f'{IMAGE_PREFIX}{uuid.uuid4()}', 'file_name': f'placeholder-{i + 1}.png', 'mime_type': 'image/png',
+                     'md5_hash': md5_hash, 'object_type': 'course', 'created_at': self.now}
+            with open(os.path.join(folder, image['id'] + '.png'), 'wb') as f:
+                f.write(data)
+            rows.append(image)
+        self._insert(Image, rows)
+        return [row['id'] for row in rows]
+
+    def seed_courses(self, count, review_total, user_ids, category_ids, image_ids, progress=None):
+        """Курсы с отзывами. rating_sum/rating_num и course_review_stats считаются по тем же
+        сгенерированным оценкам, поэтому совпадают с таблицей reviews."""
+        counts = review_counts(self.rnd, review_total, count, len(user_ids))
+        first_course_id = self._next_id(Course.id)
+        next_review_id = self._next_id(Review.id)
+        written = 0
+
+        for start in range(0, count, self.batch_size):
+            courses, stats, reviews = [], [], []
+            for offset in range(start, min(start + self.batch_size, count)):
+                course_id = first_course_id + offset
+                created_at = self._random_time(self.now - timedelta(days=3 * 365))
+                ratings = course_ratings(self.rnd, counts[offset])
+                histogram = [0] * 6
+                last_review_at = None
+                for user_id, rating in zip(self.rnd.sample(user_ids, counts[offset]), ratings):
+                    review_at = self._random_time(created_at)
+                    reviews.append({'id': next_review_id, 'course_id': course_id, 'user_id': user_id,
+                                    'rating': rating, 'text': self.rnd.choice(REVIEW_TEXTS[rating]),
+                                    'created_at': review_at})
+                    next_review_id += 1
+                    histogram[rating] += 1
+                    if last_review_at is None or review_at > last_review_at:
+                        last_review_at = review_at
+
+                topic = self.rnd.choice(COURSE_TOPICS)
+                courses.append({
+                    'id': course_id,
+                    'name': f'{topic} {self.rnd.choice(COURSE_LEVELS)} #{course_id}',
+                    'short_desc': f'Курс «{topic}»: основные понятия и практика.',
+                    'full_desc': f'Подробная программа курса «{topic}». ' * 5,
+                    'rating_sum': sum(ratings),
+                    'rating_num': len(ratings),
+                    'category_id': self.rnd.choice(category_ids),
+                    'author_id': self.rnd.choice(user_ids),
+                    'background_image_id': self.rnd.choice(image_ids),
+                    'created_at': created_at,
+                })
+                if ratings:
+                    stats.append({'course_id': course_id, 'total': len(ratings), 'last_review_at': last_review_at,
+                                  **{f'count_{rating}': n for rating, n in enumerate(histogram)}})
+
+            self._insert(Course, courses)
+            self._insert(CourseReviewStats, stats)
+            self._insert(Review, reviews)
+            written += len(reviews)
+            if progress is not None:
+                progress(start + len(courses), written)
+        return written
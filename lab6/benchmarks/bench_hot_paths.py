@@ -0,0 +1,45 @@
+import pytest
+from flask import render_template
+
+pytest.importorskip('pytest_benchmark')
+
+from app.models import db, Course
+from app.repositories import CourseRepository, CategoryRepository, ReviewRepository
+
+course_repository = CourseRepository(db)
+category_repository = CategoryRepository(db)
+review_repository = ReviewRepository(db)
+
+def test_course_pagination_info(benchmark, app, size):
+    with app.test_request_context('/courses/?page=1'):
+        pagination = benchmark(course_repository.get_pagination_info)
+    assert pagination.total == size
+
+def test_course_pagination_info_filtered(benchmark, app, size):
+    with app.test_request_context('/courses/?page=1'):
+        pagination = benchmark(course_repository.get_pagination_info, name='Курс 1', category_ids=['1', '2'])
+    expected = [course for course in db.session.execute(db.select(Course)).scalars()
+                if 'Курс 1' in course.name and course.category_id in (1, 2)]
+    assert pagination.total == len(expected)
+    assert all('Курс 1' in course.name and course.category_id in (1, 2) for course in pagination.items)
+
+@pytest.mark.parametrize('sort_by', ['newest', 'positive', 'negative'])
+def test_paginated_reviews_for_course(benchmark, app, size, popular_course_id, sort_by):
+    with app.test_request_context():
+        def last_page():
+            page = max(1, size // 10)
+            return review_repository.get_paginated_reviews_for_course(popular_course_id, page, 10, sort_by)
+        pagination = benchmark(last_page)
+    assert pagination.total == size
+
+def test_render_courses_index(benchmark, app, size):
+    with app.test_request_context(f'/courses/?per_page={size}'):
+        pagination = course_repository.get_pagination_info()
+        courses = list(course_repository.get_all_courses(pagination=pagination))
+        categories = list(category_repository.get_all_categories())
+        for course in courses:
+            course.author
+
+        html = benchmark(render_template, 'courses/index.html', courses=courses, categories=categories,
+                         pagination=pagination, search_params={'name': None, 'category_ids': []})
+    assert html.count('courses-list') == 1
@@ -0,0 +1,63 @@
+# Микробенчмарки горячих путей lab6 (нужен pytest-benchmark).
+# Запуск из каталога lab6:
+#   python -m pytest benchmarks/bench_*.py --benchmark-group-by=func
+# Размеры наборов данных задаются через BENCH_SIZES (по умолчанию 10,100,1000).
+import os
+import random
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.models import db, User, Category, Course, Review, Image
+
+BENCH_SIZES = [int(x) for x in os.environ.get('BENCH_SIZES', '10,100,1000').split(',')]
+
+@pytest.fixture(params=BENCH_SIZES, ids=lambda size: f'n={size}')
+def size(request):
+    return request.param
+
+@pytest.fixture()
+def app(size, tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'UPLOAD_FOLDER': str(tmp_path),
+    })
+    rnd = random.Random(size)
+
+    with app.app_context():
+        db.create_all()
+
+        password_hash = generate_password_hash('password')
+        users = [User(first_name=f'Имя{i}', last_name=f'Фамилия{i}', login=f'user{i}',
+                      password_hash=password_hash) for i in range(max(10, size))]
+        categories = [Category(name=f'Категория {i}') for i in range(5)]
+        image = Image(id='bench', file_name='bench.jpg', mime_type='image/jpeg', md5_hash='bench')
+        db.session.add_all(users + categories + [image])
+        db.session.flush()
+
+        courses = [Course(name=f'Курс {i}', short_desc='Краткое описание ' * 10, full_desc='Полное описание',
+                          category=rnd.choice(categories), author=rnd.choice(users), bg_image=image)
+                   for i in range(size)]
+        db.session.add_all(courses)
+        db.session.flush()
+
+        # Все отзывы приходятся на первый курс, чтобы мерить постраничный вывод одного курса;
+        # каждый пользователь оставляет на нём не больше одного отзыва
+        popular = courses[0]
+        for i in range(size):
+            rating = rnd.randint(0, 5)
+            db.session.add(Review(course=popular, user=users[i], rating=rating,
+                                  text=f'Отзыв номер {i}, достаточно длинный текст.'))
+            popular.rating_sum += rating
+            popular.rating_num += 1
+        db.session.commit()
+
+        yield app
+
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture()
+def popular_course_id(app):
+    return db.session.execute(db.select(Course.id).order_by(Course.id).limit(1)).scalar()
@@ -0,0 +1,26 @@
+"""Add composite indexes for course reviews
+
+Revision ID: 4b1f0e7a9c21
+Revises: c2d76a7260eb
+Create Date: 2025-06-10 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b1f0e7a9c21'
+down_revision = 'c2d76a7260eb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_reviews_course_id_created_at', 'reviews', ['course_id', 'created_at'], unique=False)
+    op.create_index('ix_reviews_course_id_rating_created_at', 'reviews', ['course_id', 'rating', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reviews_course_id_rating_created_at', table_name='reviews')
+    op.drop_index('ix_reviews_course_id_created_at', table_name='reviews')
@@ -0,0 +1,41 @@
+"""Unique review per user and course
+
+Revision ID: 9d3a6c2e5f10
+Revises: 4b1f0e7a9c21
+Create Date: 2025-06-12 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3a6c2e5f10'
+down_revision = '4b1f0e7a9c21'
+branch_labels = None
+depends_on = None
+
+
+def data_upgrades():
+    """Keep only the latest review of each user per course and recount ratings."""
+
+    op.execute(
+        'DELETE FROM reviews WHERE id NOT IN ('
+        'SELECT keep_id FROM (SELECT MAX(id) AS keep_id FROM reviews GROUP BY user_id, course_id) AS latest)'
+    )
+    op.execute(
+        'UPDATE courses SET '
+        'rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM reviews WHERE reviews.course_id = courses.id), '
+        'rating_num = (SELECT COUNT(*) FROM reviews WHERE reviews.course_id = courses.id)'
+    )
+
+
+def upgrade():
+    data_upgrades()
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_reviews_user_id_course_id', ['user_id', 'course_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_reviews_user_id_course_id', type_='unique')
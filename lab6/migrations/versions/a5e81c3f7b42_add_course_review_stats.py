@@ -0,0 +1,50 @@
+"""Add course review stats
+
+Revision ID: a5e81c3f7b42
+Revises: 9d3a6c2e5f10
+Create Date: 2025-06-14 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5e81c3f7b42'
+down_revision = '9d3a6c2e5f10'
+branch_labels = None
+depends_on = None
+
+
+def data_upgrades():
+    """Fill the stats table from the existing reviews."""
+
+    counts = ', '.join(
+        f'SUM(CASE WHEN rating = {rating} THEN 1 ELSE 0 END)' for rating in range(6)
+    )
+    op.execute(
+        'INSERT INTO course_review_stats '
+        '(course_id, count_0, count_1, count_2, count_3, count_4, count_5, total, last_review_at) '
+        f'SELECT course_id, {counts}, COUNT(*), MAX(created_at) FROM reviews GROUP BY course_id'
+    )
+
+
+def upgrade():
+    op.create_table('course_review_stats',
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('count_0', sa.Integer(), nullable=False),
+    sa.Column('count_1', sa.Integer(), nullable=False),
+    sa.Column('count_2', sa.Integer(), nullable=False),
+    sa.Column('count_3', sa.Integer(), nullable=False),
+    sa.Column('count_4', sa.Integer(), nullable=False),
+    sa.Column('count_5', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('last_review_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], name=op.f('fk_course_review_stats_course_id_courses')),
+    sa.PrimaryKeyConstraint('course_id', name=op.f('pk_course_review_stats'))
+    )
+    data_upgrades()
+
+
+def downgrade():
+    op.drop_table('course_review_stats')
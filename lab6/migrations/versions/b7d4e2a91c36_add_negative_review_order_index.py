@@ -0,0 +1,27 @@
+"""Add index for the negative review order
+
+Revision ID: b7d4e2a91c36
+Revises: a5e81c3f7b42
+Create Date: 2025-06-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d4e2a91c36'
+down_revision = 'a5e81c3f7b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # rating ASC, created_at DESC, id DESC: смешанные направления не читаются
+    # ни прямым, ни обратным проходом по ix_reviews_course_id_rating_created_at
+    op.create_index('ix_reviews_course_id_rating_created_at_desc', 'reviews',
+                    ['course_id', 'rating', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reviews_course_id_rating_created_at_desc', table_name='reviews')
@@ -11,6 +11,7 @@ def app():
         'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
         'WTF_CSRF_ENABLED': False,
         'UPLOAD_FOLDER': 'test_uploads',
+        'CATEGORY_CACHE_VERSION_FILE': os.path.join('test_uploads', 'category_cache.version'),
         # 'DEBUG': True,
         # "ENV": "development",
     })
@@ -0,0 +1,144 @@
+import asyncio
+import os
+from http.cookies import SimpleCookie
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.asgi import create_asgi_app, async_database_uri
+from app.category_cache import category_cache
+from app.models import db, User, Category, Course, Review, Image
+
+
+@pytest.fixture()
+def asgi_app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'lab6.sqlite'),
+        'UPLOAD_FOLDER': str(tmp_path),
+        'CATEGORY_CACHE_VERSION_FILE': str(tmp_path / 'category_cache.version'),
+    })
+    with app.app_context():
+        db.create_all()
+        user = User(first_name='Иван', last_name='Иванов', login='ivan',
+                    password_hash=generate_password_hash('password'))
+        category = Category(name='Программирование')
+        image = Image(id='img', file_name='img.jpg', mime_type='image/jpeg', md5_hash='img')
+        course = Course(name='Python для начинающих', short_desc='Краткое описание', full_desc='Полное описание',
+                        category=category, author=user, bg_image=image)
+        db.session.add_all([user, category, image, course])
+        db.session.flush()
+        db.session.add(Review(course=course, user=user, rating=5, text='Отличный курс, всё понятно!'))
+        course.rating_sum, course.rating_num = 5, 1
+        db.session.commit()
+        with open(os.path.join(tmp_path, image.storage_filename), 'wb') as f:
+            f.write(b'x' * 100000)
+
+    asgi = create_asgi_app(app)
+    yield asgi
+
+    asyncio.run(asgi.engine.dispose())
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+async def request(asgi, method, path, body=b'', headers=()):
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+        'root_path': '', 'scheme': 'http', 'http_version': '1.1', 'server': ('testserver', 80),
+        'headers': [(k.lower().encode(), v.encode()) for k, v in headers],
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi(scope, receive, send)
+    return messages
+
+
+def call(asgi, method, path, body=b'', headers=()):
+    messages = asyncio.run(request(asgi, method, path, body, headers))
+    start = messages[0]
+    response_headers = [(k.decode(), v.decode()) for k, v in start['headers']]
+    return start['status'], response_headers, b''.join(m.get('body', b'') for m in messages[1:])
+
+
+def test_async_database_uri():
+    assert async_database_uri('sqlite:///lab6.sqlite') == 'sqlite+aiosqlite:///lab6.sqlite'
+    assert async_database_uri('mysql+mysqlconnector://u:p@db/lab6') == 'mysql+aiomysql://u:p@db/lab6'
+
+
+def test_catalog_pages(asgi_app):
+    status, _, body = call(asgi_app, 'GET', '/courses/')
+    assert status == 200
+    assert 'Python для начинающих'.encode() in body
+
+    status, _, body = call(asgi_app, 'GET', '/courses/1')
+    assert status == 200
+    assert 'Отличный курс, всё понятно!'.encode() in body
+
+    status, _, body = call(asgi_app, 'GET', '/courses/1/reviews?sort_by=positive')
+    assert status == 200
+    assert 'Отличный курс, всё понятно!'.encode() in body
+
+    assert call(asgi_app, 'GET', '/courses/999')[0] == 404
+
+
+def test_image_is_streamed(asgi_app):
+    status, headers, body = call(asgi_app, 'GET', '/images/img')
+    assert status == 200
+    assert ('content-type', 'image/jpeg') in headers
+    assert body == b'x' * 100000
+
+    assert call(asgi_app, 'GET', '/images/missing')[0] == 404
+
+
+def test_other_routes_fall_back_to_wsgi(asgi_app):
+    status, headers, _ = call(asgi_app, 'POST', '/auth/login', body=b'login=ivan&password=password',
+                              headers=[('Content-Type', 'application/x-www-form-urlencoded')])
+    assert status == 302
+
+    cookie = SimpleCookie()
+    for name, value in headers:
+        if name == 'set-cookie':
+            cookie.load(value)
+    session_cookie = '; '.join(f'{key}={morsel.value}' for key, morsel in cookie.items())
+
+    status, _, body = call(asgi_app, 'GET', '/courses/1', headers=[('Cookie', session_cookie)])
+    assert status == 200
+    assert 'Сохранить изменения'.encode() in body
+
+
+def test_concurrent_requests_on_cold_category_cache(asgi_app, monkeypatch):
+    loads = []
+    load = category_cache.load
+    monkeypatch.setattr(category_cache, 'load', lambda *args: loads.append(1) or load(*args))
+
+    async def catalog_pages():
+        return await asyncio.gather(*[request(asgi_app, 'GET', '/courses/') for _ in range(3)])
+
+    responses = asyncio.run(catalog_pages())
+    assert [messages[0]['status'] for messages in responses] == [200, 200, 200]
+    assert len(loads) == 1
+
+
+def test_wsgi_fallback_streams_response(asgi_app):
+    flask_app = asgi_app.flask_app
+
+    @flask_app.route('/stream-test')
+    def stream_test():
+        return flask_app.response_class(chunk for chunk in ('a', 'b', 'c'))
+
+    messages = asyncio.run(request(asgi_app, 'GET', '/stream-test'))
+    assert messages[0]['status'] == 200
+    assert [m['body'] for m in messages[1:] if m['body']] == [b'a', b'b', b'c']
@@ -0,0 +1,69 @@
+import os
+
+from app.category_cache import category_cache
+from app.models import db, Category
+
+
+def test_tree_is_loaded_once(app, test_data):
+    with app.app_context():
+        first = category_cache.get_tree()
+        assert category_cache.get_tree() is first
+        assert [c.name for c in first] == ['Дизайн', 'Программирование']
+
+
+def test_category_write_invalidates_cache(app, test_data):
+    with app.app_context():
+        first = category_cache.get_tree()
+
+        db.session.add(Category(name='Аналитика'))
+        db.session.commit()
+
+        tree = category_cache.get_tree()
+        assert tree is not first
+        assert [c.name for c in tree] == ['Аналитика', 'Дизайн', 'Программирование']
+
+
+def test_rolled_back_write_keeps_cache(app, test_data):
+    with app.app_context():
+        first = category_cache.get_tree()
+
+        db.session.add(Category(name='Аналитика'))
+        db.session.flush()
+        db.session.rollback()
+        db.session.add(Category(name='Тест'))
+        db.session.expunge_all()
+        db.session.commit()
+
+        assert category_cache.get_tree() is first
+
+
+def test_ttl_expiry(app, test_data):
+    app.config['CATEGORY_CACHE_TTL'] = 0
+    with app.app_context():
+        first = category_cache.get_tree()
+        app.extensions['category_cache']['loaded_at'] -= 1
+        assert category_cache.get_tree() is not first
+
+
+def test_version_stamp_from_another_worker(app, test_data):
+    with app.app_context():
+        first = category_cache.get_tree()
+
+        # Другой процесс сбросил кэш: поменялось только время изменения файла
+        path = app.config['CATEGORY_CACHE_VERSION_FILE']
+        open(path, 'a').close()
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+        assert category_cache.get_tree() is not first
+
+
+def test_invalidate_command(app, test_data):
+    with app.app_context():
+        first = category_cache.get_tree()
+
+    result = app.test_cli_runner().invoke(args=['invalidate-categories'])
+    assert 'Category cache invalidated.' in result.output
+
+    with app.app_context():
+        assert category_cache.get_tree() is not first
@@ -185,4 +185,33 @@ def test_all_reviews_page_pagination_and_sorting(client, app, test_data):
     html = response.data.decode('utf-8')
 
     assert html.find('Не очень понятно, нужно доработать.') < html.find('Хороший курс, но есть что улучшить.')
-    assert html.find('Хороший курс, но есть что улучшить.') < html.find('Отличный курс, всё очень понятно!')
\ No newline at end of file
+    assert html.find('Хороший курс, но есть что улучшить.') < html.find('Отличный курс, всё очень понятно!')
+
+def test_review_stats_endpoint(client, app, test_data):
+    course = test_data['courses']['Основы веб-дизайна']
+    login(client, 'anna', 'password')
+    client.post(f'/courses/{course.id}/reviews/submit', data={'rating': 5, 'text': 'Отличный курс по дизайну!'})
+
+    response = client.get(f'/courses/{course.id}/reviews/stats')
+    assert response.status_code == 200
+    assert response.json['total'] == 1
+    assert response.json['counts']['5'] == 1
+    assert response.json['rating'] == 5
+
+    assert client.get('/courses/9999/reviews/stats').status_code == 404
+
+def test_all_reviews_rejects_cursor_of_other_sort_order(client, app, test_data):
+    course = test_data['courses']['Python для начинающих']
+    with app.app_context():
+        page = ReviewRepository(db).get_reviews_page_after(course.id, per_page=1, sort_by='newest')
+
+    response = client.get(f'/courses/{course.id}/reviews?sort_by=newest&cursor={page.next_cursor}')
+    assert response.status_code == 200
+
+    response = client.get(f'/courses/{course.id}/reviews?sort_by=negative&cursor={page.next_cursor}')
+    assert response.status_code == 400
+
+def test_submit_review_for_missing_course(client, app, test_data):
+    login(client, 'anna', 'password')
+    response = client.post('/courses/9999/reviews/submit', data={'rating': 5, 'text': 'Курса с таким id нет.'})
+    assert response.status_code == 404
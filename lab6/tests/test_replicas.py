@@ -0,0 +1,159 @@
+import shutil
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from app.models import db, User, Category, Course, Image
+from app.replicas import replica_router
+from app.repositories import CourseRepository, ReviewRepository
+
+
+def make_app(tmp_path, replica_uri):
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'primary.sqlite'),
+        'SQLALCHEMY_REPLICA_URIS': [replica_uri],
+        'UPLOAD_FOLDER': str(tmp_path),
+        'CATEGORY_CACHE_VERSION_FILE': str(tmp_path / 'category_cache.version'),
+    })
+
+@pytest.fixture()
+def replica_app(tmp_path):
+    app = make_app(tmp_path, 'sqlite:///' + str(tmp_path / 'replica.sqlite'))
+    with app.app_context():
+        db.create_all()
+        user = User(first_name='Иван', last_name='Иванов', login='ivan',
+                    password_hash=generate_password_hash('password'))
+        image = Image(id='img', file_name='img.jpg', mime_type='image/jpeg', md5_hash='img')
+        course = Course(name='Старое название', short_desc='Кратко', full_desc='Полностью',
+                        category=Category(name='Программирование'), author=user, bg_image=image)
+        db.session.add_all([user, image, course])
+        db.session.commit()
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+    # Реплика -- снимок основной базы; дальше она «отстает»
+    shutil.copy(tmp_path / 'primary.sqlite', tmp_path / 'replica.sqlite')
+    with app.app_context():
+        db.session.get(Course, 1).name = 'Новое название'
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+def test_read_only_calls_use_replica(replica_app):
+    with replica_app.app_context():
+        assert CourseRepository(db).get_course_by_id(1).name == 'Старое название'
+    with replica_app.app_context():
+        # Обычный запрос сессии идет на основную базу
+        assert db.session.get(Course, 1).name == 'Новое название'
+
+def test_writes_go_to_primary_and_stick(replica_app):
+    client = replica_app.test_client()
+    client.post('/auth/login', data={'login': 'ivan', 'password': 'password'})
+
+    response = client.post('/courses/1/reviews/submit', data={'rating': 5, 'text': 'Отличный курс, рекомендую!'})
+    assert response.status_code == 302
+
+    # Пользователь сразу видит свой отзыв, хотя реплика его еще не получила
+    body = client.get('/courses/1').get_data(as_text=True)
+    assert 'Отличный курс, рекомендую!' in body
+    assert 'Новое название' in body
+
+    with replica_app.app_context():
+        assert ReviewRepository(db).get_latest_reviews_for_course(1) == []
+
+    replica_app.config['REPLICA_STICKY_SECONDS'] = 0
+    client.post('/courses/1/reviews/submit', data={'rating': 4, 'text': 'Передумал, но все равно хорошо.'})
+    assert 'Старое название' in client.get('/courses/1').get_data(as_text=True)
+
+def test_failed_replica_is_evicted(tmp_path):
+    app = make_app(tmp_path, 'sqlite:///' + str(tmp_path / 'missing' / 'replica.sqlite'))
+    with app.app_context():
+        db.create_all()
+        user = User(first_name='Иван', last_name='Иванов', login='ivan', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+
+    state = app.extensions['replica_router']
+    with app.app_context():
+        # Чтение повторяется на основной базе, реплика исключается
+        assert CourseRepository(db).get_course_by_id(1) is None
+        assert state['evictions'] == 1
+        assert 'replica_1' in state['evicted']
+
+    with app.app_context():
+        assert db.session.execute(db.select(User.login)).scalars().all() == ['ivan']
+        assert CourseRepository(db).get_pagination_info().total == 0
+        assert state['evictions'] == 1
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+def test_category_tree_reloads_from_primary(replica_app):
+    from app.category_cache import category_cache
+
+    with replica_app.app_context():
+        assert [node.name for node in category_cache.get_tree()] == ['Программирование']
+        db.session.get(Category, 1).name = 'Разработка'
+        db.session.commit()
+    with replica_app.app_context():
+        # Реплика еще не получила переименование, но дерево после сброса уже новое
+        assert [node.name for node in category_cache.get_tree()] == ['Разработка']
+
+def evict(app, key='replica_1'):
+    state = app.extensions['replica_router']
+    state['evicted'][key] = time.monotonic() + 30
+    state['evictions'] += 1
+
+def test_primary_error_is_not_retried_after_other_eviction(replica_app):
+    calls = []
+
+    def read():
+        calls.append(1)
+        # Пока запрос шел к основной базе, другой поток исключил реплику
+        evict(replica_app)
+        return db.session.execute(text('SELECT * FROM missing_table')).all()
+
+    with replica_app.app_context():
+        with pytest.raises(OperationalError):
+            replica_router.run_read_only(db.session, read)
+    assert len(calls) == 1
+
+def test_failed_read_is_not_retried_over_flushed_writes(replica_app):
+    calls = []
+
+    def read():
+        calls.append(1)
+        if len(calls) == 1 or db.session.info.get('uncommitted_writes'):
+            db.session.info['bound_replica'] = 'replica_1'
+            evict(replica_app)
+            raise OperationalError('SELECT 1', {}, Exception('connection lost'))
+        return 'primary'
+
+    with replica_app.app_context():
+        db.session.add(Category(name='Дизайн'))
+        db.session.flush()
+        with pytest.raises(OperationalError):
+            replica_router.run_read_only(db.session, read)
+        assert len(calls) == 1
+        # Откатом записи не потеряны
+        assert db.session.execute(db.select(Category.name).order_by(Category.id)).scalars().all() == \
+            ['Программирование', 'Дизайн']
+        db.session.commit()
+
+    calls.clear()
+    with replica_app.app_context():
+        # Без незафиксированных записей чтение повторяется на основной базе
+        assert replica_router.run_read_only(db.session, read) == 'primary'
+        assert len(calls) == 2
@@ -1,66 +1,9 @@
 import pytest
-from app.repositories import ReviewRepository, CourseRepository
-from app.models import db, User, Course, Review
+from app.repositories import ReviewRepository, CourseRepository, CategoryRepository, CursorMismatch
+from app.models import db, User, Course, Review, Category
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.orm import joinedload
 
-def test_add_review(app, test_data):
-    with app.app_context():
-        review_repo = ReviewRepository(db)
-        course_repo = CourseRepository(db)
-
-        course = db.session.get(Course, test_data['courses']['Python для начинающих'].id)
-        user = db.session.get(User, test_data['users']['ivan'].id)
-
-        initial_rating_sum = course.rating_sum
-        initial_rating_num = course.rating_num
-
-        new_review = review_repo.add_review(course.id, user.id, 5, 'Это супер курс, мне очень понравилось!')
-        course_repo.update_course_rating(course.id, None, 5)
-
-        assert new_review is not None
-        assert new_review.course_id == course.id
-        assert new_review.user_id == user.id
-        assert new_review.rating == 5
-        assert new_review.text == 'Это супер курс, мне очень понравилось!'
-
-        updated_course = db.session.get(Course, course.id)
-        assert updated_course.rating_sum == initial_rating_sum + 5
-
-def test_update_review(app, test_data):
-    with app.app_context():
-        review_repo = ReviewRepository(db)
-        course_repo = CourseRepository(db)
-
-        course_fixture_id = test_data['courses']['Python для начинающих'].id
-        user_fixture_id = test_data['users']['petr'].id
-
-        existing_review = db.session.execute(
-            db.select(Review)
-            .filter_by(user_id=user_fixture_id, course_id=course_fixture_id)
-
-            .options(joinedload(Review.course), joinedload(Review.user))
-        ).scalar_one_or_none()
-
-        assert existing_review is not None, "Тестовый отзыв не найден в фикстуре!"
-
-        course = db.session.get(Course, existing_review.course_id)
-
-        old_rating = existing_review.rating
-        initial_rating_sum = course.rating_sum
-        initial_rating_num = course.rating_num
-
-        updated_review = review_repo.update_review(existing_review.id, 3, 'Передумал, так себе курс.')
-        course_repo.update_course_rating(course.id, old_rating, 3)
-
-        assert updated_review is not None
-        assert updated_review.id == existing_review.id
-        assert updated_review.rating == 3
-        assert updated_review.text == 'Передумал, так себе курс.'
-
-        updated_course = db.session.get(Course, course.id)
-        assert updated_course.rating_sum == initial_rating_sum - old_rating + 3
-        assert updated_course.rating_num == initial_rating_num
-
 def test_get_review_by_user_and_course(app, test_data):
     with app.app_context():
         review_repo = ReviewRepository(db)
@@ -123,4 +66,230 @@ def test_get_paginated_reviews_for_course(app, test_data):
 
         assert reviews_negative[0].user.login == 'ivan'
         assert reviews_negative[1].user.login == 'anna'
-        assert reviews_negative[2].user.login == 'petr'
\ No newline at end of file
+        assert reviews_negative[2].user.login == 'petr'
+
+@pytest.mark.parametrize('sort_by, key', [
+    ('newest', lambda r: (-r.created_at.timestamp(), -r.id)),
+    ('positive', lambda r: (-r.rating, -r.created_at.timestamp(), -r.id)),
+    ('negative', lambda r: (r.rating, -r.created_at.timestamp(), -r.id)),
+])
+def test_get_reviews_page_after_walks_all_reviews(app, test_data, sort_by, key):
+    with app.app_context():
+        review_repo = ReviewRepository(db)
+        course = db.session.get(Course, test_data['courses']['Python для начинающих'].id)
+        expected = [r.id for r in sorted(course.reviews, key=key)]
+
+        seen = []
+        cursor = None
+        while True:
+            page = review_repo.get_reviews_page_after(course.id, per_page=2, sort_by=sort_by, cursor=cursor)
+            seen.extend(r.id for r in page.items)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+
+        assert seen == expected
+
+def test_get_reviews_page_after_ignores_broken_cursor(app, test_data):
+    with app.app_context():
+        review_repo = ReviewRepository(db)
+        course_id = test_data['courses']['Python для начинающих'].id
+
+        page = review_repo.get_reviews_page_after(course_id, per_page=10, cursor='not-a-cursor')
+        assert len(page.items) == 3
+        assert page.next_cursor is None
+
+def test_get_reviews_page_after_rejects_cursor_of_other_sort(app, test_data):
+    with app.app_context():
+        review_repo = ReviewRepository(db)
+        course_id = test_data['courses']['Python для начинающих'].id
+
+        cursor = review_repo.get_reviews_page_after(course_id, per_page=1, sort_by='newest').next_cursor
+        with pytest.raises(CursorMismatch):
+            review_repo.get_reviews_page_after(course_id, per_page=1, sort_by='negative', cursor=cursor)
+
+def test_second_review_by_same_user_is_rejected(app, test_data):
+    with app.app_context():
+        course_id = test_data['courses']['Python для начинающих'].id
+        user_id = test_data['users']['petr'].id
+
+        db.session.add(Review(course_id=course_id, user_id=user_id, rating=1,
+                              text='Повторный отзыв того же пользователя.'))
+        with pytest.raises(IntegrityError):
+            db.session.flush()
+
+def test_upsert_review_creates_review_and_updates_rating(app, test_data):
+    with app.app_context():
+        review_repo = ReviewRepository(db)
+        course_id = test_data['courses']['Основы веб-дизайна'].id
+        user_id = test_data['users']['anna'].id
+
+        review, created = review_repo.upsert_review(course_id, user_id, 4, 'Полезный курс по дизайну.')
+
+        assert created
+        assert review.id is not None
+        course = db.session.get(Course, course_id)
+        assert course.rating_sum == 4
+        assert course.rating_num == 1
+
+def test_upsert_review_updates_existing_review_with_delta(app, test_data):
+    with app.app_context():
+        review_repo = ReviewRepository(db)
+        course_id = test_data['courses']['Python для начинающих'].id
+        user_id = test_data['users']['petr'].id
+        course = db.session.get(Course, course_id)
+        initial_rating_sum, initial_rating_num = course.rating_sum, course.rating_num
+
+        review, created = review_repo.upsert_review(course_id, user_id, 1, 'Передумал, так себе курс.')
+
+        assert not created
+        assert review.rating == 1
+        assert review.text == 'Передумал, так себе курс.'
+        db.session.refresh(course)
+        assert course.rating_sum == initial_rating_sum - 4
+        assert course.rating_num == initial_rating_num
+        assert db.session.execute(
+            db.select(db.func.count(Review.id)).filter_by(course_id=course_id, user_id=user_id)
+        ).scalar() == 1
+
+def test_upsert_review_for_missing_course(app, test_data):
+    with app.app_context():
+        review_repo = ReviewRepository(db)
+        user_id = test_data['users']['petr'].id
+
+        review, created = review_repo.upsert_review(9999, user_id, 5, 'Отзыв на несуществующий курс.')
+
+        assert review is None
+        assert not created
+        assert db.session.execute(db.select(db.func.count(Review.id)).filter_by(course_id=9999)).scalar() == 0
+
+class DriverError(Exception):
+    def __init__(self, errno):
+        super().__init__(errno, 'driver error')
+        self.errno = errno
+
+def failing_upsert(review_repo, error, times):
+    # Первые times вызовов падают с error, дальше -- настоящая запись
+    original = review_repo._upsert_review
+    calls = []
+
+    def upsert(*args):
+        calls.append(args)
+        if len(calls) <= times:
+            raise error
+        return original(*args)
+    review_repo._upsert_review = upsert
+    return calls
+
+@pytest.mark.parametrize('errno', [1213, 1205], ids=['deadlock', 'lock-wait-timeout'])
+def test_upsert_review_retries_lock_conflicts(app, test_data, errno):
+    with app.app_context():
+        review_repo = ReviewRepository(db)
+        course_id = test_data['courses']['Основы веб-дизайна'].id
+        calls = failing_upsert(review_repo, OperationalError('SELECT', {}, DriverError(errno)), times=1)
+
+        review, created = review_repo.upsert_review(course_id, test_data['users']['anna'].id, 4,
+                                                    'Полезный курс по дизайну.')
+
+        assert created
+        assert len(calls) == 2
+        assert db.session.get(Course, course_id).rating_num == 1
+
+def test_upsert_review_does_not_retry_other_operational_errors(app, test_data):
+    with app.app_context():
+        review_repo = ReviewRepository(db)
+        course_id = test_data['courses']['Основы веб-дизайна'].id
+        calls = failing_upsert(review_repo, OperationalError('SELECT', {}, DriverError(2013)), times=1)
+
+        with pytest.raises(OperationalError):
+            review_repo.upsert_review(course_id, test_data['users']['anna'].id, 4, 'Полезный курс по дизайну.')
+        assert len(calls) == 1
+
+def test_upsert_review_maps_foreign_key_violation_to_missing_course(app, test_data):
+    with app.app_context():
+        review_repo = ReviewRepository(db)
+        calls = failing_upsert(review_repo, IntegrityError('INSERT', {}, DriverError(1452)), times=3)
+
+        assert review_repo.upsert_review(9999, test_data['users']['anna'].id, 4, 'Курса нет.') == (None, False)
+        assert len(calls) == 1
+
+def test_review_stats_are_maintained_on_writes(app, test_data):
+    with app.app_context():
+        review_repo = ReviewRepository(db)
+        course_id = test_data['courses']['Основы веб-дизайна'].id
+
+        stats = review_repo.get_review_stats(course_id)
+        assert stats.total == 0
+        assert stats.last_review_at is None
+
+        review, _ = review_repo.upsert_review(course_id, test_data['users']['anna'].id, 4, 'Полезный курс по дизайну.')
+        review_repo.upsert_review(course_id, test_data['users']['petr'].id, 4, 'Тоже понравился этот курс.')
+        review_repo.upsert_review(course_id, test_data['users']['anna'].id, 2, 'Передумала, курс так себе.')
+
+        stats = review_repo.get_review_stats(course_id)
+        assert stats.total == 2
+        assert stats.count(4) == 1
+        assert stats.count(2) == 1
+        assert stats.last_review_at is not None
+        assert stats.histogram == [(5, 0), (4, 1), (3, 0), (2, 1), (1, 0), (0, 0)]
+
+def test_review_stats_are_rebuilt_for_existing_reviews(app, test_data):
+    with app.app_context():
+        review_repo = ReviewRepository(db)
+        course_id = test_data['courses']['Python для начинающих'].id
+
+        review_repo.upsert_review(course_id, test_data['users']['petr'].id, 3, 'Передумал, так себе курс.')
+
+        stats = review_repo.get_review_stats(course_id)
+        assert stats.total == 3
+        assert [stats.count(rating) for rating in range(6)] == [0, 0, 1, 1, 1, 0]
+
+def add_subcategories(test_data):
+    programming = test_data['categories']['Программирование']
+    web = Category(name='Веб-разработка', parent_id=programming.id)
+    db.session.add(web)
+    db.session.flush()
+    backend = Category(name='Бэкенд', parent_id=web.id)
+    db.session.add(backend)
+    db.session.commit()
+    return programming, web, backend
+
+def test_category_tree_order_and_closure(app, test_data):
+    with app.app_context():
+        programming, web, backend = add_subcategories(test_data)
+        design = test_data['categories']['Дизайн']
+
+        tree = CategoryRepository(db).get_category_tree()
+
+        assert [(c.name, c.depth) for c in tree] == [
+            ('Дизайн', 0), ('Программирование', 0), ('Веб-разработка', 1), ('Бэкенд', 2)]
+        assert tree.expand([str(programming.id)]) == sorted([programming.id, web.id, backend.id])
+        assert tree.expand([web.id, design.id]) == sorted([web.id, backend.id, design.id])
+        assert tree.expand(['not-a-number']) == []
+        assert [c.name for c in tree.path(backend.id)] == ['Программирование', 'Веб-разработка']
+
+def test_category_tree_survives_cycles(app, test_data):
+    with app.app_context():
+        programming, web, backend = add_subcategories(test_data)
+        db.session.get(Category, programming.id).parent_id = backend.id
+        db.session.commit()
+
+        tree = CategoryRepository(db).get_category_tree()
+
+        assert len(tree) == 4
+        assert [(c.name, c.depth) for c in tree][1:] == [
+            ('Бэкенд', 0), ('Программирование', 1), ('Веб-разработка', 2)]
+        assert tree.expand([web.id]) == [web.id]
+
+def test_course_filter_includes_subcategories(app, test_data):
+    with app.app_context():
+        programming, web, backend = add_subcategories(test_data)
+        course_repo = CourseRepository(db)
+        course = db.session.get(Course, test_data['courses']['Основы веб-дизайна'].id)
+        course.category_id = backend.id
+        db.session.commit()
+
+        tree = CategoryRepository(db).get_category_tree()
+        courses = course_repo.get_all_courses(category_ids=tree.expand([programming.id]))
+
+        assert sorted(c.name for c in courses) == ['Python для начинающих', 'Основы веб-дизайна']
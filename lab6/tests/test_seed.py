@@ -0,0 +1,63 @@
+import os
+import random
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models import db, Course, CourseReviewStats, Image, Review, User
+from app.seed import Seeder, placeholder_png, review_counts
+
+
+def test_review_counts_are_skewed():
+    counts = review_counts(random.Random(1), 1000, 50, 1000)
+
+    assert sum(counts) == 1000
+    # Самый популярный курс заметно выше среднего
+    assert max(counts) > 2 * 1000 / 50
+
+def test_review_counts_respect_user_limit():
+    counts = review_counts(random.Random(1), 1000, 50, 30)
+
+    assert sum(counts) == 1000
+    assert max(counts) == 30
+
+def test_review_counts_capped_by_possible_pairs():
+    assert sum(review_counts(random.Random(1), 1000, 3, 5)) == 15
+
+def test_placeholder_png():
+    data = placeholder_png(4, 3, (255, 0, 0))
+    assert data.startswith(b'\x89PNG\r\n\x1a\n')
+    assert data != placeholder_png(4, 3, (0, 255, 0))
+
+def test_seed_builds_consistent_aggregates(app):
+    with app.app_context():
+        seeder = Seeder(db, seed=3, batch_size=7)
+        category_ids = seeder.seed_categories()
+        seeder.seed_users(20)
+        image_ids = seeder.seed_images(3, width=8, height=8)
+        user_ids = seeder.get_user_ids()
+
+        written = seeder.seed_courses(15, 120, user_ids, category_ids, image_ids)
+
+        assert written == 120
+        assert db.session.execute(select(func.count(User.id))).scalar() == 23
+        assert db.session.execute(select(func.count(Course.id))).scalar() == 17
+        for image in db.session.execute(select(Image).filter(Image.id.in_(image_ids))).scalars():
+            assert os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], image.storage_filename))
+
+        seeded = db.session.execute(select(Course).filter(Course.rating_num > 0, Course.id > 2)).scalars().all()
+        assert sum(course.rating_num for course in seeded) == 120
+        for course in seeded:
+            ratings = db.session.execute(select(Review.rating).filter_by(course_id=course.id)).scalars().all()
+            assert course.rating_sum == sum(ratings)
+            assert course.rating_num == len(ratings)
+            stats = db.session.get(CourseReviewStats, course.id)
+            assert stats.total == len(ratings)
+            assert [stats.count(r) for r in range(6)] == [ratings.count(r) for r in range(6)]
+
+def test_seed_command(runner, app):
+    result = runner.invoke(args=['seed', '--users', '5', '--courses', '4', '--reviews', '10',
+                                 '--images', '1', '--seed', '1'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Added 4 courses and 10 reviews' in result.output
@@ -0,0 +1,115 @@
+"""Статика с хешем содержимого в имени файла.
+
+Сборка копий с хешем и манифеста (запускать из корня репозитория после
+изменения файлов в lab*/app/static, затем python -m root_app.compression):
+
+    python -m root_app.assets
+
+Копии лежат в static/dist/, манифест static/dist/manifest.json сопоставляет
+исходное имя файла с именем копии. Без манифеста url_for('static', ...)
+выдает обычные адреса.
+"""
+import glob
+import hashlib
+import json
+import os
+import sys
+
+from flask import request
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+SKIP_SUFFIXES = ('.gz', '.br')
+
+
+def hashed_name(filename, data):
+    base, ext = os.path.splitext(filename)
+    return f'{base}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def _relative(path, directory):
+    return os.path.relpath(path, directory).replace(os.sep, '/')
+
+
+def build(static_folder):
+    dist = os.path.join(static_folder, DIST)
+    manifest = {}
+    for path in sorted(glob.glob(os.path.join(static_folder, '**', '*'), recursive=True)):
+        filename = _relative(path, static_folder)
+        if not os.path.isfile(path) or filename.startswith(DIST + '/') or filename.endswith(SKIP_SUFFIXES):
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        target_name = hashed_name(filename, data)
+        target = os.path.join(dist, target_name)
+        # Имя зависит только от содержимого: уже собранную копию не переписываем
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+        manifest[filename] = f'{DIST}/{target_name}'
+
+    # Копии прежних версий файлов и их сжатые варианты больше не нужны
+    current = set(manifest.values())
+    for path in glob.glob(os.path.join(dist, '**', '*'), recursive=True):
+        filename = f'{DIST}/{_relative(path, dist)}'
+        for suffix in SKIP_SUFFIXES:
+            filename = filename.removesuffix(suffix)
+        if os.path.isfile(path) and filename != f'{DIST}/{MANIFEST}' and filename not in current:
+            os.remove(path)
+
+    manifest_path = os.path.join(dist, MANIFEST)
+    os.makedirs(dist, exist_ok=True)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def install(flask_app):
+    if not flask_app.static_folder:
+        return
+    manifest = load_manifest(flask_app.static_folder)
+    if not manifest:
+        return
+    hashed = set(manifest.values())
+
+    @flask_app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    @flask_app.after_request
+    def cache_hashed_static(response):
+        # Содержимое по такому адресу не меняется никогда: браузер не
+        # перепроверяет файл, пока не истечет год
+        if request.endpoint == 'static' and (request.view_args or {}).get('filename') in hashed \
+                and response.status_code in (200, 304):
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
+
+
+def main(argv=None):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    directories = (argv if argv else None) or sorted(glob.glob(os.path.join(root, 'lab*', 'app', 'static')))
+    for directory in directories:
+        manifest = build(directory)
+        print(f'{directory}: {len(manifest)} files')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
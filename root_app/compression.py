@@ -0,0 +1,289 @@
+"""Сжатие ответов gzip/brotli для объединенного приложения.
+
+Предварительное сжатие статики (запускать из корня репозитория после
+изменения файлов в lab*/app/static):
+
+    python -m root_app.compression
+"""
+import glob
+import gzip
+import itertools
+import os
+import sys
+import time
+import zlib
+
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml',
+    'image/svg+xml',
+)
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.html', '.txt', '.xml', '.csv', '.map')
+
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def supported_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding):
+    accept = parse_accept_header(accept_encoding)
+    best, best_quality = None, 0
+    for encoding in supported_encodings():
+        quality = accept.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type):
+    content_type = (content_type or '').split(';', 1)[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class _Compressor:
+    # Сброс буфера сжатия после каждого блока раздувает вывод и дробит его на
+    # мелкие записи. Сбрасываем, когда накопилось flush_size несжатых байт или
+    # с прошлого сброса прошло flush_interval секунд: медленный поток все равно
+    # доходит до клиента, а быстрый сжимается крупными блоками
+    def __init__(self, encoding, level, flush_size, flush_interval):
+        self.encoding = encoding
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=level['br'])
+        else:
+            self._zlib = zlib.compressobj(level['gzip'], zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        self._pending += len(chunk)
+        now = time.monotonic()
+        flush = self._pending >= self.flush_size or now - self._flushed_at >= self.flush_interval
+        if flush:
+            self._pending, self._flushed_at = 0, now
+        if self.encoding == 'br':
+            return self._brotli.process(chunk) + (self._brotli.flush() if flush else b'')
+        return self._zlib.compress(chunk) + (self._zlib.flush(zlib.Z_SYNC_FLUSH) if flush else b'')
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, static_dirs=None, min_size=1024, gzip_level=6, brotli_quality=4,
+                 flush_size=16 * 1024, flush_interval=1.0):
+        self.app = app
+        # Префикс URL статики -> каталог на диске, например '/lab1/static/' -> 'lab1/app/static'
+        self.static_dirs = sorted((static_dirs or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.min_size = min_size
+        self.level = {'gzip': gzip_level, 'br': brotli_quality}
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.app(environ, start_response)
+
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        path = environ.get('SCRIPT_NAME', '') + environ.get('PATH_INFO', '')
+        precompressed = self._precompressed_file(path, encoding) if encoding else None
+        decision = {}
+
+        def _start_response(status, headers, exc_info=None):
+            headers = list(headers)
+            decision['mode'] = mode = self._mode(status, headers, precompressed) if encoding else None
+            if mode is not None:
+                headers = [(name, value) for name, value in headers
+                           if name.lower() not in ('content-length', 'content-encoding')]
+                headers = [(name, self._weak_etag(value) if name.lower() == 'etag' else value)
+                           for name, value in headers]
+                self._add_vary(headers)
+                headers.append(('Content-Encoding', encoding))
+                if mode == 'precompressed':
+                    headers.append(('Content-Length', str(os.path.getsize(precompressed))))
+            elif is_compressible(_header(headers, 'content-type')):
+                self._add_vary(headers)
+            return start_response(status, headers, exc_info)
+
+        iterable = self.app(environ, _start_response)
+        if 'mode' not in decision:
+            # Приложение-генератор вызывает start_response только при первой итерации
+            return _DeferredIterable(iterable, decision, lambda chunks: self._wrap(
+                chunks, decision.get('mode'), encoding, precompressed))
+        return self._wrap(iterable, decision['mode'], encoding, precompressed)
+
+    def _wrap(self, iterable, mode, encoding, precompressed):
+        if mode == 'precompressed':
+            return _PrecompressedIterable(iterable, precompressed)
+        if mode == 'compress':
+            compressor = _Compressor(encoding, self.level, self.flush_size, self.flush_interval)
+            return _CompressedIterable(iterable, compressor)
+        return iterable
+
+    def _mode(self, status, headers, precompressed):
+        code = int(status.split(' ', 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return None
+        if _header(headers, 'content-encoding') or 'no-transform' in (_header(headers, 'cache-control') or ''):
+            return None
+        if precompressed is not None and code == 200:
+            return 'precompressed'
+        if not is_compressible(_header(headers, 'content-type')):
+            return None
+        length = _header(headers, 'content-length')
+        # Без Content-Length ответ потоковый: сжимаем его по мере генерации
+        if length is not None and int(length) < self.min_size:
+            return None
+        return 'compress'
+
+    def _precompressed_file(self, path, encoding):
+        for prefix, directory in self.static_dirs:
+            if not path.startswith(prefix):
+                continue
+            original = os.path.normpath(os.path.join(directory, path[len(prefix):]))
+            if not original.startswith(os.path.normpath(directory) + os.sep):
+                return None
+            candidate = original + PRECOMPRESSED_SUFFIXES[encoding]
+            try:
+                # Устаревший сжатый файл (исходник изменен позже) не отдаем
+                if os.path.getmtime(candidate) >= os.path.getmtime(original):
+                    return candidate
+            except OSError:
+                pass
+            return None
+        return None
+
+    @staticmethod
+    def _weak_etag(value):
+        # Сжатое представление не совпадает побайтно с исходным, поэтому ETag слабый
+        return value if value.startswith('W/') else 'W/' + value
+
+    @staticmethod
+    def _add_vary(headers):
+        for i, (name, value) in enumerate(headers):
+            if name.lower() == 'vary':
+                if 'accept-encoding' not in value.lower():
+                    headers[i] = (name, value + ', Accept-Encoding')
+                return
+        headers.append(('Vary', 'Accept-Encoding'))
+
+
+def _header(headers, name):
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class _DeferredIterable:
+    # Режим известен, как только приложение вызвало start_response: не позже
+    # первого непустого блока или конца ответа. Прочитанные до этого блоки
+    # отдаются обработчику выбранного режима вместе с остальными
+    def __init__(self, iterable, decision, wrap):
+        self._iterable = iterable
+        self._decision = decision
+        self._wrap = wrap
+
+    def __iter__(self):
+        chunks = iter(self._iterable)
+        head = []
+        for chunk in chunks:
+            head.append(chunk)
+            if 'mode' in self._decision:
+                break
+        yield from self._wrap(itertools.chain(head, chunks))
+
+    def close(self):
+        if hasattr(self._iterable, 'close'):
+            self._iterable.close()
+
+
+class _CompressedIterable:
+    def __init__(self, iterable, compressor):
+        self._iterable = iterable
+        self._compressor = compressor
+
+    def __iter__(self):
+        for chunk in self._iterable:
+            if chunk:
+                data = self._compressor.compress(chunk)
+                if data:
+                    yield data
+        yield self._compressor.finish()
+
+    def close(self):
+        if hasattr(self._iterable, 'close'):
+            self._iterable.close()
+
+
+class _PrecompressedIterable:
+    block_size = 64 * 1024
+
+    def __init__(self, iterable, path):
+        self._iterable = iterable
+        self._path = path
+
+    def __iter__(self):
+        with open(self._path, 'rb') as f:
+            while True:
+                block = f.read(self.block_size)
+                if not block:
+                    break
+                yield block
+
+    def close(self):
+        if hasattr(self._iterable, 'close'):
+            self._iterable.close()
+
+
+def precompress(directories, min_size=256):
+    written = 0
+    for directory in directories:
+        for path in glob.glob(os.path.join(directory, '**', '*'), recursive=True):
+            if not os.path.isfile(path) or not path.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+
+            outputs = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                outputs['.br'] = brotli.compress(data, quality=11)
+            for suffix, compressed in outputs.items():
+                target = path + suffix
+                if len(compressed) >= len(data):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(compressed)
+                written += 1
+                print(f'{target}: {len(data)} -> {len(compressed)} bytes')
+    return written
+
+
+def main(argv=None):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    directories = (argv if argv else None) or sorted(glob.glob(os.path.join(root, 'lab*', 'app', 'static')))
+    if brotli is None:
+        print('brotli is not installed, writing only .gz files')
+    written = precompress(directories)
+    print(f'{written} files written')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
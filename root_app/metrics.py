@@ -0,0 +1,244 @@
+import atexit
+import glob
+import hmac
+import json
+import os
+import time
+from bisect import bisect_left
+from threading import Lock
+
+from flask import request
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ENDPOINT_ENVIRON_KEY = 'metrics.endpoint'
+
+# Сумма счетчиков завершившихся воркеров
+ARCHIVE_FILE = 'metrics_archive.json'
+
+# Без METRICS_TOKEN метрики отдаются только запросам с этой же машины;
+# за обратным прокси все запросы приходят с localhost, там нужен токен
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+
+def instrument(flask_app):
+    @flask_app.before_request
+    def remember_endpoint():
+        request.environ[ENDPOINT_ENVIRON_KEY] = request.endpoint or 'unknown'
+
+
+class MetricsMiddleware:
+    def __init__(self, app, mounts, metrics_path='/metrics', multiprocess_dir=None, flush_interval=5.0,
+                 token=None):
+        self.app = app
+        # Длинные префиксы проверяются первыми, иначе '/lab1' поглотит '/lab10'
+        self.mounts = sorted(mounts, key=len, reverse=True)
+        self.metrics_path = metrics_path
+        self.multiprocess_dir = multiprocess_dir or os.environ.get('METRICS_MULTIPROC_DIR')
+        self.flush_interval = flush_interval
+        self.token = token or os.environ.get('METRICS_TOKEN')
+
+        self._lock = Lock()
+        self._histograms = {}
+        self._response_bytes = {}
+        self._responses = {}
+        self._in_flight = {}
+        self._last_flush = 0.0
+
+        if self.multiprocess_dir:
+            os.makedirs(self.multiprocess_dir, exist_ok=True)
+            atexit.register(self.flush)
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path == self.metrics_path:
+            if not self._authorized(environ):
+                start_response('403 Forbidden', [('Content-Type', 'text/plain; charset=utf-8'),
+                                                 ('Content-Length', '9')])
+                return [b'Forbidden']
+            body = self.render().encode('utf-8')
+            start_response('200 OK', [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+                                      ('Content-Length', str(len(body)))])
+            return [body]
+
+        mount = self._mount_for(path)
+        started = time.perf_counter()
+        status = {}
+
+        def _start_response(status_line, headers, exc_info=None):
+            status['code'] = status_line.split(' ', 1)[0]
+            return start_response(status_line, headers, exc_info)
+
+        with self._lock:
+            self._in_flight[mount] = self._in_flight.get(mount, 0) + 1
+        try:
+            iterable = self.app(environ, _start_response)
+        except Exception:
+            self._finish(environ, mount, started, '500', 0)
+            raise
+        return _MeteredIterable(iterable, lambda size: self._finish(
+            environ, mount, started, status.get('code', '500'), size))
+
+    def _authorized(self, environ):
+        if not self.token:
+            return environ.get('REMOTE_ADDR') in LOCAL_ADDRESSES
+        scheme, _, credentials = environ.get('HTTP_AUTHORIZATION', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(credentials.encode(), self.token.encode())
+
+    def _mount_for(self, path):
+        for mount in self.mounts:
+            if path == mount or path.startswith(mount + '/'):
+                return mount
+        return '/'
+
+    def _finish(self, environ, mount, started, status, size):
+        elapsed = time.perf_counter() - started
+        key = (mount, environ.get(ENDPOINT_ENVIRON_KEY, 'unknown'))
+        bucket = bisect_left(BUCKETS, elapsed)
+
+        with self._lock:
+            self._in_flight[mount] -= 1
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0}
+            histogram['buckets'][bucket] += 1
+            histogram['sum'] += elapsed
+            self._response_bytes[mount] = self._response_bytes.get(mount, 0) + size
+            status_key = (mount, status)
+            self._responses[status_key] = self._responses.get(status_key, 0) + 1
+
+        if self.multiprocess_dir and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _state(self):
+        with self._lock:
+            return {
+                'histograms': {'\t'.join(key): {'buckets': list(value['buckets']), 'sum': value['sum']}
+                               for key, value in self._histograms.items()},
+                'response_bytes': dict(self._response_bytes),
+                'responses': {'\t'.join(key): value for key, value in self._responses.items()},
+                'in_flight': dict(self._in_flight),
+            }
+
+    def _state_file(self, pid=None):
+        return os.path.join(self.multiprocess_dir, f'metrics_{pid or os.getpid()}.json')
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        _write_state(self._state_file(), self._state())
+
+    def mark_process_dead(self, pid):
+        mark_process_dead(pid, self.multiprocess_dir)
+
+    def collect(self):
+        if not self.multiprocess_dir:
+            return self._state()
+
+        self.flush()
+        merged = _empty_state()
+        for path in glob.glob(os.path.join(self.multiprocess_dir, 'metrics_*.json')):
+            try:
+                state = _read_state(path)
+            except (OSError, ValueError):
+                continue
+            _merge_state(merged, state)
+        return merged
+
+    def render(self):
+        state = self.collect()
+        lines = ['# TYPE http_request_duration_seconds histogram']
+        for key, histogram in sorted(state['histograms'].items()):
+            mount, endpoint = key.split('\t')
+            labels = f'mount="{mount}",endpoint="{endpoint}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), histogram['buckets']):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {histogram["sum"]}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+        lines.append('# TYPE http_responses_total counter')
+        for key, count in sorted(state['responses'].items()):
+            mount, status = key.split('\t')
+            lines.append(f'http_responses_total{{mount="{mount}",status="{status}"}} {count}')
+
+        lines.append('# TYPE http_response_size_bytes_total counter')
+        for mount, size in sorted(state['response_bytes'].items()):
+            lines.append(f'http_response_size_bytes_total{{mount="{mount}"}} {size}')
+
+        lines.append('# TYPE http_requests_in_flight gauge')
+        for mount, count in sorted(state['in_flight'].items()):
+            lines.append(f'http_requests_in_flight{{mount="{mount}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _empty_state():
+    return {'histograms': {}, 'response_bytes': {}, 'responses': {}, 'in_flight': {}}
+
+
+def _read_state(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_state(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _merge_state(target, state):
+    for key, value in state['histograms'].items():
+        histogram = target['histograms'].setdefault(key, {'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0})
+        histogram['buckets'] = [a + b for a, b in zip(histogram['buckets'], value['buckets'])]
+        histogram['sum'] += value['sum']
+    for field in ('response_bytes', 'responses', 'in_flight'):
+        for key, value in state[field].items():
+            target[field][key] = target[field].get(key, 0) + value
+
+
+def mark_process_dead(pid, multiprocess_dir=None):
+    """Убирает файл завершившегося воркера. Вызывается в мастере gunicorn (child_exit)."""
+    multiprocess_dir = multiprocess_dir or os.environ.get('METRICS_MULTIPROC_DIR')
+    if not multiprocess_dir:
+        return
+    path = os.path.join(multiprocess_dir, f'metrics_{pid}.json')
+    try:
+        state = _read_state(path)
+    except (OSError, ValueError):
+        return
+    # Счетчики воркера переносятся в общий архив, чтобы суммы не уменьшались,
+    # а его запросы больше не "в полете"
+    archive_path = os.path.join(multiprocess_dir, ARCHIVE_FILE)
+    try:
+        archive = _read_state(archive_path)
+    except (OSError, ValueError):
+        archive = _empty_state()
+    state['in_flight'] = {}
+    _merge_state(archive, state)
+    _write_state(archive_path, archive)
+    os.remove(path)
+
+
+class _MeteredIterable:
+    def __init__(self, iterable, on_close):
+        self._iterable = iterable
+        self._on_close = on_close
+        self._size = 0
+        self._closed = False
+
+    def __iter__(self):
+        for chunk in self._iterable:
+            self._size += len(chunk)
+            yield chunk
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if hasattr(self._iterable, 'close'):
+                self._iterable.close()
+        finally:
+            self._on_close(self._size)
@@ -0,0 +1,238 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import request
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.rotate = False
+        # Пользователь на момент загрузки: при входе и выходе меняется идентификатор
+        self.loaded_user_id = dict.get(self, '_user_id')
+
+    def regenerate(self):
+        """Выдать новый идентификатор в конце запроса (например, после смены прав)."""
+        self.rotate = True
+        self.modified = True
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+# Сериализация та же, что у cookie-сессий Flask: JSON с тегами сохраняет
+# кортежи сообщений flash, bytes и datetime. Запись, которую не удалось
+# разобрать, считается отсутствующей.
+serializer = TaggedJSONSerializer()
+
+def dumps(data):
+    return serializer.dumps(dict(data))
+
+def loads(raw):
+    return serializer.loads(raw)
+
+
+class MemoryStore:
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            raw, expires = entry
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return raw, expires
+
+    def set(self, key, raw, expires):
+        with self._lock:
+            self._entries[key] = (raw, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def touch(self, key, expires):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], expires)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteStore:
+    # Один файл на все воркеры gunicorn; соединение у каждого потока свое и
+    # открывается при первом обращении, поэтому мастер с preload_app не
+    # передает воркерам открытых соединений
+    PURGE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._ready = False
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            if not self._ready:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            if not self._ready:
+                connection.execute('CREATE TABLE IF NOT EXISTS sessions '
+                                   '(id TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)')
+                self._ready = True
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT data, expires FROM sessions WHERE id = ? AND expires >= ?', (key, time.time())).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key, raw, expires):
+        connection = self._connect()
+        connection.execute('INSERT OR REPLACE INTO sessions (id, data, expires) VALUES (?, ?, ?)',
+                           (key, raw, expires))
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            connection.execute('DELETE FROM sessions WHERE expires < ?', (time.time(),))
+
+    def touch(self, key, expires):
+        self._connect().execute('UPDATE sessions SET expires = ? WHERE id = ?', (expires, key))
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM sessions WHERE id = ?', (key,))
+
+
+def store_from_environ():
+    backend = os.environ.get('SESSION_BACKEND', 'sqlite')
+    if backend == 'memory':
+        return MemoryStore(int(os.environ.get('SESSION_MEMORY_MAX_ENTRIES', 10000)))
+    if backend == 'sqlite':
+        path = os.environ.get('SESSION_SQLITE_PATH',
+                              os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'sessions.sqlite3'))
+        return SQLiteStore(path)
+    raise ValueError(f'Unknown SESSION_BACKEND: {backend}')
+
+
+class ServerSideSessionInterface(SessionInterface):
+    # Ключ flask_login: вход, выход или смена пользователя получают новый
+    # идентификатор сессии, чтобы подсмотренный до входа нельзя было использовать
+    USER_KEY = '_user_id'
+
+    def __init__(self, store, namespace, ttl=None):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def _key(self, sid):
+        return f'{self.namespace}:{sid}'
+
+    def _ttl(self, app):
+        return self.ttl or app.permanent_session_lifetime.total_seconds()
+
+    def get_cookie_path(self, app):
+        # Приложения смонтированы под разными префиксами: cookie каждого
+        # ограничиваем своим путем, иначе они перетирают друг друга
+        return app.config['SESSION_COOKIE_PATH'] or request.script_root or '/'
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            entry = self.store.get(self._key(sid))
+            if entry is not None:
+                raw, expires = entry
+                try:
+                    data = loads(raw)
+                except ValueError:
+                    data = None
+                if data is not None:
+                    session = ServerSideSession(data, sid=sid)
+                    session.expires = expires
+                    return session
+        return ServerSideSession(sid=self._new_sid(), new=True)
+
+    def _new_sid(self):
+        return secrets.token_urlsafe(32)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if not session.new:
+                self.store.delete(self._key(session.sid))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        rotated = not session.new and (session.rotate or dict.get(session, self.USER_KEY) != session.loaded_user_id)
+        if rotated:
+            self.store.delete(self._key(session.sid))
+            session.sid = self._new_sid()
+
+        ttl = self._ttl(app)
+        now = time.time()
+        if session.modified or session.new or rotated:
+            self.store.set(self._key(session.sid), dumps(session), now + ttl)
+        elif session.expires - now < ttl / 2:
+            # Скользящий срок жизни: продлеваем не чаще, чем раз в полсрока
+            self.store.touch(self._key(session.sid), now + ttl)
+        else:
+            return
+
+        # Идентификатор меняется только при ротации, поэтому cookie без срока
+        # действия достаточно отправить один раз
+        if not (session.new or rotated or session.permanent):
+            return
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def install(flask_app, namespace, store, ttl=None):
+    flask_app.session_interface = ServerSideSessionInterface(store, namespace, ttl)
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+from flask import Flask, url_for
+
+from root_app import assets
+
+
+@pytest.fixture
+def static_folder(tmp_path):
+    folder = tmp_path / 'static'
+    (folder / 'css').mkdir(parents=True)
+    (folder / 'css' / 'style.css').write_text('body { color: red; }')
+    (folder / 'app.js').write_text('console.log(1);')
+    (folder / 'app.js.gz').write_bytes(b'precompressed')
+    return folder
+
+
+def make_app(static_folder):
+    app = Flask(__name__, static_folder=str(static_folder))
+    assets.install(app)
+    return app
+
+
+def test_build_writes_hashed_copies(static_folder):
+    manifest = assets.build(str(static_folder))
+
+    data = (static_folder / 'css' / 'style.css').read_bytes()
+    assert manifest == {
+        'app.js': 'dist/' + assets.hashed_name('app.js', b'console.log(1);'),
+        'css/style.css': 'dist/' + assets.hashed_name('css/style.css', data),
+    }
+    assert (static_folder / manifest['css/style.css']).read_bytes() == data
+    assert assets.load_manifest(str(static_folder)) == manifest
+
+def test_rebuild_removes_stale_copies(static_folder):
+    old = assets.build(str(static_folder))['app.js']
+    (static_folder / 'app.js').write_text('console.log(2);')
+
+    new = assets.build(str(static_folder))['app.js']
+    assert new != old
+    assert not (static_folder / old).exists()
+    assert (static_folder / new).exists()
+
+def test_url_for_returns_fingerprinted_url(static_folder):
+    manifest = assets.build(str(static_folder))
+    app = make_app(static_folder)
+
+    with app.test_request_context():
+        assert url_for('static', filename='css/style.css') == '/static/' + manifest['css/style.css']
+        # Файла нет в манифесте -- обычный адрес
+        assert url_for('static', filename='unknown.css') == '/static/unknown.css'
+
+def test_hashed_path_is_immutable(static_folder):
+    manifest = assets.build(str(static_folder))
+    client = make_app(static_folder).test_client()
+
+    response = client.get('/static/' + manifest['css/style.css'])
+    assert response.status_code == 200
+    assert response.text == 'body { color: red; }'
+    assert response.cache_control.immutable
+    assert response.cache_control.public
+    assert response.cache_control.max_age == assets.IMMUTABLE_MAX_AGE
+    assert not response.cache_control.no_cache
+
+def test_original_path_is_revalidated(static_folder):
+    assets.build(str(static_folder))
+    client = make_app(static_folder).test_client()
+
+    response = client.get('/static/css/style.css')
+    assert response.status_code == 200
+    assert not response.cache_control.immutable
+    assert response.cache_control.max_age != assets.IMMUTABLE_MAX_AGE
+
+def test_unknown_file_falls_back(static_folder):
+    assets.build(str(static_folder))
+    client = make_app(static_folder).test_client()
+
+    response = client.get('/static/missing.css')
+    assert response.status_code == 404
+    assert not response.cache_control.immutable
+
+def test_without_manifest_urls_are_unchanged(static_folder):
+    app = make_app(static_folder)
+
+    assert not os.path.exists(static_folder / assets.DIST)
+    with app.test_request_context():
+        assert url_for('static', filename='css/style.css') == '/static/css/style.css'
+    assert app.test_client().get('/static/css/style.css').status_code == 200
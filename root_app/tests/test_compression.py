@@ -0,0 +1,170 @@
+import gzip
+import zlib
+
+import pytest
+from flask import Flask
+from werkzeug.test import Client
+
+from root_app.compression import CompressionMiddleware, brotli, negotiate
+
+requires_brotli = pytest.mark.skipif(brotli is None, reason='brotli is not installed')
+
+BODY = 'строка для сжатия\n' * 200
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route('/page')
+    def page():
+        return BODY
+
+    @app.route('/small')
+    def small():
+        return 'hello'
+
+    @app.route('/image')
+    def image():
+        return app.response_class(b'\x89PNG' + b'\x00' * 4096, mimetype='image/png')
+
+    @app.route('/encoded')
+    def encoded():
+        return app.response_class(gzip.compress(BODY.encode()), mimetype='text/plain',
+                                  headers={'Content-Encoding': 'gzip'})
+
+    @app.route('/vary')
+    def vary():
+        return app.response_class(BODY, headers={'Vary': 'Cookie', 'ETag': '"abc"'})
+
+    @app.route('/stream')
+    def stream():
+        return app.response_class((f'строка {i}\n' for i in range(500)), mimetype='text/csv')
+
+    return app
+
+
+def get(middleware, path, accept_encoding='gzip, deflate, br'):
+    return Client(middleware).get(path, headers={'Accept-Encoding': accept_encoding}, buffered=True)
+
+
+@pytest.fixture
+def middleware():
+    return CompressionMiddleware(make_app())
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    pytest.param('gzip, deflate, br', 'br', marks=requires_brotli),
+    ('gzip', 'gzip'),
+    ('br;q=0.5, gzip', 'gzip'),
+    ('br;q=0, gzip;q=0', None),
+    ('identity', None),
+    ('', None),
+    pytest.param('*', 'br', marks=requires_brotli),
+    ('*, br;q=0', 'gzip'),
+])
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding) == expected
+
+def test_gzip_response(middleware):
+    response = get(middleware, '/page', 'gzip')
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data).decode() == BODY
+
+@requires_brotli
+def test_brotli_response(middleware):
+    response = get(middleware, '/page')
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(response.data).decode() == BODY
+
+def test_refused_encoding_is_not_compressed(middleware):
+    response = get(middleware, '/page', 'gzip;q=0')
+
+    assert 'Content-Encoding' not in response.headers
+    # Ответ все равно зависит от заголовка, кэши должны это учитывать
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.text == BODY
+
+def test_vary_and_etag_are_extended(middleware):
+    response = get(middleware, '/vary')
+
+    assert response.headers['Vary'] == 'Cookie, Accept-Encoding'
+    assert response.headers['ETag'] == 'W/"abc"'
+
+@pytest.mark.parametrize('path', ['/small', '/image', '/encoded'])
+def test_skipped_responses(middleware, path):
+    plain = Client(make_app()).get(path, buffered=True)
+    response = get(middleware, path)
+
+    assert response.headers.get('Content-Encoding') == plain.headers.get('Content-Encoding')
+    assert response.data == plain.data
+
+def test_head_is_passed_through(middleware):
+    response = Client(middleware).head('/page', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+def test_stream_is_flushed_by_size():
+    middleware = CompressionMiddleware(make_app(), flush_size=1024, flush_interval=3600)
+    response = Client(middleware).get('/stream', headers={'Accept-Encoding': 'gzip'})
+
+    chunks = [chunk for chunk in response.iter_encoded() if chunk]
+    response.close()
+    # Около 6 КБ исходных данных: несколько сбросов по размеру, а не по одному на строку
+    assert 2 < len(chunks) < 20
+    assert gzip.decompress(b''.join(chunks)).decode() == ''.join(f'строка {i}\n' for i in range(500))
+
+def test_stream_chunks_are_decodable_after_each_flush():
+    middleware = CompressionMiddleware(make_app(), flush_size=1024, flush_interval=3600)
+    response = Client(middleware).get('/stream', headers={'Accept-Encoding': 'gzip'})
+
+    decompressor = zlib.decompressobj(31)
+    received = ''
+    for chunk in response.iter_encoded():
+        received += decompressor.decompress(chunk).decode()
+        # После каждого сброса клиент может разобрать все полученное до конца строки
+        assert received == '' or received.endswith('\n')
+    response.close()
+    assert received.count('\n') == 500
+
+@requires_brotli
+def test_stream_is_flushed_by_time():
+    middleware = CompressionMiddleware(make_app(), flush_size=1 << 20, flush_interval=0)
+    response = Client(middleware).get('/stream', headers={'Accept-Encoding': 'br'})
+
+    chunks = [chunk for chunk in response.iter_encoded() if chunk]
+    response.close()
+    assert len(chunks) > 100
+    assert brotli.decompress(b''.join(chunks)).decode().count('\n') == 500
+
+def test_stream_without_threshold_is_sent_at_the_end():
+    middleware = CompressionMiddleware(make_app(), flush_size=1 << 20, flush_interval=3600)
+    response = Client(middleware).get('/stream', headers={'Accept-Encoding': 'gzip'})
+
+    chunks = [chunk for chunk in response.iter_encoded() if chunk]
+    response.close()
+    assert len(chunks) <= 2
+
+def lazy_app(content_type, body):
+    # WSGI-приложение-генератор: start_response вызывается при первой итерации
+    def app(environ, start_response):
+        start_response('200 OK', [('Content-Type', content_type)])
+        yield b''
+        yield body.encode()
+    return app
+
+def test_lazy_start_response_is_compressed():
+    middleware = CompressionMiddleware(lazy_app('text/plain', BODY))
+    response = get(middleware, '/', 'gzip')
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data).decode() == BODY
+
+def test_lazy_start_response_is_skipped_for_binary():
+    middleware = CompressionMiddleware(lazy_app('image/png', BODY))
+    response = get(middleware, '/', 'gzip')
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.text == BODY
@@ -0,0 +1,130 @@
+import os
+
+import pytest
+from flask import Flask
+from werkzeug.test import Client, EnvironBuilder
+
+from root_app import metrics
+from root_app.metrics import MetricsMiddleware
+
+
+LOCAL = {'REMOTE_ADDR': '127.0.0.1'}
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route('/page')
+    def page():
+        return 'hello'
+
+    @app.route('/stream')
+    def stream():
+        return app.response_class((chunk for chunk in ('a', 'bb', 'ccc')))
+
+    metrics.instrument(app)
+    return app
+
+
+@pytest.fixture
+def middleware():
+    return MetricsMiddleware(make_app(), mounts=['/lab1'])
+
+
+def in_flight(middleware, mount='/'):
+    return middleware.collect()['in_flight'].get(mount)
+
+
+def test_buffered_response_is_accounted_on_close(middleware):
+    response = Client(middleware).get('/page', buffered=True)
+
+    assert response.text == 'hello'
+    state = middleware.collect()
+    assert state['in_flight'] == {'/': 0}
+    assert state['responses'] == {'/\t200': 1}
+    assert state['response_bytes'] == {'/': 5}
+    assert sum(state['histograms']['/\tpage']['buckets']) == 1
+
+
+def test_streaming_response_stays_in_flight_until_closed(middleware):
+    environ = EnvironBuilder(path='/stream').get_environ()
+    iterable = middleware(environ, lambda status, headers, exc_info=None: None)
+
+    body = b''.join(iterable)
+    assert body == b'abbccc'
+    assert in_flight(middleware) == 1
+
+    iterable.close()
+    iterable.close()
+    state = middleware.collect()
+    assert state['in_flight'] == {'/': 0}
+    assert state['response_bytes'] == {'/': 6}
+    assert state['responses'] == {'/\t200': 1}
+
+
+def test_unknown_path_is_counted_under_mount(middleware):
+    Client(middleware).get('/lab1/missing', buffered=True)
+
+    assert middleware.collect()['responses'] == {'/lab1\t404': 1}
+
+
+def test_exposition_format(middleware):
+    client = Client(middleware)
+    client.get('/page', buffered=True)
+    response = client.get('/metrics', environ_overrides=LOCAL)
+
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    lines = response.text.splitlines()
+    assert '# TYPE http_request_duration_seconds histogram' in lines
+    assert 'http_request_duration_seconds_bucket{mount="/",endpoint="page",le="+Inf"} 1' in lines
+    assert 'http_request_duration_seconds_count{mount="/",endpoint="page"} 1' in lines
+    assert 'http_responses_total{mount="/",status="200"} 1' in lines
+    assert 'http_response_size_bytes_total{mount="/"} 5' in lines
+    assert 'http_requests_in_flight{mount="/"} 0' in lines
+    buckets = [int(line.rsplit(' ', 1)[1]) for line in lines
+               if line.startswith('http_request_duration_seconds_bucket{mount="/",endpoint="page"')]
+    assert buckets == sorted(buckets)
+    assert len(buckets) == len(metrics.BUCKETS) + 1
+
+
+def test_metrics_without_token_are_local_only(middleware):
+    client = Client(middleware)
+
+    assert client.get('/metrics', environ_overrides=LOCAL).status_code == 200
+    assert client.get('/metrics', environ_overrides={'REMOTE_ADDR': '203.0.113.5'}).status_code == 403
+
+
+def test_metrics_with_token_require_it(monkeypatch):
+    monkeypatch.setenv('METRICS_TOKEN', 'secret')
+    client = Client(MetricsMiddleware(make_app(), mounts=[]))
+    remote = {'REMOTE_ADDR': '203.0.113.5'}
+
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'}, environ_overrides=remote)
+    assert response.status_code == 200
+    assert '# TYPE http_responses_total counter' in response.text
+
+
+def test_dead_worker_file_is_folded_into_archive(tmp_path):
+    worker = MetricsMiddleware(make_app(), mounts=[], multiprocess_dir=str(tmp_path))
+    Client(worker).get('/page', buffered=True)
+    worker._in_flight['/'] = 1
+    worker.flush()
+    worker_file = tmp_path / f'metrics_{os.getpid()}.json'
+    assert worker_file.exists()
+
+    metrics.mark_process_dead(os.getpid(), str(tmp_path))
+
+    assert not worker_file.exists()
+    assert (tmp_path / metrics.ARCHIVE_FILE).exists()
+    # Новый процесс видит счетчики умершего воркера, но не его запросы "в полете"
+    reader = MetricsMiddleware(make_app(), mounts=[], multiprocess_dir=str(tmp_path))
+    state = reader.collect()
+    assert state['responses'] == {'/\t200': 1}
+    assert state['in_flight'] == {}
+
+
+def test_mark_process_dead_ignores_unknown_pid(tmp_path):
+    metrics.mark_process_dead(123456, str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
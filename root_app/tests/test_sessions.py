@@ -0,0 +1,190 @@
+import os
+import time
+
+import pytest
+from flask import Flask, flash, get_flashed_messages, session
+
+from root_app import sessions
+from root_app.sessions import MemoryStore, SQLiteStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryStore(max_entries=3)
+    return SQLiteStore(str(tmp_path / 'sessions' / 'sessions.sqlite3'))
+
+
+def make_app(store, ttl=None):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+
+    @app.route('/set/<value>')
+    def set_value(value):
+        session['value'] = value
+        return 'ok'
+
+    @app.route('/get')
+    def get_value():
+        return session.get('value', '-')
+
+    @app.route('/login/<user_id>')
+    def login(user_id):
+        session['_user_id'] = user_id
+        return 'ok'
+
+    @app.route('/logout')
+    def logout():
+        session.pop('_user_id', None)
+        return 'ok'
+
+    @app.route('/promote')
+    def promote():
+        session.regenerate()
+        return 'ok'
+
+    @app.route('/flash')
+    def flash_message():
+        flash('Сохранено', 'success')
+        return 'ok'
+
+    @app.route('/messages')
+    def messages():
+        return repr(get_flashed_messages(with_categories=True))
+
+    @app.route('/clear')
+    def clear():
+        session.clear()
+        return 'ok'
+
+    sessions.install(app, 'test', store, ttl=ttl)
+    return app
+
+
+def session_id(client):
+    cookie = client.get_cookie('session')
+    return cookie.value if cookie else None
+
+
+def test_store_save_load_delete(store):
+    expires = time.time() + 60
+    store.set('test:a', sessions.dumps({'value': 1}), expires)
+
+    raw, stored_expires = store.get('test:a')
+    assert sessions.loads(raw) == {'value': 1}
+    assert stored_expires == pytest.approx(expires)
+
+    store.touch('test:a', expires + 60)
+    assert store.get('test:a')[1] == pytest.approx(expires + 60)
+
+    store.delete('test:a')
+    assert store.get('test:a') is None
+
+def test_store_expiry(store):
+    store.set('test:old', sessions.dumps({}), time.time() - 1)
+    assert store.get('test:old') is None
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryStore(max_entries=2)
+    expires = time.time() + 60
+    store.set('a', 'A', expires)
+    store.set('b', 'B', expires)
+    store.get('a')
+    store.set('c', 'C', expires)
+    assert store.get('b') is None
+    assert store.get('a') is not None
+
+def test_sqlite_store_connects_lazily_per_process(tmp_path, monkeypatch):
+    path = tmp_path / 'instance' / 'sessions.sqlite3'
+    store = SQLiteStore(str(path))
+    assert not path.exists()
+
+    store.set('test:a', sessions.dumps({'value': 1}), time.time() + 60)
+    connection = store._connect()
+    assert store._connect() is connection
+
+    # В дочернем процессе соединение родителя не используется
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+    assert store._connect() is not connection
+    assert store.get('test:a') is not None
+
+def test_serializer_keeps_flash_tuples():
+    data = {'_flashes': [('success', 'Сохранено')], 'raw': b'\x00'}
+    assert sessions.loads(sessions.dumps(data)) == data
+
+def test_cookie_round_trip(store):
+    client = make_app(store).test_client()
+    assert client.get('/get').text == '-'
+
+    client.get('/set/first')
+    sid = session_id(client)
+    assert sid
+    assert client.get('/get').text == 'first'
+
+    # В cookie только идентификатор, данные лежат в хранилище
+    assert 'first' not in sid
+    assert sessions.loads(store.get(f'test:{sid}')[0]) == {'value': 'first'}
+
+    client.get('/set/second')
+    assert session_id(client) == sid
+    assert client.get('/get').text == 'second'
+
+def test_flash_messages_survive_redirect(store):
+    client = make_app(store).test_client()
+    client.get('/flash')
+    assert client.get('/messages').text == repr([('success', 'Сохранено')])
+
+def test_unknown_or_unreadable_session_starts_fresh(store):
+    client = make_app(store).test_client()
+    client.set_cookie('session', 'missing')
+    assert client.get('/get').text == '-'
+
+    store.set('test:broken', b'\x80\x05not json', time.time() + 60)
+    client.set_cookie('session', 'broken')
+    assert client.get('/get').text == '-'
+
+def test_clearing_session_deletes_it(store):
+    client = make_app(store).test_client()
+    client.get('/set/value')
+    sid = session_id(client)
+
+    client.get('/clear')
+    assert store.get(f'test:{sid}') is None
+    assert session_id(client) is None
+
+def test_expired_session_is_not_loaded(store):
+    app = make_app(store, ttl=60)
+    client = app.test_client()
+    client.get('/set/value')
+    sid = session_id(client)
+
+    store.touch(f'test:{sid}', time.time() - 1)
+    assert client.get('/get').text == '-'
+
+def test_login_and_logout_rotate_session_id(store):
+    client = make_app(store).test_client()
+    client.get('/set/value')
+    anonymous_sid = session_id(client)
+
+    client.get('/login/1')
+    user_sid = session_id(client)
+    assert user_sid != anonymous_sid
+    assert store.get(f'test:{anonymous_sid}') is None
+    assert client.get('/get').text == 'value'
+
+    client.get('/set/other')
+    assert session_id(client) == user_sid
+
+    client.get('/logout')
+    assert session_id(client) not in (user_sid, anonymous_sid)
+    assert store.get(f'test:{user_sid}') is None
+
+def test_regenerate_rotates_session_id(store):
+    client = make_app(store).test_client()
+    client.get('/login/1')
+    sid = session_id(client)
+
+    client.get('/promote')
+    assert session_id(client) != sid
+    assert store.get(f'test:{sid}') is None
+    assert sessions.loads(store.get(f'test:{session_id(client)}')[0]) == {'_user_id': '1'}
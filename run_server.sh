@@ -1,2 +1,2 @@
 #!/bin/bash
-gunicorn app:application
\ No newline at end of file
+gunicorn -c gunicorn.conf.py app:application
\ No newline at end of file